@@ -3,30 +3,16 @@
 """
 自動スクリーンショットアップローダー (Googleドライブ連携版)
 定期的にスクリーンショットを撮影し、Googleドライブにアップロードします。
+撮影・アップロードは共通エンジン（screenshot_engine.capture_engine）で行います。
 """
 
 import os
 import sys
-import time
 import traceback
-from datetime import datetime
-from zoneinfo import ZoneInfo
-from pathlib import Path
-import tempfile
 import getpass
 
-import schedule
-import pyautogui
-try:
-    import mss
-    from PIL import Image
-    MSS_AVAILABLE = True
-except ImportError:
-    MSS_AVAILABLE = False
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
+from screenshot_engine.capture_engine import CaptureEngine
+from screenshot_engine.config import ADAPTIVE_INTERVAL_ENABLED
 
 # ===== 設定定数 =====
 # 撮影間隔（分）
@@ -48,62 +34,11 @@ MAX_LOG_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_LOG_FILES = 5  # 最大5世代保持
 
 
-def rotate_log_if_needed():
-    """ログファイルのサイズをチェックし、必要に応じてローテーション"""
+def load_drive_credentials():
+    """Google Drive API用の認証情報を読み込む"""
     try:
-        if not os.path.exists(LOG_FILE):
-            return
-        
-        # ファイルサイズをチェック
-        file_size = os.path.getsize(LOG_FILE)
-        if file_size < MAX_LOG_SIZE:
-            return
-        
-        # ローテーション実行
-        # 古いログファイルを削除
-        oldest_log = f"{LOG_FILE}.{MAX_LOG_FILES}"
-        if os.path.exists(oldest_log):
-            os.remove(oldest_log)
-        
-        # 既存のログファイルを順番にリネーム
-        for i in range(MAX_LOG_FILES - 1, 0, -1):
-            old_name = f"{LOG_FILE}.{i}"
-            new_name = f"{LOG_FILE}.{i + 1}"
-            if os.path.exists(old_name):
-                os.rename(old_name, new_name)
-        
-        # 現在のログファイルをローテーション
-        os.rename(LOG_FILE, f"{LOG_FILE}.1")
-        
-        # 新しいログファイルを作成
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            jst_now = datetime.now(ZoneInfo("Asia/Tokyo"))
-            f.write(f"[{jst_now.strftime('%Y-%m-%d %H:%M:%S')}] ログファイルをローテーションしました\n")
-            f.write(f"[{jst_now.strftime('%Y-%m-%d %H:%M:%S')}] 前のログは {LOG_FILE}.1 に保存されています\n")
-            
-    except Exception as e:
-        # ローテーションエラーは無視（ログ記録自体は続行）
-        pass
-
-def log_message(message):
-    """ログメッセージを記録する（ローテーション機能付き）"""
-    timestamp = datetime.now(ZoneInfo("Asia/Tokyo")).strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] {message}\n"
-    
-    try:
-        # ログファイルのローテーションチェック
-        rotate_log_if_needed()
-        
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-    except Exception:
-        pass  # ログ書き込みエラーは無視  # ログ書き込みエラーは無視
-
-
-def get_drive_service():
-    """Google Drive APIのサービスオブジェクトを取得"""
-    try:
-        # 暗号化された認証情報を使用
+        # 暗号化された認証情報を使用（google.oauth2・cryptographyは起動を速くするためここで読み込む）
+        from google.oauth2 import service_account
         from credential_manager import CredentialManager
         
         # PyInstallerでビルドされた実行ファイルの場合のパス解決
@@ -126,23 +61,20 @@ def get_drive_service():
                 # パスワードが環境変数にない場合、プロンプトで入力
                 password = getpass.getpass("認証パスワードを入力してください: ")
             
-            # 暗号化された認証情報を復号化
+            # 暗号化された認証情報を復号化（複数のサービスアカウントが登録されている場合はすべて）
             if password:
-                credentials_dict = cred_manager.get_credentials_for_gdrive(password=password)
+                accounts = cred_manager.get_service_accounts_for_gdrive(password=password)
             else:
                 # パスワードがない場合はマシン紐付けまたは通常の認証
-                credentials_dict = cred_manager.get_credentials_for_gdrive()
+                accounts = cred_manager.get_service_accounts_for_gdrive()
             
             # 認証情報を作成
-            credentials = service_account.Credentials.from_service_account_info(
-                credentials_dict,
-                scopes=SCOPES
-            )
-            
-            # Drive APIサービスを構築
-            service = build('drive', 'v3', credentials=credentials)
-            log_message("Google Drive APIサービスの初期化に成功しました")
-            return service
+            credentials = [
+                service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+                for info in accounts
+            ]
+            log_message(f"Google Drive APIサービスの初期化に成功しました（サービスアカウント: {len(credentials)}件）")
+            return credentials
             
         except FileNotFoundError:
             # 暗号化ファイルが見つからない場合、従来の方法を試す
@@ -167,122 +99,39 @@ def get_drive_service():
                 key_file_path,
                 scopes=SCOPES
             )
-            
-            # Drive APIサービスを構築
-            service = build('drive', 'v3', credentials=credentials)
             log_message("Google Drive APIサービスの初期化に成功しました（通常認証使用）")
-            return service
+            return credentials
         
     except Exception as e:
         log_message(f"Google Drive APIサービスの初期化エラー: {str(e)}")
         return None
 
 
-def upload_to_gdrive(local_file_path, file_name, service):
-    """Googleドライブにファイルをアップロード"""
-    try:
-        file_metadata = {
-            'name': file_name,
-            'parents': [GDRIVE_FOLDER_ID]
-        }
-        
-        media = MediaFileUpload(
-            local_file_path,
-            mimetype='image/png',
-            resumable=True
-        )
-        
-        # ファイルをアップロード（共有ドライブ対応）
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, name',
-            supportsAllDrives=True
-        ).execute()
-        
-        log_message(f"アップロード成功: {file_name} (ID: {file.get('id')})")
-        return True
-        
-    except HttpError as e:
-        if e.resp.status == 404:
-            log_message(f"エラー: 指定されたフォルダIDが見つかりません: {GDRIVE_FOLDER_ID}")
-        else:
-            log_message(f"Googleドライブアップロードエラー (HTTP {e.resp.status}): {str(e)}")
-        return False
-    except Exception as e:
-        log_message(f"Googleドライブアップロードエラー: {str(e)}")
-        return False
-
-
-def take_and_upload_screenshot():
-    """スクリーンショットを撮影してGoogleドライブにアップロード"""
-    service = None
-    temp_file_path = None
-    
-    try:
-        # Google Drive APIサービスを取得
-        service = get_drive_service()
-        if not service:
-            log_message("Google Drive APIサービスの取得に失敗しました")
-            return
-        
-        # ファイル名の生成
-        username = os.getlogin()
-        jst_now = datetime.now(ZoneInfo("Asia/Tokyo"))
-        date_str = jst_now.strftime('%Y%m%d')
-        base_name = f"{date_str}-{username}"
-        
-        # 重複チェック用のタイムスタンプ付きファイル名
-        # Googleドライブでは同名ファイルも保存可能だが、識別しやすくするため時刻を付与
-        timestamp_suffix = jst_now.strftime('%H%M%S')
-        file_name = f"{base_name}_{timestamp_suffix}.png"
-        
-        # 一時ディレクトリにファイルを保存
-        temp_dir = tempfile.gettempdir()
-        temp_file_path = os.path.join(temp_dir, file_name)
-        
-        # スクリーンショット撮影（全画面を1枚に）
-        log_message(f"スクリーンショット撮影開始: {file_name}")
-        
-        try:
-            # mssを使用して全モニターを含む仮想画面を撮影
-            if not MSS_AVAILABLE:
-                raise ImportError("mss not available")
-            
-            with mss.mss() as sct:
-                # monitors[0]は全モニターを含む仮想画面
-                monitor = sct.monitors[0]
-                screenshot = sct.grab(monitor)
-                # PIL Imageに変換
-                img = Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
-                img.save(temp_file_path)
-                log_message(f"全画面スクリーンショット保存完了: {temp_file_path}")
-                
-        except (ImportError, Exception) as e:
-            # mssが使用できない場合は通常の方法（プライマリモニターのみ）
-            log_message("全画面撮影に失敗。プライマリモニターのみ撮影します。")
-            screenshot = pyautogui.screenshot()
-            screenshot.save(temp_file_path)
-            log_message(f"スクリーンショット保存完了: {temp_file_path}")
-        
-        # Googleドライブにアップロード
-        if upload_to_gdrive(temp_file_path, file_name, service):
-            log_message(f"処理完了: {file_name}")
-        else:
-            log_message(f"アップロード失敗: {file_name}")
-        
-    except Exception as e:
-        log_message(f"エラー発生: {str(e)}")
-        log_message(f"トレースバック: {traceback.format_exc()}")
-    
-    finally:
-        # 一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                log_message(f"一時ファイル削除: {temp_file_path}")
-            except Exception as e:
-                log_message(f"一時ファイル削除エラー: {str(e)}")
+# 撮影・エンコード・アップロード・スプール・ログはGUI版と共通のエンジンで行う
+# （LOG_FILEは呼び出すたびに参照するため、実行中に変更しても反映される）
+_engine = CaptureEngine(
+    GDRIVE_FOLDER_ID,
+    load_drive_credentials,
+    interval_minutes=INTERVAL_MINUTES,
+    log_file=lambda: LOG_FILE,
+    max_log_size=MAX_LOG_SIZE,
+    max_log_files=MAX_LOG_FILES
+)
+
+# 従来の関数名（エンジンのメソッド）
+log_event = _engine.log_event
+log_message = _engine.log
+rotate_log_if_needed = _engine.rotate_log_if_needed
+get_drive_service = _engine.get_drive_service
+close_drive_session = _engine.close_drive_session
+upload_to_gdrive = _engine.upload_file
+upload_bytes_to_gdrive = _engine.upload_bytes
+capture_screenshot = _engine.capture_screenshot
+capture_screenshots = _engine.capture_screenshots
+take_and_upload_screenshot = _engine.snapshot
+get_upload_pipeline = _engine.get_upload_pipeline
+stop_upload_pipeline = _engine.stop_upload_pipeline
+get_metrics = _engine.metrics
 
 
 def main():
@@ -302,57 +151,26 @@ def main():
         log_message("GDRIVE_FOLDER_IDを正しい値に設定してください")
         sys.exit(1)
     
-    # 初回実行
-    log_message("初回スクリーンショット撮影を開始します...")
-    take_and_upload_screenshot()
-    
-    # スケジュール設定
-    schedule.every(INTERVAL_MINUTES).minutes.do(take_and_upload_screenshot)
-    log_message(f"スケジューラー設定完了: {INTERVAL_MINUTES}分ごとに実行")
+    # スケジュール設定（次の撮影予定時刻まで待機し、1秒ごとの確認は行わない）
+    if ADAPTIVE_INTERVAL_ENABLED:
+        log_message("スケジューラー設定完了: 画面の変化量に応じた間隔で実行")
+    else:
+        log_message(f"スケジューラー設定完了: {INTERVAL_MINUTES}分ごとに実行")
     
-    # メインループ
-    log_message("メインループ開始")
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(1)
-        except KeyboardInterrupt:
-            log_message("キーボード割り込みを検出。プログラムを終了します。")
-            break
-        except Exception as e:
-            log_message(f"メインループエラー: {str(e)}")
-            time.sleep(60)  # エラー時は60秒待機
+    # メインループ（初回はすぐに撮影）
+    log_message("初回スクリーンショット撮影を開始します...")
+    try:
+        _engine.run()
+    except KeyboardInterrupt:
+        log_message("キーボード割り込みを検出。プログラムを終了します。")
+    finally:
+        _engine.shutdown()
 
 def cleanup_old_logs():
     """起動時に古いログファイルをクリーンアップ"""
     try:
-        log_dir = os.path.dirname(os.path.abspath(LOG_FILE))
-        log_base = os.path.basename(LOG_FILE)
-        
-        # ログファイルのリストを取得
-        log_files = []
-        for file in os.listdir(log_dir):
-            if file.startswith(log_base) and file != log_base:
-                # auto_screenshot.log.1, auto_screenshot.log.2 など
-                try:
-                    parts = file.split('.')
-                    if len(parts) == 3 and parts[-1].isdigit():
-                        log_files.append((file, int(parts[-1])))
-                except:
-                    pass
-        
-        # 番号順にソート
-        log_files.sort(key=lambda x: x[1])
-        
-        # MAX_LOG_FILESを超える古いファイルを削除
-        for file, num in log_files:
-            if num > MAX_LOG_FILES:
-                try:
-                    os.remove(os.path.join(log_dir, file))
-                    print(f"古いログファイルを削除: {file}")
-                except:
-                    pass
-                    
+        for file in _engine.cleanup_old_logs():
+            print(f"古いログファイルを削除: {file}")
     except Exception:
         pass
 
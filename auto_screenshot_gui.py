@@ -3,41 +3,20 @@
 """
 自動スクリーンショットツール GUI版
 パスワード認証と撮影制御機能を提供
+撮影・アップロードは共通エンジン（screenshot_engine.capture_engine）で行います
 """
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-import time
 import os
 import sys
-import json
-import tempfile
 import traceback
-from pathlib import Path
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
-# 既存のスクリーンショット機能をインポート
-import pyautogui
-from PIL import Image
-import schedule
-
-# Google Drive関連
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-
-# mss対応（マルチモニター）
-try:
-    import mss
-    MSS_AVAILABLE = True
-except ImportError:
-    MSS_AVAILABLE = False
-
-# 暗号化された認証情報の復号化対応
-from credential_manager import CredentialManager
+# 撮影・アップロード（共通エンジン）
+# google.oauth2・googleapiclient・cryptography・pyautogui・mssは使用時に読み込む
+# （PyInstallerの実行ファイルでログイン画面をすぐに表示するため）
+from screenshot_engine.capture_engine import CaptureEngine
+from screenshot_engine.metrics import format_metrics
 
 # ========== 設定（ハードコード） ==========
 INTERVAL_MINUTES = 5
@@ -51,37 +30,13 @@ MAX_LOG_FILES = 5
 # パスワードはcredential_managerで暗号化時に設定されたものを使用
 # GUIログイン時のパスワードと認証情報復号化のパスワードは同じ
 
-# ========== ログ機能 ==========
-def rotate_log_if_needed():
-    """ログファイルのローテーション"""
-    if os.path.exists(LOG_FILE):
-        if os.path.getsize(LOG_FILE) > MAX_LOG_SIZE:
-            for i in range(MAX_LOG_FILES - 1, 0, -1):
-                old_log = f"{LOG_FILE}.{i}"
-                new_log = f"{LOG_FILE}.{i+1}"
-                if os.path.exists(old_log):
-                    if i + 1 >= MAX_LOG_FILES:
-                        os.remove(old_log)
-                    else:
-                        os.rename(old_log, new_log)
-            os.rename(LOG_FILE, f"{LOG_FILE}.1")
-
-def log_message(message):
-    """ログメッセージを記録"""
-    rotate_log_if_needed()
-    timestamp = datetime.now(ZoneInfo("Asia/Tokyo")).strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] {message}\n"
-    
-    try:
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-    except Exception as e:
-        print(f"ログ書き込みエラー: {str(e)}")
-
 # ========== Google Drive関連 ==========
-def get_drive_service():
-    """Google Drive APIサービスを取得"""
+def load_drive_credentials():
+    """Google Drive API用の認証情報を読み込む"""
     try:
+        from google.oauth2 import service_account
+        from credential_manager import CredentialManager
+        
         # PyInstallerでビルドされた場合のパスを取得
         if getattr(sys, 'frozen', False):
             base_path = sys._MEIPASS
@@ -96,16 +51,15 @@ def get_drive_service():
             log_message(f"パスワード環境変数: {'設定済み' if password else '未設定'}")
             if password:
                 cm = CredentialManager(encrypted_file_path=enc_path)
-                # get_credentials_for_gdriveメソッドを使用
-                key_data = cm.get_credentials_for_gdrive(password=password)
+                # 複数のサービスアカウントが登録されている場合はすべて読み込む（アップロードを振り分け）
+                key_data = cm.get_service_accounts_for_gdrive(password=password)
                 if key_data:
-                    credentials = service_account.Credentials.from_service_account_info(
-                        key_data,  # すでにdict形式
-                        scopes=SCOPES
-                    )
-                    service = build('drive', 'v3', credentials=credentials)
-                    log_message("Google Drive APIサービスの初期化に成功しました")
-                    return service
+                    credentials = [
+                        service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+                        for info in key_data  # すでにdict形式
+                    ]
+                    log_message(f"Google Drive APIサービスの初期化に成功しました（サービスアカウント: {len(credentials)}件）")
+                    return credentials
                 else:
                     log_message("認証情報の復号化に失敗しました")
         
@@ -125,10 +79,8 @@ def get_drive_service():
             key_file_path,
             scopes=SCOPES
         )
-        
-        service = build('drive', 'v3', credentials=credentials)
         log_message("Google Drive APIサービスの初期化に成功しました（通常認証使用）")
-        return service
+        return credentials
         
     except Exception as e:
         log_message(f"Google Drive API初期化エラー: {str(e)}")
@@ -136,105 +88,37 @@ def get_drive_service():
         log_message(f"詳細: {traceback.format_exc()}")
         return None
 
-def upload_to_gdrive(file_path, file_name, service):
-    """Google Driveにファイルをアップロード"""
-    try:
-        file_metadata = {
-            'name': file_name,
-            'parents': [GDRIVE_FOLDER_ID]
-        }
-        
-        media = MediaFileUpload(file_path, mimetype='image/png', resumable=True)
-        
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, name',
-            supportsAllDrives=True
-        ).execute()
-        
-        log_message(f"アップロード成功: {file_name} (ID: {file.get('id')})")
-        return True
-        
-    except HttpError as error:
-        if error.resp.status == 404:
-            log_message(f"エラー: 指定されたフォルダIDが見つかりません: {GDRIVE_FOLDER_ID}")
-        else:
-            log_message(f"アップロードエラー (HTTP {error.resp.status}): {str(error)}")
-        return False
-    except Exception as e:
-        log_message(f"アップロードエラー: {str(e)}")
-        return False
+# ========== 撮影エンジン ==========
+# 撮影・エンコード・アップロード・スプール・ログはCLI版と共通のエンジンで行う
+_engine = CaptureEngine(
+    GDRIVE_FOLDER_ID,
+    load_drive_credentials,
+    interval_minutes=INTERVAL_MINUTES,
+    log_file=lambda: LOG_FILE,
+    max_log_size=MAX_LOG_SIZE,
+    max_log_files=MAX_LOG_FILES
+)
 
-def take_and_upload_screenshot():
-    """スクリーンショットを撮影してGoogle Driveにアップロード"""
-    service = None
-    temp_file_path = None
-    
-    try:
-        # Google Drive APIサービスを取得
-        service = get_drive_service()
-        if not service:
-            log_message("Google Drive APIサービスの取得に失敗しました")
-            return
-        
-        # ファイル名の生成
-        username = os.getlogin()
-        jst_now = datetime.now(ZoneInfo("Asia/Tokyo"))
-        date_str = jst_now.strftime('%Y%m%d')
-        timestamp_suffix = jst_now.strftime('%H%M%S')
-        file_name = f"{date_str}-{username}_{timestamp_suffix}.png"
-        
-        # 一時ディレクトリにファイルを保存
-        temp_dir = tempfile.gettempdir()
-        temp_file_path = os.path.join(temp_dir, file_name)
-        
-        # スクリーンショット撮影
-        log_message(f"スクリーンショット撮影開始: {file_name}")
-        
-        try:
-            if not MSS_AVAILABLE:
-                raise ImportError("mss not available")
-            
-            with mss.mss() as sct:
-                monitor = sct.monitors[0]
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
-                img.save(temp_file_path)
-                log_message(f"全画面スクリーンショット保存完了: {temp_file_path}")
-                
-        except (ImportError, Exception) as e:
-            log_message("全画面撮影に失敗。プライマリモニターのみ撮影します。")
-            screenshot = pyautogui.screenshot()
-            screenshot.save(temp_file_path)
-            log_message(f"スクリーンショット保存完了: {temp_file_path}")
-        
-        # Google Driveにアップロード
-        if upload_to_gdrive(temp_file_path, file_name, service):
-            log_message(f"処理完了: {file_name}")
-        else:
-            log_message(f"アップロード失敗: {file_name}")
-        
-    except Exception as e:
-        log_message(f"エラー発生: {str(e)}")
-        log_message(f"トレースバック: {traceback.format_exc()}")
-    
-    finally:
-        # 一時ファイルを削除
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                log_message(f"一時ファイル削除: {temp_file_path}")
-            except Exception as e:
-                log_message(f"一時ファイル削除エラー: {str(e)}")
+# 従来の関数名（エンジンのメソッド）
+log_event = _engine.log_event
+log_message = _engine.log
+rotate_log_if_needed = _engine.rotate_log_if_needed
+get_drive_service = _engine.get_drive_service
+close_drive_session = _engine.close_drive_session
+upload_to_gdrive = _engine.upload_file
+upload_bytes_to_gdrive = _engine.upload_bytes
+capture_screenshot = _engine.capture_screenshot
+capture_screenshots = _engine.capture_screenshots
+take_and_upload_screenshot = _engine.snapshot
+get_upload_pipeline = _engine.get_upload_pipeline
+stop_upload_pipeline = _engine.stop_upload_pipeline
+get_metrics = _engine.metrics
 
 # ========== GUI クラス ==========
 class ScreenshotApp:
     def __init__(self):
         self.root = None
         self.is_recording = False
-        self.screenshot_thread = None
-        self.stop_event = threading.Event()
         
         # パスワード認証画面を表示
         self.show_login()
@@ -296,6 +180,9 @@ class ScreenshotApp:
         
         if os.path.exists(enc_path):
             try:
+                # 暗号化された認証情報の復号化対応（cryptographyはここで初めて読み込む）
+                from credential_manager import CredentialManager
+                
                 # CredentialManagerにパスを指定
                 cm = CredentialManager(encrypted_file_path=enc_path)
                 # get_credentials_for_gdriveメソッドを使用（パスワード引数対応）
@@ -340,6 +227,9 @@ class ScreenshotApp:
                                         style='Large.TButton')
         self.control_button.pack(pady=20)
         
+        # 処理時間・アップロード件数の表示
+        ttk.Button(frame, text="統計", width=20, command=self.show_metrics).pack(pady=(0, 10))
+        
         # ボタンスタイルの設定
         style = ttk.Style()
         style.configure('Large.TButton', font=('', 12))
@@ -381,10 +271,8 @@ class ScreenshotApp:
         
         log_message("撮影開始")
         
-        # スクリーンショットスレッドを開始
-        self.stop_event.clear()
-        self.screenshot_thread = threading.Thread(target=self.screenshot_loop, daemon=True)
-        self.screenshot_thread.start()
+        # 撮影スレッドを開始（次の撮影予定時刻まで待機し、停止するとすぐに終了）
+        _engine.start()
     
     def stop_recording(self):
         """撮影停止"""
@@ -394,26 +282,19 @@ class ScreenshotApp:
         
         log_message("撮影停止")
         
-        # スレッドを停止
-        self.stop_event.set()
+        # 撮影スレッドを停止（アップロード待ちの撮影画像は引き続き送信）
+        _engine.stop()
+        
+        # 導出済みの暗号化キーを破棄（Driveセッションは再開時にそのまま使用）
+        from credential_manager import CredentialManager
+        CredentialManager.clear()
     
-    def screenshot_loop(self):
-        """スクリーンショット撮影ループ（別スレッド）"""
-        # 最初のスクリーンショットをすぐに撮影
-        if not self.stop_event.is_set():
-            take_and_upload_screenshot()
-        
-        # 定期実行
-        while not self.stop_event.is_set():
-            # INTERVAL_MINUTES分待機（1秒ごとにチェック）
-            for _ in range(INTERVAL_MINUTES * 60):
-                if self.stop_event.is_set():
-                    break
-                time.sleep(1)
-            
-            # 撮影実行
-            if not self.stop_event.is_set():
-                take_and_upload_screenshot()
+    def show_metrics(self):
+        """処理時間・アップロード件数を表示"""
+        snapshot = get_metrics()
+        text = format_metrics(snapshot)
+        text += f"\n\nアップロード待ち: {snapshot['queue_depth']}件 / スプール: {snapshot['spool_entries']}件"
+        messagebox.showinfo("統計", text)
     
     def on_close(self):
         """ウィンドウを閉じる時の処理"""
@@ -423,7 +304,7 @@ class ScreenshotApp:
     def quit_app(self):
         """アプリケーション終了"""
         log_message("=== Screenshot Monitor GUI 終了 ===")
-        self.stop_event.set()
+        _engine.shutdown()
         
         try:
             if hasattr(self, 'root') and self.root:
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画像エンコーダーのベンチマーク
+代表的なデスクトップ画像で各保存形式のエンコード時間とファイルサイズを比較し、
+配布先ごとの IMAGE_FORMAT / 品質設定を決めるために使用します。
+
+使用方法:
+    python benchmark_encoders.py [--capture] [--repeat N]
+
+    --capture   合成画像に加えて実際の画面（mss）も測定する
+    --repeat N  1設定あたりの測定回数（既定: 3）
+"""
+
+import io
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from PIL import Image, ImageDraw
+
+from screenshot_engine.image_encoder import (
+    PngEncoder,
+    WebpLosslessEncoder,
+    WebpEncoder,
+    JpegEncoder,
+    AvifEncoder,
+)
+
+# 測定する設定（ラベル, エンコーダー）
+ENCODER_CANDIDATES = [
+    ("png level=1", lambda: PngEncoder(compress_level=1)),
+    ("png level=3", lambda: PngEncoder(compress_level=3)),
+    ("png level=6 (既定)", lambda: PngEncoder(compress_level=6)),
+    ("png level=9", lambda: PngEncoder(compress_level=9)),
+    ("png optimize", lambda: PngEncoder(optimize=True)),
+    ("webp lossless method=0", lambda: WebpLosslessEncoder(method=0)),
+    ("webp lossless method=4", lambda: WebpLosslessEncoder(method=4)),
+    ("webp q=80", lambda: WebpEncoder(quality=80)),
+    ("jpeg q=85", lambda: JpegEncoder(quality=85)),
+    ("avif q=60", lambda: AvifEncoder(quality=60)),
+    ("avif q=100 (4:4:4)", lambda: AvifEncoder(quality=100)),
+]
+
+
+def draw_window(draw, box, title, rng, code=False):
+    """文字の多いアプリケーションウィンドウを描画"""
+    x0, y0, x1, y1 = box
+    background = (30, 30, 30) if code else (255, 255, 255)
+    draw.rectangle(box, fill=background, outline=(120, 120, 120))
+    draw.rectangle((x0, y0, x1, y0 + 30), fill=(230, 230, 235))
+    draw.text((x0 + 10, y0 + 8), title, fill=(0, 0, 0))
+    palette = [(86, 156, 214), (206, 145, 120), (181, 206, 168), (220, 220, 220)] if code else [(20, 20, 20)]
+    y = y0 + 45
+    while y < y1 - 20:
+        x = x0 + 15 + (rng.randint(0, 4) * 20 if code else 0)
+        words = rng.randint(3, 14)
+        for _ in range(words):
+            word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+            draw.text((x, y), word, fill=rng.choice(palette))
+            x += len(word) * 6 + 6
+            if x > x1 - 60:
+                break
+        y += 18
+
+
+def create_office_desktop(width=1920, height=1080, seed=1):
+    """文書・表計算・ブラウザが並ぶ一般的なデスクトップ"""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height), (0, 99, 177))
+    draw = ImageDraw.Draw(img)
+    draw_window(draw, (40, 40, width // 2 - 20, height - 80), "Document - Editor", rng)
+    draw_window(draw, (width // 2, 60, width - 40, height - 100), "Browser", rng)
+    for i in range(0, width // 2 - 200, 120):
+        draw.line((width // 2 + 20 + i, 120, width // 2 + 20 + i, height - 140), fill=(210, 210, 210))
+    draw.rectangle((0, height - 40, width, height), fill=(32, 32, 32))
+    return img
+
+
+def create_code_desktop(width=1920, height=1080, seed=2):
+    """ダークテーマのコードエディター"""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height), (45, 45, 45))
+    draw = ImageDraw.Draw(img)
+    draw_window(draw, (0, 0, width, height - 40), "main.py - Editor", rng, code=True)
+    draw.rectangle((0, height - 40, width, height), fill=(0, 122, 204))
+    return img
+
+
+def create_photo_desktop(width=1920, height=1080, seed=3):
+    """写真・グラデーションを含む画面（ノイズの多い領域）"""
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    img = Image.merge('RGB', (gradient, gradient.rotate(90).resize((width, height)), gradient.transpose(0)))
+    noise = Image.effect_noise((width // 2, height // 2), 40).convert('RGB')
+    img.paste(noise, (width // 4, height // 4))
+    draw = ImageDraw.Draw(img)
+    draw_window(draw, (80, 80, 700, 500), "Viewer", rng)
+    return img
+
+
+def create_multi_monitor_desktop():
+    """サイズの異なる3モニターの仮想画面（モニター間の黒い余白を含む）"""
+    virtual = Image.new('RGB', (1920 + 2560 + 1920, 1440), (0, 0, 0))
+    virtual.paste(create_office_desktop(1920, 1080, seed=4), (0, 360))
+    virtual.paste(create_code_desktop(2560, 1440, seed=5), (1920, 0))
+    virtual.paste(create_office_desktop(1920, 1080, seed=6), (1920 + 2560, 360))
+    return virtual
+
+
+def capture_screen():
+    """実際の画面を撮影（mssが使用できない場合はNone）"""
+    try:
+        import mss
+        with mss.mss() as sct:
+            screenshot = sct.grab(sct.monitors[0])
+            return Image.frombytes('RGB', screenshot.size, screenshot.bgra, 'raw', 'BGRX')
+    except Exception as e:
+        print(f"画面の撮影に失敗しました: {str(e)}")
+        return None
+
+
+def measure(encoder, img, repeat):
+    """エンコード時間（中央値）とサイズを測定"""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        encoder.encode(img, buffer)
+        timings.append(time.perf_counter() - start)
+        size = buffer.tell()
+    return statistics.median(timings), size
+
+
+def main():
+    """ベンチマークを実行して結果を表示"""
+    parser = argparse.ArgumentParser(description="画像エンコーダーのベンチマーク")
+    parser.add_argument('--capture', action='store_true', help="実際の画面も測定する")
+    parser.add_argument('--repeat', type=int, default=3, help="1設定あたりの測定回数")
+    args = parser.parse_args()
+
+    images = [
+        ("事務作業 1920x1080", create_office_desktop()),
+        ("コード 1920x1080", create_code_desktop()),
+        ("写真混在 1920x1080", create_photo_desktop()),
+        ("3モニター 6400x1440", create_multi_monitor_desktop()),
+    ]
+    if args.capture:
+        screen = capture_screen()
+        if screen is not None:
+            images.append((f"実画面 {screen.width}x{screen.height}", screen))
+
+    for image_label, img in images:
+        raw_size = img.width * img.height * 3
+        print(f"\n=== {image_label} (非圧縮 {raw_size / 1024 / 1024:.1f}MB) ===")
+        print(f"{'設定':28} {'時間(ms)':>10} {'サイズ(KB)':>12} {'圧縮率':>8}")
+        print("-" * 62)
+        for label, factory in ENCODER_CANDIDATES:
+            encoder = factory()
+            if not encoder.available():
+                print(f"{label:28} {'この環境では使用不可':>32}")
+                continue
+            elapsed, size = measure(encoder, img, args.repeat)
+            print(f"{label:28} {elapsed * 1000:10.1f} {size / 1024:12.1f} {raw_size / max(size, 1):7.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
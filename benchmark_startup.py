@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間のベンチマーク
+CLI版・GUI版のモジュールを新しいプロセスで読み込み、読み込み時間と
+時間のかかったモジュール（python -X importtime の集計）を表示します。
+使用時まで読み込みを遅らせているモジュール（DEFERRED_MODULES）が起動時に
+読み込まれていた場合は失敗として終了コード1を返すため、起動が遅くなる変更を検出できます。
+
+使用方法:
+    python benchmark_startup.py [--module NAME] [--repeat N] [--top N] [--max-ms MS]
+
+    --module NAME  測定するモジュール（複数指定可、既定: auto_screenshot_gui と auto_screenshot_gdrive）
+    --repeat N     測定回数（既定: 5、中央値を表示）
+    --top N        表示する時間のかかったモジュールの数（既定: 15）
+    --max-ms MS    読み込み時間の上限（ミリ秒、超えた場合は失敗）
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 測定するモジュール
+DEFAULT_MODULES = ['auto_screenshot_gui', 'auto_screenshot_gdrive']
+
+# 起動時には読み込まないモジュール（ログイン後・最初の撮影時・最初のアップロード時に読み込む）
+DEFERRED_MODULES = [
+    'pyautogui',
+    'mss',
+    'numpy',
+    'googleapiclient',
+    'google.oauth2',
+    'httplib2',
+    'cryptography',
+    'http.server',
+]
+
+# 子プロセスで実行するコード（読み込み時間と読み込まれた遅延対象のモジュールを出力）
+_PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+deferred = {deferred!r}
+print(json.dumps({{'elapsed': elapsed, 'loaded': [name for name in deferred if name in sys.modules]}}))
+"""
+
+
+def probe_import(module: str, importtime: bool = False) -> dict:
+    """
+    新しいプロセスでモジュールを読み込む
+
+    Returns:
+        {'elapsed': 読み込み秒数, 'loaded': 読み込まれた遅延対象のモジュール, 'importtime': -X importtimeの出力}
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _PROBE.format(module=module, deferred=DEFERRED_MODULES)]
+
+    # プロジェクトのモジュールを読み込めるよう、このファイルの場所で実行する
+    result = subprocess.run(command, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} の読み込みに失敗しました:\n{result.stderr[-2000:]}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['importtime'] = result.stderr if importtime else ''
+    return report
+
+
+def parse_importtime(output: str) -> list:
+    """
+    -X importtime の出力を集計
+
+    Returns:
+        [(累計マイクロ秒, モジュール名), ...]（累計時間の長い順）
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows
+
+
+def main():
+    """ベンチマークを実行して結果を表示"""
+    parser = argparse.ArgumentParser(description="起動時間のベンチマーク")
+    parser.add_argument('--module', action='append', help="測定するモジュール（複数指定可）")
+    parser.add_argument('--repeat', type=int, default=5, help="測定回数")
+    parser.add_argument('--top', type=int, default=15, help="表示する時間のかかったモジュールの数")
+    parser.add_argument('--max-ms', type=float, default=None, help="読み込み時間の上限（ミリ秒）")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.module or DEFAULT_MODULES:
+        timings = []
+        loaded = set()
+        for _ in range(args.repeat):
+            report = probe_import(module)
+            timings.append(report['elapsed'])
+            loaded.update(report['loaded'])
+        median_ms = statistics.median(timings) * 1000
+
+        print(f"\n=== {module} ===")
+        print(f"読み込み時間: {median_ms:.1f}ms（中央値、{args.repeat}回、最小 {min(timings) * 1000:.1f}ms）")
+
+        # 時間のかかったモジュール（累計時間）
+        rows = parse_importtime(probe_import(module, importtime=True)['importtime'])
+        print(f"{'累計(ms)':>10}  モジュール")
+        print("-" * 50)
+        for cumulative, name in rows[:args.top]:
+            print(f"{cumulative / 1000:10.1f}  {name}")
+
+        if loaded:
+            print(f"✗ 起動時に読み込まないはずのモジュールが読み込まれています: {', '.join(sorted(loaded))}")
+            failed = True
+        else:
+            print("✓ 遅延読み込みの対象は読み込まれていません")
+
+        if args.max_ms is not None and median_ms > args.max_ms:
+            print(f"✗ 読み込み時間が上限（{args.max_ms:.0f}ms）を超えています")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,18 +7,99 @@
 
 import os
 import json
+import hmac
 import base64
 import getpass
 import hashlib
+import stat
+import platform
+import threading
+import subprocess
 from pathlib import Path
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+# マシンID取得コマンドのタイムアウト（秒）。応答しない場合でも起動を止めない
+MACHINE_ID_COMMAND_TIMEOUT = 5
+
+# 複数のサービスアカウントを暗号化する場合のキー（{"service_accounts": [キー1, キー2, ...]}）
+SERVICE_ACCOUNTS_KEY = 'service_accounts'
+
+
+def read_linux_machine_id() -> str:
+    """LinuxのマシンID（/etc/machine-id）を取得"""
+    for path in ('/etc/machine-id', '/var/lib/dbus/machine-id'):
+        try:
+            with open(path, 'r', encoding='ascii') as f:
+                value = f.read().strip()
+            if value:
+                return value
+        except OSError:
+            continue
+    return None
+
+
+def read_windows_machine_guid() -> str:
+    """WindowsのMachineGuidをレジストリから取得"""
+    try:
+        import winreg
+    except ImportError:
+        return None
+    
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r'SOFTWARE\Microsoft\Cryptography', 0,
+                            winreg.KEY_READ | winreg.KEY_WOW64_64KEY) as key:
+            value, _ = winreg.QueryValueEx(key, 'MachineGuid')
+            return str(value).strip() or None
+    except OSError:
+        return None
+
+
+def read_wmic_uuid() -> str:
+    """wmicでハードウェアUUIDを取得（プロセス起動が重いため最後の手段）"""
+    try:
+        result = subprocess.run(
+            ['wmic', 'csproduct', 'get', 'UUID'],
+            capture_output=True,
+            text=True,
+            timeout=MACHINE_ID_COMMAND_TIMEOUT
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    
+    if result.returncode != 0:
+        return None
+    lines = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+    return lines[1] if len(lines) > 1 else None
+
+
+# マシンIDの取得元（上から順に試し、最初に取得できた値を使用）
+MACHINE_ID_PROVIDERS = [
+    read_linux_machine_id,
+    read_windows_machine_guid,
+    read_wmic_uuid,
+]
+
 
 class CredentialManager:
     """認証情報の暗号化・復号化を管理するクラス"""
     
+    # 導出済み暗号化キーのキャッシュ（プロセス内で共有、clear()で破棄）
+    # キーは(ソルト, パスワードのHMAC)。HMACの鍵はプロセスごとの乱数で、パスワードのハッシュをメモリに残さない
+    _key_cache = {}
+    _key_cache_lock = threading.Lock()
+    _key_cache_secret = os.urandom(32)
+    
+    # マシンIDのキャッシュ（プロセス内で1回だけ取得）
+    _machine_id = None
+    _legacy_machine_id = None
+    _machine_id_lock = threading.Lock()
+    
+    # 旧バージョンのマシンIDで復号化できたファイルのパス（次回から旧形式のIDで先に復号化する）
+    # ファイルは書き換えない（PyInstallerの展開先は一時ディレクトリで、配布物を新しいIDに紐付けると戻せないため）
+    _legacy_bound_files = set()
+    
     def __init__(self, encrypted_file_path='credentials.enc'):
         """
         初期化
@@ -40,6 +121,14 @@ class CredentialManager:
         Returns:
             暗号化キー
         """
+        # PBKDF2は重いため、同じソルトとパスワードの組み合わせはプロセス内で1回だけ導出
+        digest = hmac.new(CredentialManager._key_cache_secret, password.encode(), hashlib.sha256).digest()
+        cache_key = (bytes(salt), digest)
+        with CredentialManager._key_cache_lock:
+            key = CredentialManager._key_cache.get(cache_key)
+        if key is not None:
+            return key
+        
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
@@ -47,43 +136,88 @@ class CredentialManager:
             iterations=100000
         )
         key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        
+        with CredentialManager._key_cache_lock:
+            CredentialManager._key_cache[cache_key] = key
         return key
     
+    @classmethod
+    def clear(cls):
+        """キャッシュした暗号化キーを破棄（ログアウト・撮影停止時に呼び出す）"""
+        with cls._key_cache_lock:
+            cls._key_cache.clear()
+    
     def _get_machine_id(self) -> str:
         """
-        マシン固有のIDを生成（Windowsの場合）
+        マシン固有のIDを生成（初回のみ取得し、以降はキャッシュを使用）
         
         Returns:
             マシンID
         """
-        import platform
-        import subprocess
-        
-        machine_info = []
-        
-        # コンピューター名
-        machine_info.append(platform.node())
-        
-        # プロセッサ情報
-        machine_info.append(platform.processor())
+        with CredentialManager._machine_id_lock:
+            if CredentialManager._machine_id is None:
+                machine_info = [platform.node(), platform.processor()]
+                
+                # 取得元を順に試し、最初に取得できたIDを使用
+                for provider in MACHINE_ID_PROVIDERS:
+                    try:
+                        value = provider()
+                    except Exception:
+                        value = None
+                    if value:
+                        machine_info.append(value)
+                        break
+                
+                CredentialManager._machine_id = self._hash_machine_info(machine_info)
+            return CredentialManager._machine_id
+    
+    def _get_legacy_machine_id(self) -> str:
+        """
+        旧バージョンのマシンIDを生成（旧形式で暗号化されたファイルの復号化用）
         
-        # WindowsのマシンID取得
-        try:
-            # wmic csproduct get UUID コマンドでUUIDを取得
-            result = subprocess.run(
-                ['wmic', 'csproduct', 'get', 'UUID'],
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                if len(lines) > 1:
-                    machine_info.append(lines[1].strip())
-        except Exception:
-            pass
+        Returns:
+            マシンID
+        """
+        with CredentialManager._machine_id_lock:
+            if CredentialManager._legacy_machine_id is None:
+                machine_info = [platform.node(), platform.processor()]
+                
+                # 旧バージョンと同じ解析方法でwmicの出力を使用
+                try:
+                    result = subprocess.run(
+                        ['wmic', 'csproduct', 'get', 'UUID'],
+                        capture_output=True,
+                        text=True,
+                        timeout=MACHINE_ID_COMMAND_TIMEOUT
+                    )
+                    if result.returncode == 0:
+                        lines = result.stdout.strip().split('\n')
+                        if len(lines) > 1:
+                            machine_info.append(lines[1].strip())
+                except Exception:
+                    pass
+                
+                CredentialManager._legacy_machine_id = self._hash_machine_info(machine_info)
+            return CredentialManager._legacy_machine_id
+    
+    @staticmethod
+    def split_service_accounts(credentials: dict) -> list:
+        """
+        復号化した認証情報をサービスアカウントキーのリストに変換
         
-        # 情報を結合してハッシュ化
+        Args:
+            credentials: 復号化した認証情報（サービスアカウントキー1つ、または複数を登録した形式）
+            
+        Returns:
+            サービスアカウントキーの辞書のリスト
+        """
+        if isinstance(credentials, dict) and SERVICE_ACCOUNTS_KEY in credentials:
+            return list(credentials[SERVICE_ACCOUNTS_KEY])
+        return [credentials]
+    
+    @staticmethod
+    def _hash_machine_info(machine_info: list) -> str:
+        """マシン情報を結合してハッシュ化"""
         combined = ''.join(machine_info)
         return hashlib.sha256(combined.encode()).hexdigest()[:16]
     
@@ -92,13 +226,20 @@ class CredentialManager:
         JSONファイルを暗号化
         
         Args:
-            json_file_path: 元のJSONファイルパス
+            json_file_path: 元のJSONファイルパス（複数のサービスアカウントを登録する場合はパスのリスト）
             password: 暗号化用パスワード（use_machine_binding=Falseの場合に使用）
             use_machine_binding: マシンに紐付けた暗号化を行うか
         """
+        json_file_paths = [json_file_path] if isinstance(json_file_path, (str, Path)) else list(json_file_path)
+        
         # JSONファイルを読み込み
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            credentials = json.load(f)
+        keys = []
+        for path in json_file_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                keys.append(json.load(f))
+        
+        # 1つの場合は従来と同じ形式（旧バージョンでも復号化できる）
+        credentials = keys[0] if len(keys) == 1 else {SERVICE_ACCOUNTS_KEY: keys}
         
         # ソルトを生成
         salt = os.urandom(16)
@@ -127,16 +268,51 @@ class CredentialManager:
         encrypted_data = fernet.encrypt(json_bytes)
         
         # 暗号化データとソルトを保存
-        with open(self.encrypted_file_path, 'wb') as f:
-            f.write(salt + encrypted_data)
+        self._write_encrypted_file(salt, encrypted_data)
         
-        print(f"認証情報を暗号化しました: {self.encrypted_file_path}")
+        print(f"認証情報を暗号化しました: {self.encrypted_file_path} (サービスアカウント: {len(keys)}件)")
         
         # 元のJSONファイルを削除するか確認
-        response = input(f"元のファイル {json_file_path} を削除しますか？ (y/n): ")
-        if response.lower() == 'y':
-            os.remove(json_file_path)
-            print(f"{json_file_path} を削除しました")
+        for path in json_file_paths:
+            response = input(f"元のファイル {path} を削除しますか？ (y/n): ")
+            if response.lower() == 'y':
+                os.remove(path)
+                print(f"{path} を削除しました")
+    
+    def _write_encrypted_file(self, salt: bytes, encrypted_data: bytes):
+        """
+        ソルトと暗号化データを保存（一時ファイルに書き込んでから置き換え、書き込み途中のファイルを残さない）
+        既存のファイルを置き換える場合は、その権限を引き継ぐ
+        """
+        temp_path = self.encrypted_file_path.with_name(self.encrypted_file_path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(salt + encrypted_data)
+        if self.encrypted_file_path.exists():
+            os.chmod(temp_path, stat.S_IMODE(os.stat(self.encrypted_file_path).st_mode))
+        os.replace(temp_path, self.encrypted_file_path)
+    
+    def _binding_key(self) -> str:
+        """_legacy_bound_filesに記録するファイルのパス"""
+        return str(self.encrypted_file_path.resolve())
+    
+    def reencrypt_legacy_file(self) -> bool:
+        """
+        旧バージョンのマシンIDで暗号化されたファイルを現在のマシンIDで暗号化し直す
+        （CLIのmigrateコマンド。次回からwmicの実行と2回目の鍵導出を行わない）
+        
+        Returns:
+            暗号化し直した場合True（現在のマシンIDで暗号化されていた場合False）
+        """
+        credentials = self.decrypt_credentials(use_machine_binding=True)
+        if self._binding_key() not in CredentialManager._legacy_bound_files:
+            return False
+        
+        salt = os.urandom(16)
+        key = self._derive_key(self._get_machine_id(), salt)
+        self._write_encrypted_file(salt, Fernet(key).encrypt(json.dumps(credentials).encode()))
+        with CredentialManager._machine_id_lock:
+            CredentialManager._legacy_bound_files.discard(self._binding_key())
+        return True
     
     def decrypt_credentials(self, use_machine_binding: bool = True) -> dict:
         """
@@ -161,8 +337,10 @@ class CredentialManager:
         
         # 暗号化キーを生成
         if use_machine_binding:
-            # マシンIDを使用した自動復号化
-            machine_id = self._get_machine_id()
+            # マシンIDを使用した自動復号化（前回旧形式のIDで復号化できたファイルは旧形式のIDから試す）
+            binding_key = self._binding_key()
+            legacy_first = binding_key in CredentialManager._legacy_bound_files
+            machine_id = self._get_legacy_machine_id() if legacy_first else self._get_machine_id()
             key = self._derive_key(machine_id, salt)
         else:
             # パスワードベースの復号化
@@ -172,7 +350,20 @@ class CredentialManager:
         # 復号化
         try:
             fernet = Fernet(key)
-            decrypted_data = fernet.decrypt(encrypted_data)
+            try:
+                decrypted_data = fernet.decrypt(encrypted_data)
+            except InvalidToken:
+                if not use_machine_binding:
+                    raise
+                # もう一方のマシンIDで暗号化されたファイル（旧バージョンで暗号化したファイル・migrate済みのファイル）
+                other_id = self._get_machine_id() if legacy_first else self._get_legacy_machine_id()
+                decrypted_data = Fernet(self._derive_key(other_id, salt)).decrypt(encrypted_data)
+                # 復号化できたIDをプロセス内で記録（ファイルは書き換えない）
+                with CredentialManager._machine_id_lock:
+                    if legacy_first:
+                        CredentialManager._legacy_bound_files.discard(binding_key)
+                    else:
+                        CredentialManager._legacy_bound_files.add(binding_key)
             credentials = json.loads(decrypted_data.decode())
             return credentials
         except Exception as e:
@@ -215,6 +406,18 @@ class CredentialManager:
             
         except Exception as e:
             raise Exception(f"認証情報の取得に失敗しました: {str(e)}")
+    
+    def get_service_accounts_for_gdrive(self, password: str = None) -> list:
+        """
+        Googleドライブ用のサービスアカウントキーをすべて取得
+        
+        Args:
+            password: 復号化用パスワード（Noneの場合はマシン紐付け）
+            
+        Returns:
+            サービスアカウントキーの辞書のリスト
+        """
+        return self.split_service_accounts(self.get_credentials_for_gdrive(password=password))
 
 
 def main():
@@ -225,8 +428,9 @@ def main():
     
     if len(sys.argv) < 2:
         print("使用方法:")
-        print("  python credential_manager.py encrypt <json_file>  - JSONファイルを暗号化")
+        print("  python credential_manager.py encrypt <json_file> [<json_file> ...]  - JSONファイルを暗号化（複数指定でサービスアカウントを分散）")
         print("  python credential_manager.py decrypt              - 暗号化ファイルを復号化して表示")
+        print("  python credential_manager.py migrate              - 旧バージョンのマシンIDで暗号化したファイルを現在のマシンIDで暗号化し直す")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -236,13 +440,14 @@ def main():
             print("エラー: JSONファイルパスを指定してください")
             sys.exit(1)
         
-        json_file = sys.argv[2]
-        if not os.path.exists(json_file):
-            print(f"エラー: ファイルが見つかりません: {json_file}")
-            sys.exit(1)
+        json_files = sys.argv[2:]
+        for json_file in json_files:
+            if not os.path.exists(json_file):
+                print(f"エラー: ファイルが見つかりません: {json_file}")
+                sys.exit(1)
         
         # マシン紐付け暗号化を使用
-        manager.encrypt_credentials(json_file, use_machine_binding=True)
+        manager.encrypt_credentials(json_files, use_machine_binding=True)
         
     elif command == 'decrypt':
         try:
@@ -253,6 +458,16 @@ def main():
             print(f"復号化失敗: {str(e)}")
             sys.exit(1)
     
+    elif command == 'migrate':
+        try:
+            if manager.reencrypt_legacy_file():
+                print(f"現在のマシンIDで暗号化し直しました: {manager.encrypted_file_path}")
+            else:
+                print("現在のマシンIDで暗号化済みです（変更なし）")
+        except Exception as e:
+            print(f"暗号化し直せませんでした: {str(e)}")
+            sys.exit(1)
+    
     else:
         print(f"不明なコマンド: {command}")
         sys.exit(1)
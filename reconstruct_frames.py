@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+タイル差分からの全画面復元ツール
+Googleドライブからダウンロードしたキーフレームと差分画像（*_delta.png）から、
+各撮影時刻の全画面画像を復元します。
+
+使用方法:
+    python reconstruct_frames.py <入力フォルダ> <出力フォルダ>
+"""
+
+import os
+import re
+import sys
+from collections import defaultdict
+
+from PIL import Image
+
+from screenshot_engine.tile_delta import DELTA_SUFFIX, read_manifest, apply_delta
+
+# YYYYMMDD-ユーザー名_HHMMSS[_delta].拡張子
+FRAME_NAME_PATTERN = re.compile(r'^(\d{8})-(.+)_(\d{6})(' + re.escape(DELTA_SUFFIX) + r')?\.(\w+)$')
+
+
+def collect_frames(input_dir):
+    """入力フォルダの画像をユーザーごとに撮影時刻順で並べる"""
+    frames = defaultdict(list)
+    for name in os.listdir(input_dir):
+        match = FRAME_NAME_PATTERN.match(name)
+        if not match:
+            continue
+        date_str, username, time_str, delta, _ = match.groups()
+        frames[username].append((date_str + time_str, delta is not None, name))
+
+    for username in frames:
+        frames[username].sort()
+    return frames
+
+
+def reconstruct_user_frames(input_dir, output_dir, entries):
+    """
+    1ユーザー分のフレームを復元
+
+    Returns:
+        (復元した枚数, 警告メッセージのリスト)
+    """
+    canvas = None
+    previous_name = None
+    restored = 0
+    warnings = []
+
+    for _, is_delta, name in entries:
+        with Image.open(os.path.join(input_dir, name)) as img:
+            img.load()
+            manifest = read_manifest(img) if is_delta else None
+
+            if manifest is None:
+                # キーフレーム
+                canvas = img.convert('RGB')
+                frame_name = name
+            elif canvas is None:
+                warnings.append(f"キーフレームがないため差分をスキップ: {name}")
+                continue
+            else:
+                if manifest.get('previous') != previous_name:
+                    warnings.append(f"直前のフレームが欠落しています: {name} "
+                                    f"(期待: {manifest.get('previous')}, 実際: {previous_name})")
+                try:
+                    apply_delta(canvas, img.convert('RGB'), manifest)
+                except ValueError as e:
+                    warnings.append(f"差分を適用できません: {name} ({str(e)})")
+                    continue
+                frame_name = manifest['frame']
+
+        previous_name = frame_name
+        output_name = frame_name.rsplit('.', 1)[0] + '.png'
+        canvas.save(os.path.join(output_dir, output_name))
+        restored += 1
+
+    return restored, warnings
+
+
+def main():
+    """CLIツールとして実行"""
+    if len(sys.argv) < 3:
+        print("使用方法:")
+        print("  python reconstruct_frames.py <入力フォルダ> <出力フォルダ>")
+        sys.exit(1)
+
+    input_dir, output_dir = sys.argv[1], sys.argv[2]
+    if not os.path.isdir(input_dir):
+        print(f"エラー: フォルダが見つかりません: {input_dir}")
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    total = 0
+    for username, entries in sorted(collect_frames(input_dir).items()):
+        restored, warnings = reconstruct_user_frames(input_dir, output_dir, entries)
+        for warning in warnings:
+            print(f"警告: {warning}")
+        print(f"{username}: {restored}枚を復元しました")
+        total += restored
+
+    print(f"合計: {total}枚 -> {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+スクリーンショットツール共通エンジン
+CLI版・GUI版の両方から利用する共通処理をまとめたパッケージです。
+"""
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+撮影間隔の自動調整モジュール
+前回の撮影との差分ハッシュの距離から画面の変化量を求め、変化が大きいときは間隔を短く、
+静止しているときや画面がロックされているときは間隔を長くします。
+
+1日あたりの撮影回数の上限（予算）を超えないよう、残りの回数で当日の残り時間を
+最長間隔でも撮影しきれない場合は間隔を広げ、使い切った場合は翌日まで撮影しません。
+"""
+
+import sys
+import time
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from screenshot_engine.frame_dedup import hamming_distance
+from screenshot_engine.config import (
+    ADAPTIVE_MIN_SECONDS,
+    ADAPTIVE_MAX_SECONDS,
+    ADAPTIVE_ACTIVE_DISTANCE,
+    ADAPTIVE_STATIC_DISTANCE,
+    ADAPTIVE_BACKOFF,
+    DAILY_CAPTURE_BUDGET,
+)
+
+# 撮影回数を数える日付のタイムゾーン（ファイル名の日付と同じ）
+BUDGET_TIMEZONE = 'Asia/Tokyo'
+
+# OpenInputDesktopに渡すアクセス権
+_DESKTOP_SWITCHDESKTOP = 0x0100
+
+
+def is_session_locked() -> bool:
+    """
+    画面がロックされているか（Windowsのみ）
+
+    ロック中は入力デスクトップを開けない、または切り替えられないことで判定します。
+    その他の環境では常にFalseを返します。
+    """
+    if sys.platform != 'win32':
+        return False
+    try:
+        import ctypes
+        user32 = ctypes.windll.user32
+        desktop = user32.OpenInputDesktop(0, False, _DESKTOP_SWITCHDESKTOP)
+        if not desktop:
+            return True
+        try:
+            return not user32.SwitchDesktop(desktop)
+        finally:
+            user32.CloseDesktop(desktop)
+    except Exception:
+        return False
+
+
+class AdaptiveInterval:
+    """画面の変化量と1日の撮影回数の上限から次の撮影までの間隔を決める"""
+
+    def __init__(self, base_seconds: float, min_seconds: float = ADAPTIVE_MIN_SECONDS,
+                 max_seconds: float = ADAPTIVE_MAX_SECONDS,
+                 active_distance: int = ADAPTIVE_ACTIVE_DISTANCE,
+                 static_distance: int = ADAPTIVE_STATIC_DISTANCE,
+                 backoff: float = ADAPTIVE_BACKOFF, daily_budget: int = DAILY_CAPTURE_BUDGET,
+                 timezone: str = BUDGET_TIMEZONE, locked_func=is_session_locked,
+                 clock=time.time, log=None):
+        """
+        初期化
+
+        Args:
+            base_seconds: 変化量が中程度のときの間隔（固定間隔の設定値）
+            min_seconds: 間隔の下限
+            max_seconds: 間隔の上限
+            active_distance: 変化が大きいとみなすハッシュの距離
+            static_distance: 静止しているとみなすハッシュの距離
+            backoff: 静止・ロック中に間隔を延ばす倍率
+            daily_budget: 1日あたりの撮影回数の上限（0で制限なし）
+            timezone: 日付を判定するタイムゾーン
+            locked_func: 画面がロックされているかを返す関数
+            clock: 現在時刻（UNIX時刻）を返す関数
+            log: ログ出力関数
+        """
+        if not 0 < min_seconds <= max_seconds:
+            raise ValueError(f"撮影間隔の下限・上限が不正です: {min_seconds}, {max_seconds}")
+
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.base_seconds = min(max(base_seconds, min_seconds), max_seconds)
+        self.active_distance = active_distance
+        self.static_distance = static_distance
+        self.backoff = backoff
+        self.daily_budget = daily_budget
+        self.tz = ZoneInfo(timezone)
+        self.locked_func = locked_func
+        self.clock = clock
+        self.log = log or (lambda message: None)
+
+        self._lock = threading.Lock()
+        self._interval = self.base_seconds
+        self._previous = {}
+        self._activity = None
+        self._locked = False
+        self._day = None
+        self._count = 0
+
+    def _today(self):
+        """当日の日付（日付が変わっていれば撮影回数をリセット）"""
+        day = datetime.fromtimestamp(self.clock(), self.tz).date()
+        if day != self._day:
+            self._day = day
+            self._count = 0
+        return day
+
+    def _seconds_until_tomorrow(self) -> float:
+        """翌日の0時までの秒数"""
+        now = datetime.fromtimestamp(self.clock(), self.tz)
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), self.tz)
+        return max(1.0, (tomorrow - now).total_seconds())
+
+    @property
+    def remaining_budget(self):
+        """当日の残りの撮影回数（上限なしの場合はNone）"""
+        if not self.daily_budget:
+            return None
+        with self._lock:
+            self._today()
+            return max(0, self.daily_budget - self._count)
+
+    def begin_capture(self) -> bool:
+        """
+        撮影してよいか判定し、撮影する場合は当日の撮影回数に数える
+
+        Returns:
+            画面がロックされている場合、当日の撮影回数の上限に達した場合はFalse
+        """
+        locked = self.locked_func()
+        with self._lock:
+            self._today()
+            self._locked = locked
+            if locked:
+                self.log("画面がロックされているため撮影を省略します")
+                return False
+            if self.daily_budget and self._count >= self.daily_budget:
+                self.log(f"本日の撮影回数の上限（{self.daily_budget}回）に達したため撮影を省略します")
+                return False
+            self._count += 1
+            return True
+
+    def observe(self, frame_hash: int, key=0):
+        """
+        撮影した画面の差分ハッシュを記録（モニター別撮影ではモニターごとのkeyを指定）
+
+        前回の同じkeyのハッシュとの距離を、次の間隔の計算に使う変化量とします（複数ある場合は最大値）。
+        """
+        with self._lock:
+            previous = self._previous.get(key)
+            self._previous[key] = frame_hash
+            if previous is None:
+                return
+            distance = hamming_distance(previous, frame_hash)
+            self._activity = distance if self._activity is None else max(self._activity, distance)
+
+    def next_delay(self) -> float:
+        """
+        次の撮影までの秒数を計算（撮影のたびに1回呼び出す）
+
+        Returns:
+            秒数（下限〜上限。撮影回数の上限に達した場合は翌日0時まで）
+        """
+        with self._lock:
+            activity = self._activity
+            self._activity = None
+
+            if self._locked or (activity is not None and activity <= self.static_distance):
+                self._interval = min(self.max_seconds, self._interval * self.backoff)
+            elif activity is not None and activity >= self.active_distance:
+                self._interval = max(self.min_seconds, self._interval / 2)
+            else:
+                self._interval = self.base_seconds
+            delay = self._interval
+
+            if self.daily_budget:
+                self._today()
+                remaining = self.daily_budget - self._count
+                seconds_left = self._seconds_until_tomorrow()
+                if remaining <= 0:
+                    return seconds_left
+                # 最長間隔でも当日の残り時間を撮影しきれない場合は残りの回数で均等に割り当てる
+                if seconds_left / self.max_seconds > remaining:
+                    delay = max(delay, seconds_left / remaining)
+            return delay
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+まとめてアップロードモジュール
+撮影画像をローカルのディレクトリに溜め、一定件数または一定時間ごとに1つのアーカイブにまとめます。
+Drive APIの呼び出しは撮影1回ごとではなくアーカイブ1つごとになります。
+
+アーカイブの構成（zip / tar.gz）:
+    index.json                          索引（撮影画像ごとのファイル名・サイズ・SHA-256）
+    20240101-user_120000.png            撮影画像（ファイル名は撮影時のまま）
+    20240101-user_120100.png
+    ...
+
+アーカイブ名は最初の撮影画像の日時から 20240101-user_120000_batch.zip のように付けます。
+まとめた撮影画像は、アーカイブのアップロードかスプールへの保存が済むまで削除しません（remove()）。
+アーカイブが失われた場合はrelease()で溜めている撮影画像に戻し、次のアーカイブに含めます。
+zipfile・tarfileは読み込みに時間がかかるため、最初にアーカイブを作成する時に読み込みます（起動の高速化）。
+"""
+
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from screenshot_engine.config import (
+    BATCH_DIR,
+    BATCH_MAX_CAPTURES,
+    BATCH_MAX_SECONDS,
+    BATCH_ARCHIVE_FORMAT,
+)
+
+ARCHIVE_ZIP = 'zip'
+ARCHIVE_TAR = 'tar'
+ARCHIVE_EXTENSIONS = {ARCHIVE_ZIP: '.zip', ARCHIVE_TAR: '.tar.gz'}
+
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+
+# 索引の作成日時のタイムゾーン（撮影画像のファイル名と同じJST）
+INDEX_TIMEZONE = 'Asia/Tokyo'
+
+# 書き込み途中のファイル（起動時に削除）
+TEMP_SUFFIX = '.tmp'
+
+# 撮影画像のファイル名の YYYYMMDD-ユーザー名_HHMMSS の部分
+_STEM_PATTERN = re.compile(r'^(\d{8}-.+_\d{6})(?=[_.]|$)')
+
+
+def archive_name(first_file_name: str, archive_format: str = ARCHIVE_ZIP) -> str:
+    """最初の撮影画像のファイル名からアーカイブ名を作成（例: 20240101-user_120000_batch.zip）"""
+    match = _STEM_PATTERN.match(first_file_name)
+    stem = match.group(1) if match else first_file_name.rsplit('.', 1)[0]
+    return f"{stem}_batch{ARCHIVE_EXTENSIONS[archive_format]}"
+
+
+class CaptureBatch:
+    """撮影画像を溜めてアーカイブにまとめる"""
+
+    def __init__(self, directory: str = BATCH_DIR, max_captures: int = BATCH_MAX_CAPTURES,
+                 max_seconds: float = BATCH_MAX_SECONDS, archive_format: str = BATCH_ARCHIVE_FORMAT,
+                 clock=time.time, log=None):
+        """
+        初期化（ディレクトリに残っている撮影画像は続きとして溜める）
+
+        Args:
+            directory: 撮影画像を溜めるディレクトリ
+            max_captures: アーカイブにまとめる件数
+            max_seconds: 最も古い撮影画像からこの秒数が経過したら件数に達していなくてもまとめる
+            archive_format: アーカイブの形式（ARCHIVE_ZIP / ARCHIVE_TAR）
+            clock: 現在時刻（秒）を返す関数
+            log: ログ出力関数
+        """
+        if archive_format not in ARCHIVE_EXTENSIONS:
+            raise ValueError(f"不明なアーカイブ形式: {archive_format}")
+
+        self.directory = directory
+        self.max_captures = max_captures
+        self.max_seconds = max_seconds
+        self.archive_format = archive_format
+        self.clock = clock
+        self.log = log or (lambda message: None)
+
+        self._lock = threading.Lock()
+        # ファイル名 -> 溜めた時刻
+        self._pending = {}
+        # アーカイブにまとめ、アップロードまたはスプールへの保存を待っている撮影画像
+        self._archived = set()
+
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(TEMP_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif os.path.isfile(path):
+                self._pending[name] = os.path.getmtime(path)
+        if self._pending:
+            self.log(f"まとめてアップロード待ちの撮影画像: {len(self._pending)}件")
+
+    def __len__(self):
+        """アーカイブにまとめていない撮影画像の件数"""
+        with self._lock:
+            return len(self._pending) - len(self._archived)
+
+    def _waiting(self) -> dict:
+        """アーカイブにまとめていない撮影画像（_lockを保持して呼び出す）"""
+        return {name: added for name, added in self._pending.items() if name not in self._archived}
+
+    def add(self, file_name: str, data: bytes):
+        """撮影画像を溜める（一時ファイルに書き込んでから置き換え、書き込み途中の画像を残さない）"""
+        path = os.path.join(self.directory, file_name)
+        temp_path = path + TEMP_SUFFIX
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._pending[file_name] = self.clock()
+
+    def is_due(self) -> bool:
+        """件数または経過時間がアーカイブにまとめる条件を満たしたか"""
+        with self._lock:
+            waiting = self._waiting()
+        if not waiting:
+            return False
+        if len(waiting) >= self.max_captures:
+            return True
+        return self.clock() - min(waiting.values()) >= self.max_seconds
+
+    def _index(self, name: str, members: list) -> bytes:
+        """索引（index.json）"""
+        return json.dumps({
+            'version': INDEX_VERSION,
+            'archive': name,
+            'created_at': datetime.fromtimestamp(self.clock(), ZoneInfo(INDEX_TIMEZONE)).isoformat(),
+            'count': len(members),
+            'captures': [
+                {'name': member, 'bytes': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+                for member, data in members
+            ],
+        }, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def build_archive(self):
+        """
+        溜めた撮影画像をアーカイブにまとめる（撮影画像はremove()を呼ぶまで削除せず、以降のアーカイブには含めない）
+
+        Returns:
+            (アーカイブ名, アーカイブのデータ, まとめた撮影画像のファイル名のリスト)。溜めた撮影画像がない場合はNone
+        """
+        with self._lock:
+            names = sorted(self._waiting())
+        if not names:
+            return None
+
+        members = []
+        for member in names:
+            try:
+                with open(os.path.join(self.directory, member), 'rb') as f:
+                    members.append((member, f.read()))
+            except OSError as e:
+                # 読み込めない撮影画像は以降まとめない
+                self.log(f"まとめてアップロードの読み込みエラー: {member}: {str(e)}")
+                with self._lock:
+                    self._pending.pop(member, None)
+        if not members:
+            return None
+
+        with self._lock:
+            self._archived.update(member for member, _ in members)
+        name = archive_name(members[0][0], self.archive_format)
+        index = self._index(name, members)
+        buffer = io.BytesIO()
+        if self.archive_format == ARCHIVE_ZIP:
+            import zipfile
+            with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(INDEX_NAME, index)
+                for member, data in members:
+                    archive.writestr(member, data)
+        else:
+            import tarfile
+            with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+                for member, data in [(INDEX_NAME, index)] + members:
+                    info = tarfile.TarInfo(member)
+                    info.size = len(data)
+                    info.mtime = int(self.clock())
+                    archive.addfile(info, io.BytesIO(data))
+
+        return name, buffer.getvalue(), [member for member, _ in members]
+
+    def release(self, names: list):
+        """アーカイブが失われた撮影画像を溜めている撮影画像に戻す（次のアーカイブに含める）"""
+        with self._lock:
+            self._archived.difference_update(names)
+
+    def remove(self, names: list):
+        """アーカイブにまとめた撮影画像を削除（アーカイブのアップロードまたはスプールへの保存の後に呼び出す）"""
+        for name in names:
+            with self._lock:
+                self._pending.pop(name, None)
+                self._archived.discard(name)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
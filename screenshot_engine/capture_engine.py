@@ -0,0 +1,1038 @@
+# -*- coding: utf-8 -*-
+"""
+撮影エンジンモジュール
+撮影・エンコード・アップロード・スプール・ログ・計測をまとめたCaptureEngineを提供します。
+CLI版・GUI版はCaptureEngineを生成し、認証情報の読み込みと画面（コンソール / tkinter）のみを担当します。
+
+    engine = CaptureEngine(folder_id, load_credentials, interval_minutes=5, log_file='auto_screenshot.log')
+    engine.start()           # 撮影スレッドを起動（engine.run()は呼び出したスレッドで実行）
+    engine.snapshot()        # すぐに1回撮影
+    engine.metrics()         # 処理時間・カウンター・キューの状態
+    engine.shutdown()        # 撮影を停止し、未送信の撮影画像をスプールに退避
+
+起動を速くするため、googleapiclient・pyautogui・mss・numpyはこのモジュールの読み込み時には読み込まず、
+最初のアップロード・撮影時に読み込みます（GUI版はログイン画面の表示後）。
+"""
+
+import io
+import os
+import json
+import threading
+import traceback
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from screenshot_engine.drive_session import DriveSession, UPLOAD_BACKEND_REST
+from screenshot_engine.identity_pool import IdentityPool
+from screenshot_engine.upload_sessions import (
+    UploadSessionStore, session_key, status_query_headers, received_bytes,
+)
+from screenshot_engine.upload_pipeline import UploadJob, UploadPipeline
+from screenshot_engine.spool import CaptureSpool, SpoolReplayer
+from screenshot_engine.capture_batch import CaptureBatch
+from screenshot_engine.frame_dedup import FrameDeduplicator, dhash_bgra, dhash_image
+from screenshot_engine.tile_delta import TileDeltaEncoder, KIND_DELTA, KIND_UNCHANGED
+from screenshot_engine.image_encoder import create_encoder, mimetype_for
+from screenshot_engine.log_writer import LogWriter, cleanup_rotated_logs
+from screenshot_engine.metrics import (
+    MetricsRegistry, MetricsDumper,
+    STAGE_GRAB, STAGE_HASH, STAGE_DELTA, STAGE_CONVERT, STAGE_RESIZE, STAGE_ENCODE, STAGE_UPLOAD,
+)
+from screenshot_engine.screen_grabber import ScreenGrabber, MSS_AVAILABLE
+from screenshot_engine.frame_policy import FramePolicy
+from screenshot_engine.adaptive_interval import AdaptiveInterval
+from screenshot_engine.capture_scheduler import CaptureScheduler
+from screenshot_engine.monitor_capture import (
+    ParallelEncoder, CAPTURE_PER_MONITOR, check_capture_mode, monitor_stem,
+)
+from screenshot_engine.config import (
+    DEDUP_ENABLED,
+    DELTA_ENCODING_ENABLED,
+    IMAGE_PNG_COMPRESS_LEVEL,
+    METRICS_SERVER_ENABLED,
+    CAPTURE_MODE,
+    ADAPTIVE_INTERVAL_ENABLED,
+    DRIVE_UPLOAD_BACKEND,
+    UPLOAD_MULTIPART_MAX_BYTES,
+    UPLOAD_CHUNK_SIZE,
+    BATCH_UPLOAD_ENABLED,
+    LOG_MAX_BYTES,
+    LOG_MAX_FILES,
+)
+
+# ファイル名の日付・時刻のタイムゾーン
+FILE_NAME_TIMEZONE = 'Asia/Tokyo'
+
+# 撮影スレッドの停止を待つ最大秒数
+STOP_TIMEOUT_SECONDS = 10.0
+
+
+def pyautogui_screenshot():
+    """pyautoguiでプライマリモニターを撮影（mssが使用できない場合の代替）"""
+    import pyautogui
+    return pyautogui.screenshot()
+
+
+class CaptureEngine:
+    """撮影からアップロードまでの処理（CLI版・GUI版で共通）"""
+
+    def __init__(self, folder_id: str, credentials_loader, interval_minutes: float = 5,
+                 log_file='auto_screenshot.log', max_log_size: int = LOG_MAX_BYTES,
+                 max_log_files: int = LOG_MAX_FILES, fallback_grab=pyautogui_screenshot,
+                 grabber_factory=None, username_func=os.getlogin):
+        """
+        初期化
+
+        Args:
+            folder_id: アップロード先のGoogleドライブフォルダID
+            credentials_loader: Google Drive API用の認証情報を返す関数（失敗時はNone）
+            interval_minutes: 撮影間隔（分）
+            log_file: ログファイルのパス（呼び出すたびにパスを返す関数も指定可）
+            max_log_size: ログをローテーションするサイズ（バイト）
+            max_log_files: 保持するログの世代数
+            fallback_grab: mssが使用できない場合の撮影関数（PIL Imageを返す）
+            grabber_factory: 画面取得を生成する関数（省略時はmssのScreenGrabber）
+            username_func: ファイル名に使用するユーザー名を返す関数
+        """
+        self.folder_id = folder_id
+        self.credentials_loader = credentials_loader
+        self.interval_minutes = interval_minutes
+        self.log_file = log_file
+        self.max_log_size = max_log_size
+        self.max_log_files = max_log_files
+        self.fallback_grab = fallback_grab
+        self.grabber_factory = grabber_factory
+        self.username_func = username_func
+
+        # 機能の有効・無効（初期値はconfigの値）
+        self.dedup_enabled = DEDUP_ENABLED
+        self.delta_enabled = DELTA_ENCODING_ENABLED
+        self.capture_mode = CAPTURE_MODE
+        self.adaptive_enabled = ADAPTIVE_INTERVAL_ENABLED
+        self.metrics_server_enabled = METRICS_SERVER_ENABLED
+        self.upload_backend = DRIVE_UPLOAD_BACKEND
+        self.multipart_max_bytes = UPLOAD_MULTIPART_MAX_BYTES
+        self.upload_chunk_size = UPLOAD_CHUNK_SIZE
+        self.batch_enabled = BATCH_UPLOAD_ENABLED
+        self.mss_available = MSS_AVAILABLE or grabber_factory is not None
+
+        # ログ出力（ファイルを開いたまま保持し、バックグラウンドでまとめて書き込む）
+        self._log_writer = None
+        self._log_writer_lock = threading.Lock()
+
+        # Google Drive APIセッション（初回撮影時に構築し、以降は再利用）
+        # 複数のサービスアカウントが登録されている場合はサービスアカウントごとにセッションを持つ
+        self._identity_pool = None
+        self._drive_session_lock = threading.Lock()
+        # upload_backendが'rest'の場合にサービスアカウント間で共有する接続プール
+        self._http_pool = None
+        # 再開可能アップロードのセッションURI（初回の再開可能アップロード時に読み込む）
+        self._upload_sessions = None
+
+        # アップロードパイプライン（撮影とアップロードを分離）とオフラインスプール
+        self._upload_pipeline = None
+        self._upload_pipeline_lock = threading.Lock()
+        self._capture_spool = None
+        self._spool_replayer = None
+        # まとめてアップロード（batch_enabledの場合のみ作成）
+        self._capture_batch = None
+
+        # 処理段階ごとの所要時間とカウンター
+        self.metrics_registry = MetricsRegistry()
+        self._metrics_dumper = None
+        self._metrics_server = None
+
+        # 直前にアップロードした画面との重複判定（モニター別撮影ではモニター番号ごと）
+        self._frame_deduplicator = FrameDeduplicator()
+        self._monitor_deduplicators = {}
+
+        # タイル差分エンコーダー・画像エンコーダー・撮影範囲と縮小
+        self.delta_encoder = TileDeltaEncoder()
+        self._image_encoder = None
+        self.frame_policy = FramePolicy()
+
+        # 画面の変化量に応じた撮影間隔
+        self.adaptive_interval = AdaptiveInterval(interval_minutes * 60, log=self.log)
+
+        # 画面取得（撮影スレッドで保持して再利用）とモニター別撮影の並列エンコード
+        self._screen_grabber = None
+        self._parallel_encoder = ParallelEncoder()
+
+        # 撮影スレッド
+        self._thread = None
+        self._stop_event = None
+
+    # ----- ログ -----
+
+    def _log_path(self) -> str:
+        """ログファイルのパス"""
+        return self.log_file() if callable(self.log_file) else self.log_file
+
+    def get_log_writer(self) -> LogWriter:
+        """ログ出力を取得（ログファイルのパスが変更された場合は作り直す）"""
+        path = self._log_path()
+        writer = self._log_writer
+        if writer is not None and writer.path == path:
+            return writer
+
+        with self._log_writer_lock:
+            if self._log_writer is None or self._log_writer.path != path:
+                if self._log_writer is not None:
+                    self._log_writer.close()
+                self._log_writer = LogWriter(path, self.max_log_size, self.max_log_files)
+            return self._log_writer
+
+    def rotate_log_if_needed(self):
+        """ログファイルのサイズをチェックし、必要に応じてローテーション"""
+        self.get_log_writer().rotate_if_needed()
+
+    def cleanup_old_logs(self) -> list:
+        """保持する世代数を超えたログファイルを削除（削除したファイル名のリストを返す）"""
+        return cleanup_rotated_logs(self._log_path(), self.max_log_files)
+
+    def log_event(self, event, message, **fields):
+        """構造化ログを記録（JSON形式ではイベント名とファイル名・サイズ・処理時間などを出力）"""
+        try:
+            self.get_log_writer().write(message, event=event, **fields)
+        except Exception:
+            pass  # ログ書き込みエラーは無視
+
+    def log(self, message):
+        """ログメッセージを記録（バッファリングしてバックグラウンドで書き込み）"""
+        self.log_event(None, message)
+
+    # ----- Google Drive -----
+
+    def get_drive_service(self, file_name=None):
+        """
+        Google Drive APIのサービスオブジェクトを取得（セッションは初回のみ構築し再利用）
+
+        Args:
+            file_name: アップロードする撮影画像（撮影画像ごとにサービスアカウントを振り分ける場合に使用）
+        """
+        with self._drive_session_lock:
+            if self._identity_pool is None:
+                credentials = self.credentials_loader()
+                if not credentials:
+                    return None
+                # 認証情報のリストは複数のサービスアカウント（credentials.encに複数登録した場合）
+                if not isinstance(credentials, (list, tuple)):
+                    credentials = [credentials]
+                self._identity_pool = IdentityPool(credentials, session_factory=self._drive_session_factory(),
+                                                   log=self.log)
+                if len(self._identity_pool) > 1:
+                    self.log(f"サービスアカウント: {len(self._identity_pool)}件に振り分け "
+                             f"({self._identity_pool.shard_mode})")
+            pool = self._identity_pool
+
+        try:
+            return pool.get_service(file_name)
+        except Exception as e:
+            self.log(f"Google Drive APIサービスの取得エラー: {str(e)}")
+            return None
+
+    def _drive_session_factory(self):
+        """upload_backendに応じたセッションの作成関数（_drive_session_lockを保持して呼び出す）"""
+        if self.upload_backend != UPLOAD_BACKEND_REST:
+            return DriveSession
+
+        from screenshot_engine.drive_rest import DriveRestSession, HttpPool
+        if self._http_pool is None:
+            self._http_pool = HttpPool()
+        http_pool = self._http_pool
+        return lambda credentials: DriveRestSession(credentials, http=http_pool)
+
+    def close_drive_session(self):
+        """Google Drive APIセッションを破棄（キャッシュした暗号化キーも破棄）"""
+        with self._drive_session_lock:
+            if self._identity_pool is not None:
+                self._identity_pool.close()
+                self._identity_pool = None
+            if self._http_pool is not None:
+                self._http_pool.close()
+                self._http_pool = None
+
+        try:
+            from credential_manager import CredentialManager
+            CredentialManager.clear()
+        except ImportError:
+            pass
+
+    def upload_with_failover(self, file_name, upload):
+        """
+        振り分け先のサービスアカウントでアップロードし、レート制限を受けた場合は次のサービスアカウントで再試行
+
+        Args:
+            file_name: アップロードする撮影画像のファイル名
+            upload: Driveサービスを受け取ってアップロードし、成否を返す関数
+
+        Returns:
+            成功した場合True、失敗した場合False、Driveサービスを取得できない場合None
+        """
+        attempts = 0
+        while True:
+            service = self.get_drive_service(file_name)
+            if not service:
+                return None
+            if upload(service):
+                return True
+
+            attempts += 1
+            pool = self._identity_pool
+            if pool is None or attempts >= len(pool) or not pool.is_throttled(service):
+                return False
+            self.log(f"別のサービスアカウントで再試行: {file_name}")
+
+    def upload_file(self, local_file_path, file_name, service, mimetype=None) -> bool:
+        """Googleドライブにファイルをアップロード（MIMEタイプ省略時はファイル名から判定）"""
+        if self.upload_backend == UPLOAD_BACKEND_REST:
+            from screenshot_engine.drive_rest import FileMedia as MediaFileUpload
+        else:
+            from googleapiclient.http import MediaFileUpload
+
+        try:
+            media = MediaFileUpload(
+                local_file_path,
+                mimetype=mimetype or mimetype_for(file_name),
+                chunksize=self.upload_chunk_size,
+                resumable=self.is_resumable_upload(os.path.getsize(local_file_path))
+            )
+        except Exception as e:
+            self.log(f"Googleドライブアップロードエラー: {str(e)}")
+            return False
+
+        return self.upload_media(media, file_name, service)
+
+    def upload_bytes(self, data, file_name, service, mimetype=None) -> bool:
+        """メモリ上の画像データをGoogleドライブにアップロード（一時ファイルを作らない）"""
+        if self.upload_backend == UPLOAD_BACKEND_REST:
+            from screenshot_engine.drive_rest import BytesMedia
+            media = BytesMedia(data, mimetype or mimetype_for(file_name), chunksize=self.upload_chunk_size,
+                               resumable=self.is_resumable_upload(len(data)))
+            return self.upload_media(media, file_name, service)
+
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(
+            io.BytesIO(data),
+            mimetype=mimetype or mimetype_for(file_name),
+            chunksize=self.upload_chunk_size,
+            resumable=self.is_resumable_upload(len(data))
+        )
+        return self.upload_media(media, file_name, service)
+
+    def is_resumable_upload(self, size: int) -> bool:
+        """再開可能アップロードを使うか（小さい撮影画像はマルチパートの1リクエストで送信）"""
+        return size > self.multipart_max_bytes
+
+    def get_upload_sessions(self) -> UploadSessionStore:
+        """再開可能アップロードのセッションURIの保存先を取得（初回のみ読み込み）"""
+        with self._drive_session_lock:
+            if self._upload_sessions is None:
+                self._upload_sessions = UploadSessionStore(log=self.log)
+            return self._upload_sessions
+
+    def start_upload_session(self, request) -> str:
+        """
+        再開可能アップロードのセッションを開始（最初の分割を送る前にセッションURIを保存できるよう、分割は送信しない）
+
+        Returns:
+            セッションURI
+        """
+        if self.upload_backend == UPLOAD_BACKEND_REST:
+            return request.start_session()
+
+        from googleapiclient.errors import ResumableUploadError
+
+        # HttpRequest.next_chunk()のセッション開始と同じリクエスト
+        headers = dict(request.headers)
+        headers['X-Upload-Content-Type'] = request.resumable.mimetype()
+        headers['X-Upload-Content-Length'] = str(request.resumable.size())
+        headers['content-length'] = str(request.body_size)
+        resp, content = request.http.request(request.uri, method=request.method, body=request.body,
+                                             headers=headers)
+        if resp.status != 200 or 'location' not in resp:
+            raise ResumableUploadError(resp, content)
+        request.resumable_uri = resp['location']
+        return request.resumable_uri
+
+    def resume_upload_session(self, request, uri, size):
+        """
+        保存したセッションの受信済みの範囲を問い合わせ（Content-Range: bytes */合計 の空のPUT）、
+        続きから送信するようrequestのresumable_uri・resumable_progressを設定
+
+        Returns:
+            アップロードが完了していた場合は作成されたファイルのメタデータ、未完了の場合None
+        """
+        request.resumable_uri = uri
+        if self.upload_backend == UPLOAD_BACKEND_REST:
+            _, response = request.query_progress()
+            return response
+
+        from googleapiclient.errors import HttpError
+
+        resp, content = request.http.request(uri, method='PUT', body=b'', headers=status_query_headers(size))
+        if resp.status in (200, 201):
+            return json.loads(content)
+        if resp.status != 308:
+            raise HttpError(resp, content, uri=uri)
+        request.resumable_progress = received_bytes(resp.get('range'))
+        return None
+
+    def execute_upload(self, service, file_metadata, media, file_name) -> dict:
+        """
+        files.createを実行（再開可能アップロードはセッションURIを保存し、中断した場合は次回続きから送信）
+
+        Returns:
+            作成されたファイルのメタデータ
+        """
+        def create():
+            return service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id, name',
+                supportsAllDrives=True
+            )
+
+        if not media.resumable():
+            self.metrics_registry.increment('multipart_uploads')
+            return create().execute()
+
+        self.metrics_registry.increment('resumable_uploads')
+        sessions = self.get_upload_sessions()
+        key = session_key(self.folder_id, file_name, media.size())
+        request = create()
+        saved_uri = sessions.get(key)
+        resumed = saved_uri is not None
+
+        try:
+            response = None
+            if resumed:
+                self.metrics_registry.increment('resumed_uploads')
+                self.log(f"中断したアップロードを再開: {file_name}")
+                response = self.resume_upload_session(request, saved_uri, media.size())
+            else:
+                # 最初の分割で失敗しても再開できるよう、送信前にセッションURIを保存
+                sessions.put(key, self.start_upload_session(request))
+            while response is None:
+                _, response = request.next_chunk()
+        except Exception as e:
+            if getattr(getattr(e, 'resp', None), 'status', None) in (404, 410):
+                # セッションが見つからない（期限切れ）: 保存したセッションから再開した場合は最初から送り直す
+                sessions.remove(key)
+                if resumed:
+                    self.log(f"アップロードセッションの期限切れ。最初から送信します: {file_name}")
+                    return self.execute_upload(service, file_metadata, media, file_name)
+            raise
+
+        sessions.remove(key)
+        return response
+
+    def upload_media(self, media, file_name, service) -> bool:
+        """アップロード用のメディアをGoogleドライブに送信"""
+        if self.upload_backend == UPLOAD_BACKEND_REST:
+            # DriveRestErrorもHttpErrorと同じくresp・contentを持つ
+            from screenshot_engine.drive_rest import DriveRestError as HttpError
+        else:
+            from googleapiclient.errors import HttpError
+
+        upload_timer = self.metrics_registry.timer(STAGE_UPLOAD)
+        try:
+            file_metadata = {
+                'name': file_name,
+                'parents': [self.folder_id]
+            }
+
+            # ファイルをアップロード（共有ドライブ対応）
+            with upload_timer:
+                file = self.execute_upload(service, file_metadata, media, file_name)
+
+            self.metrics_registry.record_upload(media.size())
+            if self._identity_pool is not None:
+                self._identity_pool.record_success(service)
+            self.log_event('upload', f"アップロード成功: {file_name} (ID: {file.get('id')})",
+                           file_name=file_name, bytes=media.size(), upload_ms=upload_timer.ms)
+            return True
+
+        except HttpError as e:
+            self.metrics_registry.record_failure(e.resp.status)
+            fields = {'file_name': file_name, 'upload_ms': upload_timer.ms, 'http_status': e.resp.status}
+            pool = self._identity_pool
+            if pool is not None:
+                # レート制限の場合はこのサービスアカウントを一定時間使わない
+                pool.record_failure(service, e.resp.status, e.content, e.resp.get('retry-after'))
+            if e.resp.status == 404:
+                self.log_event('upload_error', f"エラー: 指定されたフォルダIDが見つかりません: {self.folder_id}",
+                               **fields)
+            elif e.resp.status == 401:
+                # 認証エラーの場合は次回トークンを再取得させる
+                if pool is not None:
+                    pool.invalidate(service)
+                self.log_event('upload_error', f"Googleドライブ認証エラー (HTTP {e.resp.status}): {str(e)}", **fields)
+            else:
+                self.log_event('upload_error', f"Googleドライブアップロードエラー (HTTP {e.resp.status}): {str(e)}",
+                               **fields)
+            return False
+        except Exception as e:
+            self.metrics_registry.record_failure()
+            self.log_event('upload_error', f"Googleドライブアップロードエラー: {str(e)}", file_name=file_name)
+            return False
+
+    # ----- 撮影 -----
+
+    def get_image_encoder(self):
+        """画像エンコーダーを取得（初回のみ作成）"""
+        if self._image_encoder is None:
+            self._image_encoder = create_encoder(log=self.log)
+            self.log(f"画像形式: {self._image_encoder.describe()}")
+        return self._image_encoder
+
+    def _get_deduplicator(self, monitor_index=0) -> FrameDeduplicator:
+        """重複判定（モニター別撮影ではモニターごと）"""
+        if monitor_index:
+            return self._monitor_deduplicators.setdefault(monitor_index, FrameDeduplicator())
+        return self._frame_deduplicator
+
+    def is_duplicate_frame(self, frame_hash, file_name, monitor_index=0) -> bool:
+        """直前にアップロードした画面と変化がないか判定（比較対象の記録はアップロード後）"""
+        duplicate, distance = self._get_deduplicator(monitor_index).check(frame_hash)
+        if duplicate:
+            self.metrics_registry.increment('skipped_unchanged')
+            self.log_event('skip_unchanged', f"画面変化なしのためアップロードを省略: {file_name} (距離: {distance})",
+                           file_name=file_name)
+            return True
+        return False
+
+    def mark_frame_uploaded(self, job):
+        """
+        アップロードした（またはまとめてアップロード用に保存した）撮影画像を重複判定の比較対象として記録
+
+        撮影時に記録すると、キューから破棄された撮影画像と同じ画面が以降アップロードされなくなるため、
+        撮影画像が失われないことが確定してから記録する。
+        """
+        if job.frame_hash is not None:
+            self._get_deduplicator(job.monitor_index).mark_uploaded(job.frame_hash)
+
+    def _observe_frame(self, frame_hash, file_name, monitor_index=0) -> bool:
+        """
+        撮影間隔の調整に画面のハッシュを記録し、重複判定を行う
+
+        Returns:
+            変化のない画面でアップロードを省略する場合True
+        """
+        self.adaptive_interval.observe(frame_hash, key=monitor_index)
+        return self.dedup_enabled and self.is_duplicate_frame(frame_hash, file_name, monitor_index)
+
+    def apply_frame_policy(self, img, origin, file_name):
+        """撮影範囲の指定と縮小を適用（タイル差分アップロードでは画像の大きさを変えないため適用しない）"""
+        if not self.frame_policy.enabled or self.delta_enabled:
+            return img
+
+        with self.metrics_registry.timer(STAGE_RESIZE):
+            result = self.frame_policy.apply(img, origin)
+        if result is None:
+            self.log_event('skip_roi', f"前面のウィンドウが撮影範囲にないためアップロードを省略: {file_name}",
+                           file_name=file_name)
+        return result
+
+    def get_screen_grabber(self) -> ScreenGrabber:
+        """撮影スレッドの画面取得を取得（別のスレッドで作られたものは作り直す）"""
+        if self._screen_grabber is not None and not self._screen_grabber.owned_by_current_thread():
+            self._screen_grabber.close()
+            self._screen_grabber = None
+        if self._screen_grabber is None:
+            if self.grabber_factory is not None:
+                self._screen_grabber = self.grabber_factory()
+            else:
+                self._screen_grabber = ScreenGrabber(log=self.log)
+        return self._screen_grabber
+
+    def close_screen_grabber(self):
+        """画面取得と並列エンコードのスレッドを閉じる（撮影スレッドの終了時に呼び出す）"""
+        if self._screen_grabber is not None:
+            self._screen_grabber.close()
+            self._screen_grabber = None
+        self._parallel_encoder.close()
+
+    def _file_stem(self) -> str:
+        """撮影時刻のファイル名（拡張子なし、例: 20240101-user_103000）"""
+        now = datetime.now(ZoneInfo(FILE_NAME_TIMEZONE))
+        return f"{now.strftime('%Y%m%d')}-{self.username_func()}_{now.strftime('%H%M%S')}"
+
+    def capture_screenshot(self):
+        """
+        全モニターを含む仮想画面を撮影してメモリ上でエンコード
+
+        Returns:
+            UploadJob（撮影画像のファイル名とエンコード済みデータ）。画面に変化がない場合はNone
+        """
+        # Googleドライブでは同名ファイルも保存可能だが、識別しやすくするため時刻を付与
+        encoder = self.get_image_encoder()
+        file_name = encoder.file_name(self._file_stem())
+        metrics = self.metrics_registry
+        track_hash = self.dedup_enabled or self.adaptive_enabled
+        frame_hash = None
+
+        self.log(f"スクリーンショット撮影開始: {file_name}")
+
+        try:
+            if not self.mss_available:
+                raise ImportError("mss not available")
+
+            # monitors[0]は全モニターを含む仮想画面（mssのインスタンスは撮影間で再利用）
+            grabber = self.get_screen_grabber()
+            with metrics.timer(STAGE_GRAB) as grab:
+                screenshot = grabber.grab(0)
+            metrics.increment('captures')
+            metrics.increment('bytes_captured', len(screenshot.raw))
+
+            # 変化のない画面はエンコード・アップロードしない（ハッシュは撮影間隔の調整にも使用）
+            if track_hash:
+                with metrics.timer(STAGE_HASH):
+                    frame_hash = dhash_bgra(screenshot.raw, screenshot.width, screenshot.height)
+                if self._observe_frame(frame_hash, file_name):
+                    return None
+
+            # 差分モードでは前回から変化したタイルのみを保存
+            if self.delta_enabled:
+                with metrics.timer(STAGE_DELTA):
+                    delta = self.delta_encoder.encode(screenshot.raw, screenshot.width, screenshot.height, file_name)
+                if delta.kind == KIND_UNCHANGED:
+                    metrics.increment('skipped_unchanged')
+                    self.log_event('skip_unchanged', f"画面変化なしのためアップロードを省略: {file_name}",
+                                   file_name=file_name)
+                    return None
+                if delta.kind == KIND_DELTA:
+                    with metrics.timer(STAGE_ENCODE) as encode:
+                        data = delta.to_bytes(compress_level=IMAGE_PNG_COMPRESS_LEVEL)
+                    metrics.increment('bytes_encoded', len(data))
+                    self.log_event('capture', f"差分タイルエンコード完了: {delta.file_name} "
+                                   f"({delta.changed_tiles}タイル, {len(data)} bytes)",
+                                   file_name=delta.file_name, bytes=len(data),
+                                   capture_ms=grab.ms, encode_ms=encode.ms)
+                    return UploadJob(delta.file_name, data, frame_hash=frame_hash)
+
+            # PIL Imageに変換（変換先の画像は撮影間で再利用し、フレームバッファ全体のコピーを作らない）
+            with metrics.timer(STAGE_CONVERT) as convert:
+                img = grabber.to_image(screenshot)
+            monitor = grabber.monitors[0]
+            img = self.apply_frame_policy(img, (monitor['left'], monitor['top']), file_name)
+            if img is None:
+                return None
+            with metrics.timer(STAGE_ENCODE) as encode:
+                data = encoder.encode_bytes(img)
+            metrics.increment('bytes_encoded', len(data))
+            self.log_event('capture', f"全画面スクリーンショットエンコード完了: {file_name} ({len(data)} bytes)",
+                           file_name=file_name, bytes=len(data), capture_ms=grab.ms,
+                           encode_ms=round(convert.ms + encode.ms, 1))
+
+        except Exception:
+            # mssが使用できない場合は通常の方法（プライマリモニターのみ）
+            self.log("全画面撮影に失敗。プライマリモニターのみ撮影します。")
+            with metrics.timer(STAGE_GRAB) as grab:
+                screenshot = self.fallback_grab()
+            metrics.increment('captures')
+            metrics.increment('bytes_captured', screenshot.width * screenshot.height * len(screenshot.getbands()))
+            # 仮想画面と大きさが異なるため、次回の差分はキーフレームから始める
+            self.delta_encoder.reset()
+            if track_hash:
+                with metrics.timer(STAGE_HASH):
+                    frame_hash = dhash_image(screenshot)
+                if self._observe_frame(frame_hash, file_name):
+                    return None
+            # pyautoguiはプライマリモニター（仮想画面の原点）を撮影する
+            img = self.apply_frame_policy(screenshot, (0, 0), file_name)
+            if img is None:
+                return None
+            with metrics.timer(STAGE_ENCODE) as encode:
+                data = encoder.encode_bytes(img)
+            metrics.increment('bytes_encoded', len(data))
+            self.log_event('capture', f"スクリーンショットエンコード完了: {file_name} ({len(data)} bytes)",
+                           file_name=file_name, bytes=len(data), capture_ms=grab.ms, encode_ms=encode.ms)
+
+        return UploadJob(file_name, data, encoder.mimetype, frame_hash=frame_hash)
+
+    def capture_monitor_screenshots(self) -> list:
+        """
+        モニターごとに撮影して並列にエンコード
+
+        Returns:
+            UploadJobのリスト（同じ撮影時刻のファイル名に _m1, _m2 ... を付ける。変化のないモニターは含まない）
+        """
+        stem = self._file_stem()
+        encoder = self.get_image_encoder()
+        grabber = self.get_screen_grabber()
+        metrics = self.metrics_registry
+
+        self.log(f"モニター別スクリーンショット撮影開始: {stem}")
+
+        # monitors[1:]が各モニター（変換先の画像はモニターごとに再利用）
+        file_names = []
+        images = []
+        frames = []
+        grab_ms = 0.0
+        for index in range(1, len(grabber.monitors)):
+            file_name = encoder.file_name(monitor_stem(stem, index))
+            with metrics.timer(STAGE_GRAB) as grab:
+                screenshot = grabber.grab(index)
+            grab_ms += grab.ms
+            metrics.increment('captures')
+            metrics.increment('bytes_captured', len(screenshot.raw))
+
+            frame_hash = None
+            if self.dedup_enabled or self.adaptive_enabled:
+                with metrics.timer(STAGE_HASH):
+                    frame_hash = dhash_bgra(screenshot.raw, screenshot.width, screenshot.height)
+                if self._observe_frame(frame_hash, file_name, monitor_index=index):
+                    continue
+
+            with metrics.timer(STAGE_CONVERT):
+                img = grabber.to_image(screenshot, index)
+            monitor = grabber.monitors[index]
+            img = self.apply_frame_policy(img, (monitor['left'], monitor['top']), file_name)
+            if img is None:
+                continue
+            images.append(img)
+            file_names.append(file_name)
+            frames.append((frame_hash, index))
+
+        if not images:
+            return []
+
+        # PillowはエンコードのあいだGILを解放するため、スレッドで並列にエンコード
+        with metrics.timer(STAGE_ENCODE) as encode:
+            encoded = self._parallel_encoder.encode_all(encoder, images)
+
+        jobs = []
+        for file_name, data, (frame_hash, index) in zip(file_names, encoded, frames):
+            metrics.increment('bytes_encoded', len(data))
+            self.log_event('capture', f"モニター別スクリーンショットエンコード完了: {file_name} ({len(data)} bytes)",
+                           file_name=file_name, bytes=len(data), capture_ms=round(grab_ms, 1),
+                           encode_ms=encode.ms)
+            jobs.append(UploadJob(file_name, data, encoder.mimetype, group=stem,
+                                  frame_hash=frame_hash, monitor_index=index))
+        return jobs
+
+    def capture_screenshots(self) -> list:
+        """
+        撮影方式（capture_mode）に応じて撮影
+
+        Returns:
+            UploadJobのリスト（画面に変化がない場合は空）
+        """
+        if check_capture_mode(self.capture_mode) == CAPTURE_PER_MONITOR and self.mss_available:
+            try:
+                return self.capture_monitor_screenshots()
+            except Exception as e:
+                self.log(f"モニター別撮影に失敗。全画面を撮影します: {str(e)}")
+
+        job = self.capture_screenshot()
+        return [job] if job is not None else []
+
+    # ----- アップロードパイプライン -----
+
+    def spool_job(self, job) -> bool:
+        """アップロードできなかった撮影画像をスプールに保存（ディスクに書き出すのはこの場合のみ）"""
+        try:
+            self.get_capture_spool().add(job.file_name, data=job.data)
+            self.metrics_registry.increment('spooled')
+            self.finish_batch_job(job, stored=True)
+            return True
+        except Exception as e:
+            self.log(f"スプール保存エラー: {str(e)}")
+            self.finish_batch_job(job, stored=False)
+            return False
+
+    def finish_batch_job(self, job, stored: bool):
+        """
+        アーカイブのジョブが終わったら、まとめた撮影画像を片付ける
+
+        Args:
+            job: UploadJob（アーカイブ以外は何もしない）
+            stored: アーカイブをアップロード・スプールに保存できた場合True（撮影画像を削除）。
+                    Falseの場合は撮影画像を溜めている撮影画像に戻し、次のアーカイブに含める
+        """
+        batch = self._capture_batch
+        if not job.batch_members or batch is None:
+            return
+        if stored:
+            batch.remove(job.batch_members)
+        else:
+            batch.release(job.batch_members)
+
+    def process_upload_job(self, job) -> bool:
+        """アップロードワーカーから呼ばれ、撮影画像をGoogleドライブにアップロード"""
+        success = False
+        try:
+            # Googleドライブにアップロード（レート制限時は別のサービスアカウントに切り替え）
+            result = self.upload_with_failover(
+                job.file_name,
+                lambda service: self.upload_bytes(job.data, job.file_name, service, job.mimetype)
+            )
+            if result is None:
+                self.log("Google Drive APIサービスの取得に失敗しました")
+                self.log(f"アップロード失敗: {job.file_name}")
+                self.metrics_registry.record_failure()
+                return False
+
+            if result:
+                success = True
+                self.mark_frame_uploaded(job)
+                self.finish_batch_job(job, stored=True)
+                self.log(f"処理完了: {job.file_name}")
+                # 接続できたのでスプールの再送を促す
+                replayer = self._spool_replayer
+                if replayer is not None:
+                    replayer.notify(online=True)
+                return True
+
+            self.log(f"アップロード失敗: {job.file_name}")
+            return False
+
+        finally:
+            # 失敗した撮影画像はスプールに退避
+            if not success:
+                self.spool_job(job)
+
+    def discard_upload_job(self, job, reason):
+        """
+        キューから破棄されたジョブをスプールに退避
+
+        どのオーバーフローポリシーで破棄されたジョブも退避する（差分タイルは前の撮影がないと復元できず、
+        まとめてアップロードのアーカイブは複数の撮影を含むため、破棄すると取り戻せない）。
+        """
+        self.spool_job(job)
+
+    def replay_spool_entry(self, entry) -> bool:
+        """スプールに保存された撮影画像を再送"""
+        result = self.upload_with_failover(
+            entry.file_name,
+            lambda service: self.upload_file(entry.path, entry.file_name, service)
+        )
+        return bool(result)
+
+    def get_capture_spool(self) -> CaptureSpool:
+        """スプールを取得（初回のみ作成）"""
+        with self._upload_pipeline_lock:
+            if self._capture_spool is None:
+                self._capture_spool = CaptureSpool(log=self.log)
+            return self._capture_spool
+
+    def get_capture_batch(self) -> CaptureBatch:
+        """まとめてアップロード用の保存先を取得（初回のみ作成）"""
+        with self._upload_pipeline_lock:
+            if self._capture_batch is None:
+                self._capture_batch = CaptureBatch(log=self.log)
+            return self._capture_batch
+
+    def add_to_batch(self, jobs, pipeline=None):
+        """撮影画像を溜め、件数・経過時間の条件を満たしたらアーカイブにまとめてアップロードキューに登録"""
+        pipeline = pipeline or self.get_upload_pipeline()
+        batch = self.get_capture_batch()
+        for job in jobs:
+            try:
+                batch.add(job.file_name, job.data)
+                self.mark_frame_uploaded(job)
+            except OSError as e:
+                # 保存できない場合はまとめずにアップロード
+                self.log(f"まとめてアップロードの保存エラー: {str(e)}")
+                pipeline.submit(job)
+
+        # 撮影しなかった場合（画面変化なしなど）も経過時間を確認する
+        if batch.is_due():
+            self.flush_batch(pipeline)
+
+    def flush_batch(self, pipeline=None):
+        """
+        溜めた撮影画像をアーカイブにまとめてアップロードキューに登録
+
+        Returns:
+            登録したUploadJob（溜めた撮影画像がない場合はNone）
+        """
+        batch = self.get_capture_batch()
+        archive = batch.build_archive()
+        if archive is None:
+            return None
+
+        name, data, members = archive
+        # 溜めた撮影画像は、アーカイブのアップロードかスプールへの保存が済んでから削除する（finish_batch_job）
+        job = UploadJob(name, data, mimetype_for(name), batch_members=members)
+        (pipeline or self.get_upload_pipeline()).submit(job)
+        self.metrics_registry.increment('batch_archives')
+        self.log(f"まとめてアップロード: {name} ({len(members)}件, {len(data)}バイト)")
+        return job
+
+    def get_upload_pipeline(self) -> UploadPipeline:
+        """アップロードパイプラインを取得（初回のみワーカーとスプール再送・計測結果の書き出しを起動）"""
+        spool = self.get_capture_spool()
+        with self._upload_pipeline_lock:
+            if self._upload_pipeline is None:
+                self._upload_pipeline = UploadPipeline(
+                    self.process_upload_job,
+                    on_drop=self.discard_upload_job,
+                    log=self.log
+                )
+                self._upload_pipeline.start()
+                self.log(f"アップロードワーカー起動: {self._upload_pipeline.workers}スレッド")
+
+                self._spool_replayer = SpoolReplayer(spool, self.replay_spool_entry, log=self.log)
+                self._spool_replayer.start()
+
+                self._metrics_dumper = MetricsDumper(self.metrics_registry, extra=self.get_pipeline_status,
+                                                     log=self.log)
+                self._metrics_dumper.start()
+
+                if self.metrics_server_enabled:
+                    # http.serverの読み込みは有効な場合のみ
+                    from screenshot_engine.metrics_server import MetricsServer
+                    self._metrics_server = MetricsServer(self.metrics, log=self.log)
+                    self._metrics_server.start()
+            return self._upload_pipeline
+
+    def stop_upload_pipeline(self, timeout=10.0):
+        """アップロードパイプラインを停止し、未処理のジョブをスプールに退避"""
+        with self._upload_pipeline_lock:
+            pipeline = self._upload_pipeline
+            replayer = self._spool_replayer
+            dumper = self._metrics_dumper
+            server = self._metrics_server
+            self._upload_pipeline = None
+            self._spool_replayer = None
+            self._metrics_dumper = None
+            self._metrics_server = None
+
+        if replayer is not None:
+            replayer.stop()
+        if dumper is not None:
+            dumper.stop()
+        if server is not None:
+            server.stop()
+
+        if pipeline is None:
+            return
+
+        for job in pipeline.stop(timeout=timeout):
+            self.log(f"未アップロードのままスプールに退避: {job.file_name}")
+            self.spool_job(job)
+
+    def get_pipeline_status(self) -> dict:
+        """アップロードキューとスプールの状態"""
+        pipeline = self._upload_pipeline
+        spool = self._capture_spool
+        status = {
+            'queue_depth': pipeline.qsize() if pipeline is not None else 0,
+            'spool_entries': len(spool) if spool is not None else 0,
+            'spool_bytes': spool.size_bytes() if spool is not None else 0,
+        }
+        batch = self._capture_batch
+        if batch is not None:
+            status['batch_pending'] = len(batch)
+        pool = self._identity_pool
+        if pool is not None and len(pool) > 1:
+            status['identities'] = pool.stats()
+        http_pool = self._http_pool
+        if http_pool is not None:
+            status['http_pool'] = http_pool.stats()
+        return status
+
+    def metrics(self) -> dict:
+        """処理段階ごとの所要時間・カウンター・キューの状態を取得"""
+        snapshot = self.metrics_registry.snapshot()
+        snapshot.update(self.get_pipeline_status())
+        return snapshot
+
+    # ----- 撮影スケジュール -----
+
+    def get_capture_interval(self) -> float:
+        """次の撮影までの秒数（adaptive_enabled時は画面の変化量と1日の撮影回数の上限から決める）"""
+        if not self.adaptive_enabled:
+            return self.interval_minutes * 60
+
+        delay = self.adaptive_interval.next_delay()
+        self.log_event('capture_interval', f"次の撮影まで{delay:.0f}秒")
+        return delay
+
+    def snapshot(self) -> list:
+        """
+        スクリーンショットを撮影してアップロードキューに登録（アップロードはバックグラウンドで実行）
+
+        Returns:
+            登録したUploadJobのリスト（撮影しなかった場合やエラー時は空）
+        """
+        try:
+            # 画面のロック中・1日の撮影回数の上限に達した場合は撮影しない
+            if self.adaptive_enabled and not self.adaptive_interval.begin_capture():
+                return []
+
+            # モニター別撮影では同じ撮影時刻のジョブをまとめて登録
+            pipeline = self.get_upload_pipeline()
+            jobs = self.capture_screenshots()
+            if self.batch_enabled:
+                self.add_to_batch(jobs, pipeline)
+                return jobs
+            for job in jobs:
+                pipeline.submit(job)
+            return jobs
+
+        except Exception as e:
+            self.log(f"エラー発生: {str(e)}")
+            self.log(f"トレースバック: {traceback.format_exc()}")
+            return []
+
+    def run(self, stop_event: threading.Event = None):
+        """
+        停止要求があるまで撮影を繰り返す（呼び出したスレッドで実行し、初回はすぐに撮影）
+
+        Args:
+            stop_event: 停止要求のイベント（セットされると待機中でもすぐに終了）
+        """
+        scheduler = CaptureScheduler(self.snapshot, self.get_capture_interval, stop_event=stop_event,
+                                     log=self.log)
+        try:
+            scheduler.run()
+        finally:
+            # 画面取得はこのスレッド専用のため、終了時に閉じる
+            self.close_screen_grabber()
+
+    def start(self) -> bool:
+        """
+        撮影スレッドを起動
+
+        Returns:
+            起動した場合True（すでに撮影中の場合はFalse）
+        """
+        if self.is_running():
+            return False
+
+        # 停止直後に再開した場合は、前の撮影スレッドが画面取得を閉じ終わるまで待つ
+        if self._thread is not None:
+            self._thread.join(STOP_TIMEOUT_SECONDS)
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.run, args=(self._stop_event,),
+                                        name="capture", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = None):
+        """
+        撮影スレッドを停止（アップロードパイプラインは停止しない）
+
+        Args:
+            timeout: 撮影スレッドの終了を待つ秒数（Noneの場合は待たない）
+        """
+        if self._stop_event is not None:
+            self._stop_event.set()
+        thread = self._thread
+        if timeout is not None and thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def is_running(self) -> bool:
+        """撮影スレッドが動作中か"""
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+
+    def shutdown(self, timeout: float = STOP_TIMEOUT_SECONDS):
+        """撮影を停止し、未送信の撮影画像をスプールに退避してGoogle Drive APIセッションを破棄"""
+        self.stop(timeout=timeout)
+        self.stop_upload_pipeline(timeout=timeout)
+        self.close_drive_session()
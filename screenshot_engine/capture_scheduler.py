@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+撮影スケジューラーモジュール
+1秒ごとに予定を確認するループの代わりに、次の撮影予定時刻まで1回のEvent.waitで待機します。
+停止要求があれば待機中でもすぐに終了し、予定時刻は前回の予定時刻を基準に決めるため
+撮影処理にかかった時間で間隔がずれません。
+
+待機の長さは単調時計で測られ、OSのスリープ中は進まない場合があるため、予定時刻は
+実時刻で管理し、待機はSCHEDULER_MAX_WAIT_SECONDSごとに区切ります。予定時刻より大きく
+遅れて起きた場合はスリープからの復帰とみなし、遅れた分をまとめて撮影せずに予定を組み直します。
+"""
+
+import time
+import threading
+
+from screenshot_engine.config import (
+    SCHEDULER_MAX_WAIT_SECONDS,
+    SCHEDULER_RESUME_THRESHOLD_SECONDS,
+)
+
+
+class CaptureScheduler:
+    """次の予定時刻まで待機して撮影処理を繰り返し実行"""
+
+    def __init__(self, job, interval_func, stop_event: threading.Event = None,
+                 max_wait: float = SCHEDULER_MAX_WAIT_SECONDS,
+                 resume_threshold: float = SCHEDULER_RESUME_THRESHOLD_SECONDS,
+                 clock=time.time, log=None):
+        """
+        初期化
+
+        Args:
+            job: 予定時刻に実行する関数
+            interval_func: 次の実行までの秒数を返す関数（実行のたびに呼び出す）
+            stop_event: 停止要求のイベント（省略時は新しく作成）
+            max_wait: 1回の待機の最大秒数
+            resume_threshold: スリープからの復帰とみなす予定時刻からの遅れ（秒）
+            clock: 実時刻（UNIX時刻）を返す関数
+            log: ログ出力関数
+        """
+        self.job = job
+        self.interval_func = interval_func
+        self.stop_event = stop_event or threading.Event()
+        self.max_wait = max_wait
+        self.resume_threshold = resume_threshold
+        self.clock = clock
+        self.log = log or (lambda message: None)
+
+        self.next_run = None
+        self.interval = None
+
+        # 統計情報
+        self.runs = 0
+        self.wakeups = 0
+        self.resumes = 0
+
+    def run(self, run_immediately: bool = True):
+        """
+        停止要求があるまで予定時刻ごとにjobを実行（呼び出したスレッドで実行）
+
+        Args:
+            run_immediately: 最初の1回をすぐに実行するか
+        """
+        now = self.clock()
+        if run_immediately:
+            self.next_run = now
+        else:
+            self.interval = self.interval_func()
+            self.next_run = now + self.interval
+
+        while not self.stop_event.is_set():
+            now = self.clock()
+            remaining = self.next_run - now
+            if self.interval is not None and remaining > self.interval:
+                # 実時刻が戻された場合は予定時刻を現在時刻から間隔以内に収める
+                self.next_run = now + self.interval
+                remaining = self.interval
+            if remaining > 0:
+                # 停止要求があればすぐに戻る
+                self.stop_event.wait(min(remaining, self.max_wait))
+                self.wakeups += 1
+                continue
+
+            late = -remaining
+            self._run_job()
+            interval = self.interval = self.interval_func()
+            now = self.clock()
+
+            if late >= self.resume_threshold:
+                # スリープからの復帰や実時刻の変更：遅れた分は撮影せず現在時刻から組み直す
+                self.resumes += 1
+                self.log(f"予定時刻から{late:.0f}秒遅れて起動しました（スリープからの復帰）。撮影予定を組み直します")
+                self.next_run = now + interval
+            else:
+                # 前回の予定時刻を基準にする（処理時間で間隔がずれない）。処理が間隔より長い場合はすぐに実行
+                self.next_run = max(self.next_run + interval, now)
+
+    def _run_job(self):
+        """jobを実行（例外は記録して次の予定を続ける）"""
+        self.runs += 1
+        try:
+            self.job()
+        except Exception as e:
+            self.log(f"スケジューラーの実行エラー: {str(e)}")
+
+    def stop(self):
+        """停止を要求（待機中でもすぐに終了する）"""
+        self.stop_event.set()
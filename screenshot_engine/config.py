@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+共通エンジンの設定定数
+CLI版・GUI版で共有するチューニング用の設定（ハードコード）です。
+"""
+
+# ===== Google Drive APIセッション =====
+# アクセストークンの有効期限がこの秒数以内に迫ったら事前に更新する
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# Drive API通信のタイムアウト（秒）
+HTTP_TIMEOUT_SECONDS = 60
+
+# ===== 画像形式 =====
+# 保存形式（'png' / 'webp_lossless' / 'webp' / 'jpeg' / 'avif'）
+# 比較は benchmark_encoders.py で行う。タイル差分の差分画像は常にPNG
+IMAGE_FORMAT = 'png'
+
+# PNGのzlib圧縮レベル（0〜9、小さいほど高速でサイズは大きい）
+IMAGE_PNG_COMPRESS_LEVEL = 6
+
+# PNGの最適化（さらに小さくなるが大幅に低速）
+IMAGE_PNG_OPTIMIZE = False
+
+# 非可逆形式（webp / jpeg / avif）の品質（1〜100）
+IMAGE_QUALITY = 80
+
+# WebPの圧縮方式（0〜6、小さいほど高速）
+IMAGE_WEBP_METHOD = 4
+
+# ===== アップロードパイプライン =====
+# アップロードワーカー数
+UPLOAD_WORKERS = 2
+
+# アップロード待ちキューの最大長
+UPLOAD_QUEUE_SIZE = 10
+
+# キュー満杯時の動作（'block' / 'drop_oldest' / 'drop_newest'）。破棄したジョブはスプールに退避し、接続回復後に再送
+UPLOAD_OVERFLOW_POLICY = 'drop_oldest'
+
+# 'block'時にキューの空きを待つ最大秒数
+UPLOAD_BLOCK_TIMEOUT_SECONDS = 30
+
+# ===== オフラインスプール =====
+# アップロードできなかった撮影画像の保存先
+SPOOL_DIR = 'screenshot_spool'
+
+# スプールの最大合計サイズ（超過時は古い順に破棄）
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+
+# スプールの最大保持時間（時間）
+SPOOL_MAX_AGE_HOURS = 72
+
+# 再送失敗時の待機秒数（指数バックオフの初期値と上限）
+SPOOL_RETRY_BASE_SECONDS = 10
+SPOOL_RETRY_MAX_SECONDS = 600
+
+# ===== 重複フレームの除外 =====
+# 変化のない画面のアップロードを省略するか
+DEDUP_ENABLED = True
+
+# 直前のアップロードとのハッシュ距離がこの値以下なら変化なしとみなす（64ビット中）
+DEDUP_THRESHOLD = 4
+
+# 変化がなくてもこの間隔（分）で1枚はアップロードする（0で常に省略）
+DEDUP_MAX_SKIP_MINUTES = 60
+
+# ===== タイル差分アップロード =====
+# 変化したタイルのみをアップロードするか（復元には reconstruct_frames.py を使用）
+DELTA_ENCODING_ENABLED = False
+
+# タイルの一辺（ピクセル）
+DELTA_TILE_SIZE = 256
+
+# この枚数の差分ごとに全画面のキーフレームをアップロードする
+DELTA_KEYFRAME_INTERVAL = 12
+
+# 変化したタイルの割合がこれを超えたら差分ではなくキーフレームにする
+DELTA_MAX_CHANGED_RATIO = 0.5
+
+# ===== ログ出力 =====
+# ログのタイムゾーン
+LOG_TIMEZONE = 'Asia/Tokyo'
+
+# ログの形式（'text': 従来の "[日時] メッセージ" / 'json': 1行1JSONの構造化ログ）
+LOG_FORMAT = 'text'
+
+# ローテーション方式（'size': LOG_MAX_BYTESごと / 'daily': 日付が変わるごと。どちらもサイズ上限は有効）
+LOG_ROTATION = 'size'
+
+# ローテーションしたログをバックグラウンドでgzip圧縮するか
+LOG_COMPRESS_ROTATED = False
+
+# ログファイルの最大サイズ（バイト）と保持する世代数
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_MAX_FILES = 5
+
+# バッファしたログをファイルに書き込む間隔（秒）
+LOG_FLUSH_INTERVAL_SECONDS = 1.0
+
+# バッファがこのサイズ（バイト）を超えたら間隔を待たずに書き込む
+LOG_BUFFER_BYTES = 64 * 1024
+
+# ===== 処理時間の計測 =====
+# 各処理の所要時間のパーセンタイルを計算する直近のサンプル数
+METRICS_WINDOW = 500
+
+# 計測結果を定期的に書き出すファイル（Noneで書き出さない）
+METRICS_DUMP_FILE = 'screenshot_metrics.json'
+
+# 計測結果を書き出す間隔（秒）
+METRICS_DUMP_INTERVAL_SECONDS = 300
+
+# ===== 監視用エンドポイント =====
+# Prometheus形式の計測値をHTTPで公開するか（ローカルの監視エージェントから取得）
+METRICS_SERVER_ENABLED = False
+
+# 待ち受けるアドレスとポート（外部から接続できないようlocalhostのみ）
+METRICS_SERVER_HOST = '127.0.0.1'
+METRICS_SERVER_PORT = 9108
+
+# ===== 画面の取得 =====
+# mssのインスタンスを作り直してモニター構成を取得し直す間隔（秒、0で定期的には行わない）
+# Windowsでは画面構成の変更を検出した時点、その他の環境では取得エラー時にも作り直す
+SCREEN_GRABBER_REFRESH_SECONDS = 3600
+
+# ===== モニター別撮影 =====
+# 撮影方式（'virtual': 全モニターを含む仮想画面を1枚 / 'per_monitor': モニターごとに1枚）
+# per_monitorではモニター間の黒い余白をエンコードせず、各モニターを並列にエンコードします
+# （タイル差分アップロードは仮想画面の撮影でのみ使用）
+CAPTURE_MODE = 'virtual'
+
+# 並列エンコードのスレッド数（0でCPUコア数とモニター数の小さい方）
+ENCODE_WORKERS = 0
+
+# ===== 縮小・撮影範囲 =====
+# 長辺の最大ピクセル数（0で制限なし。例: 1920で4K画面を約半分に縮小）
+RESIZE_MAX_LONG_EDGE = 0
+
+# 縮小率（1.0で縮小しない。RESIZE_MAX_LONG_EDGEと両方指定した場合は小さい方）
+RESIZE_SCALE = 1.0
+
+# 縮小方法（'fast': 高速（バイリニア） / 'quality': 高品質（Lanczos））
+RESIZE_RESAMPLE = 'fast'
+
+# 撮影範囲の指定（順に適用。Windowsのみ有効なものは他の環境では何もしない）
+#   'active_window'      前面のウィンドウのみ（Windowsのみ）
+#   'exclude_taskbar'    タスクバーを黒で塗りつぶす（Windowsのみ）
+#   'crop_black_borders' 周囲の黒い余白を切り取る
+# タイル差分アップロード（DELTA_ENCODING_ENABLED）では縮小・撮影範囲の指定は使用しない
+ROI_POLICIES = []
+
+# 黒い余白とみなす明るさの上限（0〜255）
+ROI_BLACK_THRESHOLD = 8
+
+# ===== 撮影間隔の自動調整 =====
+# 画面の変化量に応じて撮影間隔を変えるか（Falseの場合はINTERVAL_MINUTESの固定間隔）
+ADAPTIVE_INTERVAL_ENABLED = False
+
+# 撮影間隔の下限・上限（秒）
+ADAPTIVE_MIN_SECONDS = 60
+ADAPTIVE_MAX_SECONDS = 30 * 60
+
+# 前回の撮影との差分ハッシュの距離（0〜64）がこの値以上なら変化が大きいとして間隔を半分にする
+ADAPTIVE_ACTIVE_DISTANCE = 16
+
+# 距離がこの値以下なら画面が静止しているとして間隔をADAPTIVE_BACKOFF倍にする（ロック中も同様）
+ADAPTIVE_STATIC_DISTANCE = 4
+ADAPTIVE_BACKOFF = 2.0
+
+# 1日（JST）あたりの撮影回数の上限（0で制限なし）
+DAILY_CAPTURE_BUDGET = 288
+
+# ===== 撮影スケジューラー =====
+# 次の撮影まで待機する1回あたりの最大秒数
+# （OSのスリープ中は待機時間が進まない場合があるため、復帰後この秒数以内に撮影予定を確認する）
+SCHEDULER_MAX_WAIT_SECONDS = 60
+
+# 予定時刻からこの秒数以上遅れて起きた場合はスリープからの復帰とみなし、以降の予定を現在時刻から組み直す
+SCHEDULER_RESUME_THRESHOLD_SECONDS = 30
+
+# ===== サービスアカウントの分散 =====
+# credentials.encに複数のサービスアカウントを登録した場合の振り分け方
+# 'host': PC（ホスト名）ごとに1つのサービスアカウントを使う / 'file': 撮影画像ごとに振り分ける
+DRIVE_IDENTITY_SHARD_MODE = 'host'
+
+# コンシステントハッシュの1サービスアカウントあたりの仮想ノード数
+DRIVE_IDENTITY_HASH_REPLICAS = 64
+
+# レート制限（HTTP 429 / 403 rateLimitExceeded）を受けたサービスアカウントを使わない秒数
+# （連続で制限された場合は倍々に延ばし、DRIVE_IDENTITY_MAX_COOLDOWN_SECONDSで頭打ち）
+DRIVE_IDENTITY_COOLDOWN_SECONDS = 60
+DRIVE_IDENTITY_MAX_COOLDOWN_SECONDS = 900
+
+# サービスアカウントごとのリクエスト数を集計する期間（秒）
+DRIVE_IDENTITY_RATE_WINDOW_SECONDS = 60
+
+# ===== アップロード方式 =====
+# 'googleapiclient': google-api-python-client（httplib2）でアップロード
+# 'rest': Drive v3のアップロードAPIを直接呼び出す軽量クライアント（接続プール・keep-alive・TLSセッション再利用）
+DRIVE_UPLOAD_BACKEND = 'googleapiclient'
+
+# 'rest'で接続するURL（テスト時はローカルの疑似サーバーを指定）
+DRIVE_REST_BASE_URL = 'https://www.googleapis.com'
+
+# 'rest'の接続先ごとに保持するアイドル接続の最大数
+DRIVE_REST_POOL_SIZE = 4
+
+# アイドル接続を再利用する最大秒数（これより古い接続はサーバー側で切断されている可能性があるため閉じる）
+DRIVE_REST_IDLE_SECONDS = 60
+
+# ===== マルチパート・再開可能アップロード =====
+# このサイズ（バイト）以下はマルチパートアップロード（1リクエスト）、超える場合は再開可能アップロード
+UPLOAD_MULTIPART_MAX_BYTES = 5 * 1024 * 1024
+
+# 再開可能アップロードの分割サイズ（256KBの倍数。大きいほどリクエスト数は減るが、中断時の再送量が増える）
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 再開可能アップロードのセッションURIを保存するファイル（再起動後も中断した位置から再開する）
+# セッションURIを知っていれば認証なしで書き込めるため、本人のみ読み書きできる権限（0600）で保存する
+UPLOAD_SESSION_FILE = 'screenshot_upload_sessions.json'
+
+# 保存したセッションURIを使用する最大時間（時間、Drive APIのセッションの有効期限は1週間）
+UPLOAD_SESSION_MAX_AGE_HOURS = 144
+
+# ===== まとめてアップロード =====
+# 撮影画像をローカルに溜め、1つのアーカイブ（索引のindex.jsonを含む）にまとめてアップロードするか
+# （1分間隔の撮影などでDrive APIの呼び出し回数を減らす。アップロードまでの遅れはBATCH_MAX_SECONDSまで）
+BATCH_UPLOAD_ENABLED = False
+
+# アーカイブにまとめる撮影画像の件数
+BATCH_MAX_CAPTURES = 30
+
+# 最も古い撮影画像からこの秒数が経過したら件数に達していなくてもアップロードする
+BATCH_MAX_SECONDS = 30 * 60
+
+# アーカイブの形式（'zip' / 'tar'（tar.gz））
+BATCH_ARCHIVE_FORMAT = 'zip'
+
+# アーカイブにまとめるまで撮影画像を保存するディレクトリ（終了・再起動後も続きから溜める）
+BATCH_DIR = 'screenshot_batch'
@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+Drive REST アップロードモジュール
+googleapiclient・httplib2を使わず、Drive v3のアップロードAPI（files.create）を直接呼び出します。
+接続先ごとに接続をプールしてkeep-aliveで再利用し、HTTPSではTLSセッションも再利用するため、
+アップロードのたびにTCP・TLSのハンドシェイクをやり直しません。プールはスレッド間で共有できます。
+HTTPS_PROXY・HTTP_PROXY（Windowsではインターネット設定）のHTTPプロキシはCONNECTで中継し、NO_PROXYの接続先は直接接続します。
+
+DriveRestSessionはDriveSessionと同じインターフェース（get_service / invalidate / close）を持ち、
+get_service()の戻り値はgoogleapiclientのサービスと同じ呼び出し方でアップロードできます。
+
+    session = DriveRestSession(credentials, http=HttpPool())
+    service = session.get_service()
+    service.files().create(body=metadata, media_body=BytesMedia(data, 'image/png'),
+                           fields='id, name', supportsAllDrives=True).execute()
+"""
+
+import io
+import os
+import ssl
+import json
+import time
+import uuid
+import base64
+import select
+import threading
+import http.client
+import urllib.request
+from urllib.parse import urlsplit, urlencode, unquote
+
+from screenshot_engine.drive_session import DriveSession
+from screenshot_engine.upload_sessions import status_query_headers, received_bytes
+from screenshot_engine.config import (
+    HTTP_TIMEOUT_SECONDS,
+    TOKEN_REFRESH_MARGIN_SECONDS,
+    DRIVE_REST_BASE_URL,
+    DRIVE_REST_POOL_SIZE,
+    DRIVE_REST_IDLE_SECONDS,
+)
+
+# files.createのアップロード用パス
+UPLOAD_PATH = '/upload/drive/v3/files'
+
+# 再開可能アップロードの既定の分割サイズ（googleapiclientと同じ100MB）と分割の単位（256KB）
+DEFAULT_CHUNK_SIZE = 100 * 1024 * 1024
+CHUNK_ALIGNMENT = 256 * 1024
+
+# 送信後に接続が切れた場合にやり直してよいメソッド（再開可能アップロードのPUTはContent-Rangeで位置を指定する）
+# files.createのPOSTはサーバーが処理済みの場合にファイルが重複するため、送信が完了していなければやり直す
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class HttpResponse:
+    """HTTP応答（ヘッダー名は小文字。google-authのトランスポートの応答としても使用）"""
+
+    def __init__(self, status: int, reason: str, headers: dict, data: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.data = data
+
+    def get(self, name, default=None):
+        """ヘッダーの値（httplib2.Responseと同じ呼び出し方）"""
+        return self.headers.get(name.lower(), default)
+
+    def json(self) -> dict:
+        """応答本文のJSON"""
+        return json.loads(self.data.decode('utf-8')) if self.data else {}
+
+
+class DriveRestError(Exception):
+    """Drive APIのエラー応答（googleapiclient.errors.HttpErrorと同じくresp・contentを持つ）"""
+
+    def __init__(self, resp: HttpResponse, content: bytes):
+        self.resp = resp
+        self.content = content
+        super().__init__(f"HTTP {resp.status} {resp.reason}: "
+                         f"{content[:500].decode('utf-8', 'replace') if content else ''}")
+
+
+class _TlsSessionCache:
+    """接続先ごとの直近のTLSセッション（新しい接続でハンドシェイクを省略するため）"""
+
+    def __init__(self):
+        self.session = None
+        self.resumed = 0
+
+
+class _PooledHTTPSConnection(http.client.HTTPSConnection):
+    """保存したTLSセッションで再開するHTTPS接続"""
+
+    def __init__(self, host, port, timeout, context, tls_cache):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self._tls_cache = tls_cache
+
+    def connect(self):
+        # プロキシ経由の場合はCONNECTで中継した後、接続先のホスト名でTLSを開始
+        http.client.HTTPConnection.connect(self)
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=self._tunnel_host or self.host,
+                                              session=self._tls_cache.session)
+        if self.sock.session_reused:
+            self._tls_cache.resumed += 1
+
+    def remember_tls_session(self):
+        """TLSセッションを保存（TLS 1.3ではハンドシェイク後に届くため応答の受信後に呼び出す）"""
+        session = getattr(self.sock, 'session', None)
+        if session is not None:
+            self._tls_cache.session = session
+
+
+def _proxy_address(url: str) -> tuple:
+    """
+    プロキシのURLを解析（CONNECTで中継するHTTPプロキシのみ対応）
+
+    Returns:
+        (ホスト, ポート, CONNECTのリクエストヘッダー)
+    """
+    parts = urlsplit(url if '://' in url else f"http://{url}")
+    if parts.scheme != 'http' or not parts.hostname:
+        # パスワードを含む場合があるため、URL全体はメッセージに含めない
+        raise ValueError(f"Drive REST アップロードはこのプロキシに対応していません（http://のプロキシのみ対応）: "
+                         f"{parts.scheme}://{parts.hostname or ''}。DRIVE_UPLOAD_BACKEND = 'googleapiclient'を使用してください")
+    headers = {}
+    if parts.username:
+        userinfo = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+        headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(userinfo.encode('utf-8')).decode('ascii')
+    return parts.hostname, parts.port or 80, headers
+
+
+def _connection_dropped(connection) -> bool:
+    """アイドル中にサーバー側で切断された接続か（応答を待っていない接続が読み込み可能なら切断の通知）"""
+    sock = connection.sock
+    if sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class HttpPool:
+    """接続先ごとにkeep-alive接続を保持するスレッドセーフなHTTPクライアント"""
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT_SECONDS, max_idle: int = DRIVE_REST_POOL_SIZE,
+                 idle_seconds: float = DRIVE_REST_IDLE_SECONDS, ssl_context=None, clock=time.monotonic,
+                 proxies: dict = None):
+        """
+        初期化
+
+        Args:
+            timeout: 通信のタイムアウト（秒）
+            max_idle: 接続先ごとに保持するアイドル接続の最大数
+            idle_seconds: アイドル接続を再利用する最大秒数
+            ssl_context: HTTPS接続のSSLContext（省略時は証明書を検証する既定の設定）
+            clock: 経過時間（秒）を返す関数
+            proxies: スキームごとのプロキシURL（urllib.request.getproxies()の形式。省略時は環境変数・システムの設定）
+
+        Raises:
+            ValueError: 対応していないプロキシ（SOCKS・https://のプロキシ）が設定されている場合
+        """
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle_seconds = idle_seconds
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (scheme, netloc) -> [(接続, アイドルになった時刻), ...]（末尾が最新）
+        self._idle = {}
+        self._tls_caches = {}
+        self._closed = False
+        self._stats = {'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
+
+        if proxies is None:
+            proxies = urllib.request.getproxies()
+            self._proxy_bypass = urllib.request.proxy_bypass
+        else:
+            self._proxy_bypass = lambda host: urllib.request.proxy_bypass_environment(host, proxies)
+        self._proxies = {scheme: _proxy_address(proxies[scheme])
+                         for scheme in ('http', 'https') if proxies.get(scheme)}
+
+    def _new_connection(self, scheme: str, host: str, port):
+        """新しい接続を作成（プロキシを使う接続先はCONNECTで中継）"""
+        proxy = self._proxies.get(scheme)
+        if proxy is not None and self._proxy_bypass(host):
+            proxy = None
+        address = (host, port) if proxy is None else proxy[:2]
+
+        with self._lock:
+            self._stats['connections_opened'] += 1
+            if scheme == 'https':
+                tls_cache = self._tls_caches.setdefault((host, port), _TlsSessionCache())
+        if scheme == 'https':
+            connection = _PooledHTTPSConnection(*address, self.timeout, self.ssl_context, tls_cache)
+        else:
+            connection = http.client.HTTPConnection(*address, timeout=self.timeout)
+        if proxy is not None:
+            connection.set_tunnel(host, port, headers=proxy[2])
+        return connection
+
+    def _checkout(self, key):
+        """アイドル接続を取り出す（古い接続・サーバー側で切断された接続は閉じる。ない場合はNone）"""
+        now = self.clock()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key, [])
+                if not idle:
+                    return None
+                candidate, since = idle.pop()
+            if now - since <= self.idle_seconds and not _connection_dropped(candidate):
+                with self._lock:
+                    self._stats['connections_reused'] += 1
+                return candidate
+            candidate.close()
+
+    def _checkin(self, key, connection):
+        """使い終わった接続をアイドル接続として戻す（上限を超える場合は閉じる）"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if not self._closed and len(idle) < self.max_idle:
+                idle.append((connection, self.clock()))
+                return
+        connection.close()
+
+    def request(self, method: str, url: str, body=None, headers=None) -> HttpResponse:
+        """
+        HTTPリクエストを送信して応答を受信
+
+        Args:
+            method: HTTPメソッド
+            url: URL
+            body: 送信するデータ（bytes）
+            headers: リクエストヘッダー
+
+        Returns:
+            HttpResponse（エラー応答もそのまま返す）
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        with self._lock:
+            self._stats['requests'] += 1
+
+        while True:
+            connection = self._checkout(key)
+            reused = connection is not None
+            if connection is None:
+                connection = self._new_connection(parts.scheme, parts.hostname, parts.port)
+
+            sent = False
+            try:
+                connection.request(method, target, body=body, headers=headers or {})
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                # 再利用した接続がサーバー側で切断されていた場合は新しい接続でやり直す
+                # （送信後に切れた場合はサーバーが処理済みの可能性があるため、冪等なメソッドのみ）
+                if reused and (not sent or method.upper() in IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        if isinstance(connection, _PooledHTTPSConnection):
+            connection.remember_tls_session()
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        return HttpResponse(response.status, response.reason, headers, data)
+
+    def stats(self) -> dict:
+        """リクエスト数・接続数・TLSセッションの再開回数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle_connections'] = sum(len(idle) for idle in self._idle.values())
+            stats['tls_sessions_resumed'] = sum(cache.resumed for cache in self._tls_caches.values())
+        return stats
+
+    def close(self):
+        """アイドル接続をすべて閉じる"""
+        with self._lock:
+            self._closed = True
+            connections = [connection for idle in self._idle.values() for connection, _ in idle]
+            self._idle = {}
+        for connection in connections:
+            connection.close()
+
+
+class _AuthRequest:
+    """トークン更新用のgoogle-authトランスポート（google.auth.transport.Requestと同じ呼び出し方）"""
+
+    def __init__(self, http: HttpPool):
+        self.http = http
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        try:
+            return self.http.request(method, url, body=body, headers=headers)
+        except (OSError, http.client.HTTPException) as e:
+            from google.auth import exceptions
+            raise exceptions.TransportError(e) from e
+
+
+class BytesMedia:
+    """メモリ上のデータのアップロード（googleapiclientのMediaIoBaseUploadと同じメソッドを持つ）"""
+
+    def __init__(self, data: bytes, mimetype: str, resumable: bool = False,
+                 chunksize: int = DEFAULT_CHUNK_SIZE):
+        self._data = data
+        self._mimetype = mimetype
+        self._resumable = resumable
+        self._chunksize = chunksize
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def mimetype(self) -> str:
+        return self._mimetype
+
+    def resumable(self) -> bool:
+        return self._resumable
+
+    def chunksize(self) -> int:
+        return self._chunksize
+
+    def getbytes(self, begin: int, length: int) -> bytes:
+        return self._data[begin:begin + length]
+
+
+class FileMedia(BytesMedia):
+    """ファイルのアップロード（googleapiclientのMediaFileUploadと同じメソッドを持つ）"""
+
+    def __init__(self, path: str, mimetype: str, resumable: bool = False,
+                 chunksize: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(b'', mimetype, resumable, chunksize)
+        self.path = path
+        self._size = os.path.getsize(path)
+
+    def size(self) -> int:
+        return self._size
+
+    def getbytes(self, begin: int, length: int) -> bytes:
+        with open(self.path, 'rb') as f:
+            f.seek(begin)
+            return f.read(length)
+
+
+def _multipart_body(metadata: dict, media) -> tuple:
+    """マルチパートアップロードの本文とContent-Type"""
+    boundary = f"=============={uuid.uuid4().hex}=="
+    body = io.BytesIO()
+    body.write(f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n".encode('utf-8'))
+    body.write(json.dumps(metadata).encode('utf-8'))
+    body.write(f"\r\n--{boundary}\r\nContent-Type: {media.mimetype()}\r\n\r\n".encode('utf-8'))
+    body.write(media.getbytes(0, media.size()))
+    body.write(f"\r\n--{boundary}--".encode('utf-8'))
+    return body.getvalue(), f'multipart/related; boundary="{boundary}"'
+
+
+class _CreateRequest:
+    """
+    files.createの呼び出し（execute()で送信）
+
+    再開可能アップロードではgoogleapiclientのHttpRequestと同じく、resumable_uri・resumable_progressと
+    next_chunk()で分割ごとに送信できます（通信エラーの後は受信済みの範囲を問い合わせてから続きを送信）。
+    セッションURIを最初の分割の送信前に保存する場合は、start_session()で先にセッションを開始します。
+    保存したセッションURIから再開する場合は、resumable_uriを設定してquery_progress()を呼び出します。
+    """
+
+    def __init__(self, service, body, media_body, fields, supportsAllDrives):
+        self.service = service
+        self.body = body
+        self.media = media_body
+        self.params = {'supportsAllDrives': 'true' if supportsAllDrives else 'false'}
+        if fields:
+            self.params['fields'] = fields.replace(' ', '')
+        self.resumable_uri = None
+        self.resumable_progress = 0
+        self._in_error_state = False
+
+    def _url(self, upload_type: str) -> str:
+        query = urlencode(dict(self.params, uploadType=upload_type))
+        return f"{self.service.base_url}{UPLOAD_PATH}?{query}"
+
+    def _send(self, method, url, body=None, headers=None, expected=(200, 201)) -> HttpResponse:
+        """認証ヘッダーを付けて送信し、想定外のステータスはDriveRestErrorにする"""
+        headers = dict(headers or {})
+        headers['Authorization'] = f"Bearer {self.service.session.access_token()}"
+        response = self.service.session.http.request(method, url, body=body, headers=headers)
+        if response.status not in expected:
+            raise DriveRestError(response, response.data)
+        return response
+
+    def execute(self) -> dict:
+        """
+        アップロードを実行
+
+        Returns:
+            作成されたファイルのメタデータ（fieldsで指定した項目）
+        """
+        if self.media.resumable():
+            response = None
+            while response is None:
+                _, response = self.next_chunk()
+            return response
+
+        body, content_type = _multipart_body(self.body, self.media)
+        response = self._send('POST', self._url('multipart'), body, {'Content-Type': content_type})
+        return response.json()
+
+    def _process_response(self, response: HttpResponse) -> tuple:
+        """分割送信・問い合わせの応答を処理（308は受信済みの範囲の続きから送信）"""
+        if response.status != 308:
+            self._in_error_state = False
+            return 1.0, response.json()
+
+        self.resumable_progress = received_bytes(response.get('range'))
+        self._in_error_state = False
+        return self.resumable_progress / max(1, self.media.size()), None
+
+    def query_progress(self) -> tuple:
+        """
+        resumable_uriのセッションが受信済みの範囲を問い合わせ、続きから送信するよう設定
+
+        Returns:
+            (送信済みの割合, 完了している場合は作成されたファイルのメタデータ・未完了の場合はNone)
+        """
+        response = self._send('PUT', self.resumable_uri, b'', status_query_headers(self.media.size()),
+                              expected=(200, 201, 308))
+        return self._process_response(response)
+
+    def start_session(self) -> str:
+        """
+        再開可能アップロードのセッションを開始（分割は送信しない）
+
+        Returns:
+            セッションURI
+        """
+        response = self._send('POST', self._url('resumable'), json.dumps(self.body), {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'X-Upload-Content-Type': self.media.mimetype(),
+            'X-Upload-Content-Length': str(self.media.size()),
+        })
+        if not response.get('location'):
+            raise DriveRestError(response, b'resumable upload session URI is missing')
+        self.resumable_uri = response.get('location')
+        self.resumable_progress = 0
+        return self.resumable_uri
+
+    def next_chunk(self) -> tuple:
+        """
+        再開可能アップロードの次の分割を送信（セッション未開始の場合は開始してから送信）
+
+        Returns:
+            (送信済みの割合, 完了した場合は作成されたファイルのメタデータ・未完了の場合はNone)
+        """
+        total = self.media.size()
+        if self.resumable_uri is None:
+            self.start_session()
+        elif self._in_error_state:
+            # 中断したセッション: 受信済みの範囲を問い合わせる（完了していればそのまま終了）
+            progress, result = self.query_progress()
+            if result is not None:
+                return progress, result
+
+        chunksize = max(CHUNK_ALIGNMENT, self.media.chunksize() // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT)
+        chunk = self.media.getbytes(self.resumable_progress, chunksize)
+        content_range = f"bytes {self.resumable_progress}-{self.resumable_progress + len(chunk) - 1}/{total}"
+        try:
+            response = self._send('PUT', self.resumable_uri, chunk, {'Content-Range': content_range},
+                                  expected=(200, 201, 308))
+        except (OSError, http.client.HTTPException):
+            # 通信エラー: 次回は受信済みの範囲を問い合わせてから送信
+            self._in_error_state = True
+            raise
+        return self._process_response(response)
+
+
+class DriveRestService:
+    """googleapiclientのDriveサービスと同じ呼び出し方のアップロード用サービス"""
+
+    def __init__(self, session, base_url: str):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+
+    def files(self):
+        return self
+
+    def create(self, body=None, media_body=None, fields=None, supportsAllDrives=False):
+        return _CreateRequest(self, body or {}, media_body, fields, supportsAllDrives)
+
+
+class DriveRestSession(DriveSession):
+    """HttpPoolで通信するDriveSession（サービスはスレッド間で共有）"""
+
+    def __init__(self, credentials, http: HttpPool = None, base_url: str = DRIVE_REST_BASE_URL,
+                 refresh_margin: int = TOKEN_REFRESH_MARGIN_SECONDS, timeout: int = HTTP_TIMEOUT_SECONDS):
+        """
+        初期化
+
+        Args:
+            credentials: google.oauth2 の認証情報オブジェクト
+            http: 通信に使うHttpPool（省略時は専用のプールを作成し、close()で閉じる）
+            base_url: Drive APIのURL
+            refresh_margin: 有効期限の何秒前からトークンを更新するか
+            timeout: HTTP通信のタイムアウト（秒）
+        """
+        super().__init__(credentials, refresh_margin=refresh_margin, timeout=timeout)
+        self._owns_http = http is None
+        self.http = http or HttpPool(timeout=timeout)
+        self._service = DriveRestService(self, base_url)
+
+    def _refresh_request(self):
+        """トークン更新もプールした接続で行う"""
+        return _AuthRequest(self.http)
+
+    def access_token(self) -> str:
+        """有効なアクセストークン（有効期限が近い場合は更新）"""
+        self.ensure_token()
+        return self.credentials.token
+
+    def get_service(self):
+        """アップロード用サービスを取得（スレッド間で共有）"""
+        self.ensure_token()
+        return self._service
+
+    def close(self):
+        """専用のプールの場合は接続を閉じる（共有のプールは作成した側が閉じる）"""
+        if self._owns_http:
+            self.http.close()
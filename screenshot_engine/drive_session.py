@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Google Drive APIセッション管理モジュール
+認証情報・HTTPトランスポート・Driveサービスを一度だけ構築し、撮影ごとに再利用します。
+httplib2・googleapiclientは読み込みに時間がかかるため、最初の通信時に読み込みます（起動の高速化）。
+"""
+
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+
+from screenshot_engine.config import TOKEN_REFRESH_MARGIN_SECONDS, HTTP_TIMEOUT_SECONDS
+
+# アップロード方式（config.DRIVE_UPLOAD_BACKEND）
+UPLOAD_BACKEND_GOOGLEAPICLIENT = 'googleapiclient'
+UPLOAD_BACKEND_REST = 'rest'
+
+
+class DriveSession:
+    """認証情報とDriveサービスを保持する長寿命セッション"""
+
+    def __init__(self, credentials, refresh_margin: int = TOKEN_REFRESH_MARGIN_SECONDS,
+                 timeout: int = HTTP_TIMEOUT_SECONDS):
+        """
+        初期化
+
+        Args:
+            credentials: google.oauth2 の認証情報オブジェクト
+            refresh_margin: 有効期限の何秒前からトークンを更新するか
+            timeout: HTTP通信のタイムアウト（秒）
+        """
+        self.credentials = credentials
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._force_refresh = False
+        # httplib2.Httpはスレッドセーフではないため、サービスはスレッドごとに保持する
+        self._local = threading.local()
+        self._transports = weakref.WeakSet()
+
+    def _needs_refresh(self) -> bool:
+        """トークン更新が必要か判定"""
+        if self._force_refresh or not self.credentials.token:
+            return True
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return False
+        # google-authのexpiryはタイムゾーンなしのUTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return expiry - self.refresh_margin <= now
+
+    def ensure_token(self):
+        """有効期限が近い場合のみアクセストークンを更新"""
+        with self._lock:
+            if not self._needs_refresh():
+                return
+            self.credentials.refresh(self._refresh_request())
+            self._force_refresh = False
+
+    def _refresh_request(self):
+        """トークン更新に使うgoogle-authのトランスポート"""
+        import httplib2
+        import google_auth_httplib2
+        return google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout))
+
+    def get_service(self):
+        """
+        現在のスレッド用のDriveサービスを取得（初回のみ構築）
+
+        Returns:
+            Drive API v3 のサービスオブジェクト
+        """
+        self.ensure_token()
+
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            import httplib2
+            import google_auth_httplib2
+            from googleapiclient.discovery import build
+
+            http = httplib2.Http(timeout=self.timeout)
+            # 再開可能アップロードの308（受信済み）をリダイレクトとして扱わない（googleapiclientのbuild_httpと同じ）
+            if 308 in http.redirect_codes:
+                http.redirect_codes = http.redirect_codes - {308}
+            self._transports.add(http)
+            authorized_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
+            service = build('drive', 'v3', http=authorized_http, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def invalidate(self):
+        """次回利用時にトークンを強制的に更新させる（認証エラー時など）"""
+        with self._lock:
+            self._force_refresh = True
+
+    def close(self):
+        """保持しているHTTP接続をすべて閉じる"""
+        for http in list(self._transports):
+            try:
+                http.close()
+            except Exception:
+                pass
+        self._transports = weakref.WeakSet()
+        self._local = threading.local()
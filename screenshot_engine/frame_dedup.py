@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+重複フレーム判定モジュール
+縮小画像の差分ハッシュ（dHash）で直前にアップロードした画面との差を求め、
+変化のない撮影をアップロード対象から除外します。
+"""
+
+import time
+import importlib.util
+
+from PIL import Image
+
+from screenshot_engine.config import DEDUP_THRESHOLD, DEDUP_MAX_SKIP_MINUTES
+
+# numpyがインストールされているか（読み込みに時間がかかるため、最初のハッシュ計算時に読み込む）
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+# ハッシュの一辺（8 → 64ビット）
+DHASH_SIZE = 8
+
+# ハッシュの1セルあたりのサンプル数（一辺）
+SAMPLES_PER_CELL = 4
+
+
+def dhash_bgra(buffer, width: int, height: int, hash_size: int = DHASH_SIZE) -> int:
+    """
+    mssのBGRAバッファから差分ハッシュを計算
+
+    全画素を変換せず、格子状に間引いた画素だけを読み取って縮小画像を作ります。
+
+    Args:
+        buffer: BGRA形式の画素データ（bytes / bytearray / memoryview）
+        width: 画像の幅
+        height: 画像の高さ
+        hash_size: ハッシュの一辺
+
+    Returns:
+        hash_size * hash_size ビットの整数
+    """
+    if not NUMPY_AVAILABLE:
+        img = Image.frombuffer('RGB', (width, height), bytes(buffer), 'raw', 'BGRX', 0, 1)
+        return dhash_image(img, hash_size)
+
+    import numpy as np
+    frame = np.frombuffer(buffer, dtype=np.uint8, count=width * height * 4).reshape(height, width, 4)
+    rows = np.linspace(0, height - 1, hash_size * SAMPLES_PER_CELL).astype(np.intp)
+    cols = np.linspace(0, width - 1, (hash_size + 1) * SAMPLES_PER_CELL).astype(np.intp)
+    sample = frame[rows[:, None], cols[None, :], :3].astype(np.uint32)
+
+    # 輝度（ITU-R BT.601）: BGRAなのでB=0, G=1, R=2
+    gray = sample[..., 2] * 299 + sample[..., 1] * 587 + sample[..., 0] * 114
+    cells = gray.reshape(hash_size, SAMPLES_PER_CELL, hash_size + 1, SAMPLES_PER_CELL).mean(axis=(1, 3))
+    bits = (cells[:, 1:] > cells[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash_image(img, hash_size: int = DHASH_SIZE) -> int:
+    """
+    PIL Imageから差分ハッシュを計算（pyautoguiでの撮影時やnumpyがない場合）
+
+    Returns:
+        hash_size * hash_size ビットの整数
+    """
+    small = img.resize((hash_size + 1, hash_size), Image.BILINEAR).convert('L')
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if right > left else 0)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """2つのハッシュの異なるビット数"""
+    return bin(a ^ b).count('1')
+
+
+class FrameDeduplicator:
+    """直前にアップロードしたフレームとの比較で重複を判定"""
+
+    def __init__(self, threshold: int = DEDUP_THRESHOLD,
+                 max_skip_seconds: float = DEDUP_MAX_SKIP_MINUTES * 60):
+        """
+        初期化
+
+        Args:
+            threshold: この距離以下なら変化なしとみなす（0〜64）
+            max_skip_seconds: 変化がなくてもこの秒数ごとに1枚はアップロードする（0で無制限にスキップ）
+        """
+        self.threshold = threshold
+        self.max_skip_seconds = max_skip_seconds
+        self.last_hash = None
+        self.last_uploaded_at = 0.0
+        self.skipped = 0
+
+    def check(self, frame_hash: int) -> tuple:
+        """
+        フレームが直前のアップロードと重複しているか判定
+
+        Returns:
+            (重複ならTrue, 直前のフレームとの距離。比較対象がない場合None)
+        """
+        if self.last_hash is None:
+            return False, None
+
+        distance = hamming_distance(frame_hash, self.last_hash)
+        if distance > self.threshold:
+            return False, distance
+
+        if self.max_skip_seconds and time.time() - self.last_uploaded_at >= self.max_skip_seconds:
+            return False, distance
+
+        self.skipped += 1
+        return True, distance
+
+    def mark_uploaded(self, frame_hash: int):
+        """アップロード対象になったフレームを記録"""
+        self.last_hash = frame_hash
+        self.last_uploaded_at = time.time()
+
+    def reset(self):
+        """比較対象をリセット（撮影再開時など）"""
+        self.last_hash = None
+        self.last_uploaded_at = 0.0
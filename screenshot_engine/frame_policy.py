@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+縮小・撮影範囲モジュール
+エンコード前の画像に撮影範囲の指定（前面のウィンドウのみ・タスクバーの除外・黒い余白の切り取り）と
+縮小を適用します。エンコード時間とアップロード量は画素数にほぼ比例するため、
+監査に必要な解像度まで減らすことで両方を削減できます。
+
+画面上の座標（ウィンドウ・タスクバーの位置）は仮想画面の座標で扱い、
+画像の左上の仮想画面上の位置（origin）を指定して画像上の座標に変換します。
+"""
+
+import sys
+
+from PIL import Image
+
+from screenshot_engine.config import (
+    RESIZE_MAX_LONG_EDGE,
+    RESIZE_SCALE,
+    RESIZE_RESAMPLE,
+    ROI_POLICIES,
+    ROI_BLACK_THRESHOLD,
+)
+
+RESAMPLE_FAST = 'fast'
+RESAMPLE_QUALITY = 'quality'
+
+RESAMPLE_FILTERS = {
+    RESAMPLE_FAST: Image.Resampling.BILINEAR,
+    RESAMPLE_QUALITY: Image.Resampling.LANCZOS,
+}
+
+ROI_ACTIVE_WINDOW = 'active_window'
+ROI_EXCLUDE_TASKBAR = 'exclude_taskbar'
+ROI_CROP_BLACK_BORDERS = 'crop_black_borders'
+
+ROI_POLICY_NAMES = (ROI_ACTIVE_WINDOW, ROI_EXCLUDE_TASKBAR, ROI_CROP_BLACK_BORDERS)
+
+# 黒い余白の判定に使う縮小画像の長辺の目安（全画素を調べない）
+BORDER_SCAN_LONG_EDGE = 512
+
+# DwmGetWindowAttributeで影を除いたウィンドウの枠を取得する属性
+_DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+
+def _rect_tuple(rect) -> tuple:
+    """RECT構造体を (left, top, right, bottom) に変換"""
+    return rect.left, rect.top, rect.right, rect.bottom
+
+
+def foreground_window_rect():
+    """
+    前面のウィンドウの仮想画面上の位置を取得（Windowsのみ）
+
+    Returns:
+        (left, top, right, bottom)。取得できない場合や最小化されている場合はNone
+    """
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd or user32.IsIconic(hwnd):
+            return None
+
+        rect = wintypes.RECT()
+        result = ctypes.windll.dwmapi.DwmGetWindowAttribute(
+            wintypes.HWND(hwnd), _DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect), ctypes.sizeof(rect))
+        if result != 0 and not user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+            return None
+        return _rect_tuple(rect)
+    except Exception:
+        return None
+
+
+def monitor_work_areas():
+    """
+    各モニターの全体と作業領域（タスクバーを除いた範囲）を取得（Windowsのみ）
+
+    Returns:
+        [(モニターの範囲, 作業領域), ...]（各範囲は (left, top, right, bottom)）。取得できない場合はNone
+    """
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class MONITORINFO(ctypes.Structure):
+            _fields_ = [
+                ('cbSize', wintypes.DWORD),
+                ('rcMonitor', wintypes.RECT),
+                ('rcWork', wintypes.RECT),
+                ('dwFlags', wintypes.DWORD),
+            ]
+
+        user32 = ctypes.windll.user32
+        areas = []
+
+        def callback(hmonitor, hdc, rect, lparam):
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(MONITORINFO)
+            if user32.GetMonitorInfoW(hmonitor, ctypes.byref(info)):
+                areas.append((_rect_tuple(info.rcMonitor), _rect_tuple(info.rcWork)))
+            return True
+
+        enum_proc = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HMONITOR, wintypes.HDC,
+                                       ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+        user32.EnumDisplayMonitors(None, None, enum_proc(callback), 0)
+        return areas
+    except Exception:
+        return None
+
+
+def resize_target(width: int, height: int, max_long_edge: int = RESIZE_MAX_LONG_EDGE,
+                  scale: float = RESIZE_SCALE):
+    """
+    縮小後の大きさを計算
+
+    Returns:
+        (幅, 高さ)。縮小しない場合はNone
+    """
+    factor = scale
+    long_edge = max(width, height)
+    if max_long_edge and long_edge * factor > max_long_edge:
+        factor = max_long_edge / long_edge
+    if factor >= 1:
+        return None
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def black_border_box(img, threshold: int = ROI_BLACK_THRESHOLD):
+    """
+    周囲の黒い余白を除いた範囲を取得
+
+    縮小画像で判定し、縮小で境界がぼやける分は1画素ずつ広めに取ります。
+
+    Returns:
+        (left, top, right, bottom)。全体が黒い場合はNone
+    """
+    factor = max(1, max(img.size) // BORDER_SCAN_LONG_EDGE)
+    small = img.reduce(factor) if factor > 1 else img
+    mask = small.convert('L').point([0] * (threshold + 1) + [255] * (255 - threshold))
+    box = mask.getbbox()
+    if box is None:
+        return None
+
+    left, top, right, bottom = box
+    return (
+        max(0, (left - 1) * factor),
+        max(0, (top - 1) * factor),
+        min(img.width, (right + 1) * factor),
+        min(img.height, (bottom + 1) * factor),
+    )
+
+
+def to_image_box(rect: tuple, origin: tuple, size: tuple):
+    """
+    仮想画面上の範囲を画像上の範囲に変換（画像からはみ出す部分は切り詰める）
+
+    Returns:
+        (left, top, right, bottom)。画像と重ならない場合はNone
+    """
+    left = max(0, rect[0] - origin[0])
+    top = max(0, rect[1] - origin[1])
+    right = min(size[0], rect[2] - origin[0])
+    bottom = min(size[1], rect[3] - origin[1])
+    if left >= right or top >= bottom:
+        return None
+    return left, top, right, bottom
+
+
+class FramePolicy:
+    """撮影範囲の指定と縮小"""
+
+    def __init__(self, max_long_edge: int = RESIZE_MAX_LONG_EDGE, scale: float = RESIZE_SCALE,
+                 resample: str = RESIZE_RESAMPLE, roi_policies=ROI_POLICIES,
+                 black_threshold: int = ROI_BLACK_THRESHOLD,
+                 active_window_func=foreground_window_rect, work_areas_func=monitor_work_areas):
+        """
+        初期化
+
+        Args:
+            max_long_edge: 長辺の最大ピクセル数（0で制限なし）
+            scale: 縮小率（1.0で縮小しない）
+            resample: 縮小方法（RESAMPLE_FAST / RESAMPLE_QUALITY）
+            roi_policies: 撮影範囲の指定（ROI_POLICY_NAMESのリスト、順に適用）
+            black_threshold: 黒い余白とみなす明るさの上限
+            active_window_func: 前面のウィンドウの位置を返す関数
+            work_areas_func: 各モニターの範囲と作業領域を返す関数
+        """
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"不明な縮小方法: {resample}")
+        for name in roi_policies:
+            if name not in ROI_POLICY_NAMES:
+                raise ValueError(f"不明な撮影範囲の指定: {name}")
+        if not 0 < scale <= 1:
+            raise ValueError(f"縮小率は0より大きく1以下で指定してください: {scale}")
+
+        self.max_long_edge = max_long_edge
+        self.scale = scale
+        self.resample = resample
+        self.roi_policies = tuple(roi_policies)
+        self.black_threshold = black_threshold
+        self.active_window_func = active_window_func
+        self.work_areas_func = work_areas_func
+
+    @property
+    def enabled(self) -> bool:
+        """縮小または撮影範囲の指定があるか"""
+        return bool(self.roi_policies or self.max_long_edge or self.scale < 1)
+
+    def apply(self, img, origin: tuple = (0, 0)):
+        """
+        撮影範囲の指定と縮小を適用
+
+        タスクバーの除外は渡された画像を直接塗りつぶします。
+
+        Args:
+            img: PIL Image
+            origin: 画像の左上の仮想画面上の位置
+
+        Returns:
+            適用後の画像。前面のウィンドウのみの指定でウィンドウが画像上にない場合はNone
+        """
+        for name in self.roi_policies:
+            if name == ROI_ACTIVE_WINDOW:
+                rect = self.active_window_func()
+                if rect is not None:
+                    box = to_image_box(rect, origin, img.size)
+                    if box is None:
+                        return None
+                    origin = (origin[0] + box[0], origin[1] + box[1])
+                    img = img.crop(box)
+            elif name == ROI_EXCLUDE_TASKBAR:
+                self._fill_taskbar(img, origin)
+            elif name == ROI_CROP_BLACK_BORDERS:
+                box = black_border_box(img, self.black_threshold)
+                if box is not None and box != (0, 0) + img.size:
+                    origin = (origin[0] + box[0], origin[1] + box[1])
+                    img = img.crop(box)
+
+        size = resize_target(img.width, img.height, self.max_long_edge, self.scale)
+        if size is not None:
+            if self.resample == RESAMPLE_FAST:
+                # 整数倍の縮小を先に行ってから補間する（大きく縮小する場合に高速）
+                img = img.resize(size, RESAMPLE_FILTERS[self.resample], reducing_gap=2.0)
+            else:
+                img = img.resize(size, RESAMPLE_FILTERS[self.resample])
+        return img
+
+    def _fill_taskbar(self, img, origin: tuple):
+        """各モニターの作業領域の外側（タスクバー）を黒で塗りつぶす"""
+        areas = self.work_areas_func()
+        if not areas:
+            return
+
+        for monitor, work in areas:
+            # 作業領域の上下左右の帯
+            bands = (
+                (monitor[0], monitor[1], monitor[2], work[1]),
+                (monitor[0], work[3], monitor[2], monitor[3]),
+                (monitor[0], work[1], work[0], work[3]),
+                (work[2], work[1], monitor[2], work[3]),
+            )
+            for band in bands:
+                box = to_image_box(band, origin, img.size)
+                if box is not None:
+                    img.paste((0, 0, 0), box)
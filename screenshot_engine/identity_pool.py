@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+サービスアカウント分散モジュール
+credentials.encに登録した複数のサービスアカウントにアップロードを振り分け、
+Drive APIのユーザーごとの割り当て（クォータ）を分散します。
+
+振り分けはコンシステントハッシュで決め、サービスアカウントを増減しても
+大半のPC（または撮影画像）の割り当て先は変わりません。
+レート制限（HTTP 429 / 403 rateLimitExceeded）を受けたサービスアカウントは一定時間使わず、
+ハッシュ環の次のサービスアカウントに切り替えます。
+"""
+
+import json
+import time
+import bisect
+import hashlib
+import platform
+import threading
+from collections import deque
+
+from screenshot_engine.drive_session import DriveSession
+from screenshot_engine.config import (
+    DRIVE_IDENTITY_SHARD_MODE,
+    DRIVE_IDENTITY_HASH_REPLICAS,
+    DRIVE_IDENTITY_COOLDOWN_SECONDS,
+    DRIVE_IDENTITY_MAX_COOLDOWN_SECONDS,
+    DRIVE_IDENTITY_RATE_WINDOW_SECONDS,
+)
+
+SHARD_HOST = 'host'
+SHARD_FILE = 'file'
+SHARD_MODES = (SHARD_HOST, SHARD_FILE)
+
+# 403エラーのうちレート制限を表す理由
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+def _ring_hash(value: str) -> int:
+    """ハッシュ環上の位置（プロセスによらず同じ値になるようhashlibを使用）"""
+    return int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+
+
+def is_rate_limited(status: int, content=None) -> bool:
+    """
+    Drive APIのエラー応答がレート制限か判定
+
+    Args:
+        status: HTTPステータス
+        content: エラー応答の本文（JSON）
+    """
+    if status == 429:
+        return True
+    if status != 403 or not content:
+        return False
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', 'replace')
+        errors = json.loads(content).get('error', {}).get('errors', [])
+        return any(error.get('reason') in RATE_LIMIT_REASONS for error in errors)
+    except (ValueError, AttributeError):
+        return False
+
+
+def parse_retry_after(value):
+    """Retry-Afterヘッダーの秒数（日時形式や不正な値はNone）"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class ConsistentHashRing:
+    """キーからサービスアカウントの優先順を決めるハッシュ環"""
+
+    def __init__(self, names: list, replicas: int = DRIVE_IDENTITY_HASH_REPLICAS):
+        """
+        初期化
+
+        Args:
+            names: サービスアカウント名のリスト
+            replicas: 1サービスアカウントあたりの仮想ノード数（多いほど均等に分散）
+        """
+        points = sorted(
+            (_ring_hash(f"{name}#{replica}"), index)
+            for index, name in enumerate(names)
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [index for _, index in points]
+        self.size = len(names)
+
+    def order(self, key: str) -> list:
+        """
+        キーに対するサービスアカウントの優先順
+
+        Returns:
+            サービスアカウントの番号のリスト（先頭が割り当て先、以降は切り替え先の順）
+        """
+        if not self._hashes:
+            return []
+
+        start = bisect.bisect(self._hashes, _ring_hash(key))
+        order = []
+        for offset in range(len(self._owners)):
+            owner = self._owners[(start + offset) % len(self._owners)]
+            if owner not in order:
+                order.append(owner)
+                if len(order) == self.size:
+                    break
+        return order
+
+
+class DriveIdentity:
+    """サービスアカウント1つ分の認証情報・セッション・利用状況"""
+
+    def __init__(self, name: str, credentials):
+        self.name = name
+        self.credentials = credentials
+        self.session = None
+        self.requests = deque()
+        self.uploads = 0
+        self.throttles = 0
+        self.consecutive_throttles = 0
+        self.throttled_until = 0.0
+
+
+class IdentityPool:
+    """複数のサービスアカウントへのアップロードの振り分け"""
+
+    def __init__(self, credentials_list: list, shard_mode: str = DRIVE_IDENTITY_SHARD_MODE,
+                 shard_key: str = None, replicas: int = DRIVE_IDENTITY_HASH_REPLICAS,
+                 cooldown: float = DRIVE_IDENTITY_COOLDOWN_SECONDS,
+                 max_cooldown: float = DRIVE_IDENTITY_MAX_COOLDOWN_SECONDS,
+                 rate_window: float = DRIVE_IDENTITY_RATE_WINDOW_SECONDS,
+                 session_factory=DriveSession, clock=time.time, log=None):
+        """
+        初期化
+
+        Args:
+            credentials_list: google.oauth2の認証情報のリスト
+            shard_mode: 振り分け方（SHARD_HOST / SHARD_FILE）
+            shard_key: SHARD_HOSTで使うキー（省略時はホスト名）
+            replicas: 1サービスアカウントあたりの仮想ノード数
+            cooldown: レート制限を受けたサービスアカウントを使わない秒数（初回）
+            max_cooldown: 連続で制限された場合の上限秒数
+            rate_window: リクエスト数を集計する期間（秒）
+            session_factory: 認証情報からDriveSessionを作る関数
+            clock: 現在時刻（秒）を返す関数
+            log: ログ出力関数
+        """
+        if shard_mode not in SHARD_MODES:
+            raise ValueError(f"不明な振り分け方: {shard_mode}")
+        if not credentials_list:
+            raise ValueError("サービスアカウントが登録されていません")
+
+        self.identities = []
+        for index, credentials in enumerate(credentials_list):
+            name = getattr(credentials, 'service_account_email', None) or f"identity-{index + 1}"
+            if any(identity.name == name for identity in self.identities):
+                name = f"{name}#{index + 1}"
+            self.identities.append(DriveIdentity(name, credentials))
+
+        self.shard_mode = shard_mode
+        self.shard_key = shard_key or platform.node()
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.rate_window = rate_window
+        self.session_factory = session_factory
+        self.clock = clock
+        self.log = log or (lambda message: None)
+
+        self._ring = ConsistentHashRing([identity.name for identity in self.identities], replicas)
+        self._lock = threading.Lock()
+        # 返したサービスオブジェクトとサービスアカウントの対応（アップロード結果の記録用）
+        self._by_service = {}
+
+    def __len__(self):
+        return len(self.identities)
+
+    def order_for(self, file_name: str = None) -> list:
+        """撮影画像（SHARD_FILE）またはPC（SHARD_HOST）に対するサービスアカウントの優先順"""
+        key = file_name if self.shard_mode == SHARD_FILE and file_name else self.shard_key
+        return [self.identities[index] for index in self._ring.order(key)]
+
+    def select(self, file_name: str = None) -> DriveIdentity:
+        """レート制限中でない最も優先順の高いサービスアカウント（すべて制限中の場合は最も早く解除されるもの）"""
+        candidates = self.order_for(file_name)
+        now = self.clock()
+        with self._lock:
+            for identity in candidates:
+                if identity.throttled_until <= now:
+                    return identity
+            return min(candidates, key=lambda identity: identity.throttled_until)
+
+    def get_service(self, file_name: str = None):
+        """
+        振り分け先のサービスアカウントのDriveサービスを取得（セッションは初回のみ構築）
+
+        Returns:
+            Drive API v3 のサービスオブジェクト
+        """
+        identity = self.select(file_name)
+        with self._lock:
+            if identity.session is None:
+                identity.session = self.session_factory(identity.credentials)
+            session = identity.session
+
+        service = session.get_service()
+        with self._lock:
+            self._by_service[id(service)] = identity
+        return service
+
+    def identity_for(self, service) -> DriveIdentity:
+        """サービスオブジェクトのサービスアカウント（このプールのものでない場合はNone）"""
+        with self._lock:
+            return self._by_service.get(id(service))
+
+    def _record_request(self, identity: DriveIdentity, now: float):
+        """リクエスト時刻を記録し、集計期間を過ぎたものを捨てる（_lockを保持して呼び出す）"""
+        identity.requests.append(now)
+        while identity.requests and identity.requests[0] <= now - self.rate_window:
+            identity.requests.popleft()
+
+    def record_success(self, service):
+        """アップロード成功を記録（連続制限の回数をリセット）"""
+        identity = self.identity_for(service)
+        if identity is None:
+            return
+        with self._lock:
+            self._record_request(identity, self.clock())
+            identity.uploads += 1
+            identity.consecutive_throttles = 0
+
+    def record_failure(self, service, status: int, content=None, retry_after=None) -> bool:
+        """
+        アップロード失敗を記録し、レート制限の場合はそのサービスアカウントを一定時間使わない
+
+        Args:
+            service: 失敗したサービスオブジェクト
+            status: HTTPステータス
+            content: エラー応答の本文
+            retry_after: Retry-Afterヘッダーの値
+
+        Returns:
+            レート制限の場合True
+        """
+        identity = self.identity_for(service)
+        if identity is None:
+            return False
+
+        limited = is_rate_limited(status, content)
+        now = self.clock()
+        with self._lock:
+            self._record_request(identity, now)
+            if not limited:
+                return False
+            identity.throttles += 1
+            identity.consecutive_throttles += 1
+            delay = min(self.max_cooldown, self.cooldown * 2 ** (identity.consecutive_throttles - 1))
+            wait = parse_retry_after(retry_after)
+            if wait is not None:
+                delay = max(delay, wait)
+            identity.throttled_until = now + delay
+
+        self.log(f"レート制限 (HTTP {status}): {identity.name} を{delay:.0f}秒間使用しません")
+        return True
+
+    def is_throttled(self, service) -> bool:
+        """サービスオブジェクトのサービスアカウントがレート制限中か"""
+        identity = self.identity_for(service)
+        return identity is not None and identity.throttled_until > self.clock()
+
+    def invalidate(self, service):
+        """サービスオブジェクトのサービスアカウントのトークンを次回更新させる（認証エラー時）"""
+        identity = self.identity_for(service)
+        if identity is not None and identity.session is not None:
+            identity.session.invalidate()
+
+    def stats(self) -> list:
+        """サービスアカウントごとの利用状況"""
+        now = self.clock()
+        with self._lock:
+            result = []
+            for identity in self.identities:
+                while identity.requests and identity.requests[0] <= now - self.rate_window:
+                    identity.requests.popleft()
+                result.append({
+                    'name': identity.name,
+                    'requests_per_minute': round(len(identity.requests) * 60 / self.rate_window, 1),
+                    'uploads': identity.uploads,
+                    'throttles': identity.throttles,
+                    'throttled_for_seconds': round(max(0.0, identity.throttled_until - now), 1),
+                })
+            return result
+
+    def close(self):
+        """すべてのサービスアカウントのセッションを閉じる"""
+        with self._lock:
+            sessions = [identity.session for identity in self.identities if identity.session is not None]
+            for identity in self.identities:
+                identity.session = None
+            self._by_service = {}
+        for session in sessions:
+            session.close()
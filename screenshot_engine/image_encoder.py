@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+画像エンコーダーモジュール
+撮影画像の保存形式（PNG / WebP / JPEG / AVIF）と品質設定を切り替えます。
+各エンコーダーはファイル拡張子とMIMEタイプを持ち、アップロード時にそのまま使用します。
+"""
+
+import io
+
+from PIL import features
+
+from screenshot_engine.config import (
+    IMAGE_FORMAT,
+    IMAGE_PNG_COMPRESS_LEVEL,
+    IMAGE_PNG_OPTIMIZE,
+    IMAGE_QUALITY,
+    IMAGE_WEBP_METHOD,
+)
+
+
+class ImageEncoder:
+    """画像エンコーダーの基底クラス"""
+
+    name = None
+    extension = None
+    mimetype = None
+    format = None
+
+    @classmethod
+    def available(cls) -> bool:
+        """この環境のPillowで使用できるか"""
+        return True
+
+    def save_options(self) -> dict:
+        """Image.saveに渡すオプション"""
+        return {}
+
+    def encode(self, img, fp):
+        """
+        画像をエンコードして保存
+
+        Args:
+            img: PIL Image
+            fp: 保存先のファイルパスまたはファイルオブジェクト
+        """
+        img.save(fp, format=self.format, **self.save_options())
+
+    def encode_bytes(self, img) -> bytes:
+        """画像をメモリ上でエンコードしてバイト列を返す（一時ファイルを作らない）"""
+        buffer = io.BytesIO()
+        self.encode(img, buffer)
+        return buffer.getvalue()
+
+    def file_name(self, stem: str) -> str:
+        """拡張子付きのファイル名を生成"""
+        return f"{stem}.{self.extension}"
+
+    def describe(self) -> str:
+        """ログ表示用の設定説明"""
+        options = ', '.join(f"{key}={value}" for key, value in self.save_options().items())
+        return f"{self.name} ({options})" if options else self.name
+
+
+class PngEncoder(ImageEncoder):
+    """PNG（可逆）"""
+
+    name = 'png'
+    extension = 'png'
+    mimetype = 'image/png'
+    format = 'PNG'
+
+    def __init__(self, compress_level: int = IMAGE_PNG_COMPRESS_LEVEL, optimize: bool = IMAGE_PNG_OPTIMIZE):
+        """
+        Args:
+            compress_level: zlib圧縮レベル（0〜9、小さいほど高速）
+            optimize: 最適化を行うか（圧縮レベル9相当で低速）
+        """
+        self.compress_level = compress_level
+        self.optimize = optimize
+
+    def save_options(self) -> dict:
+        return {'compress_level': self.compress_level, 'optimize': self.optimize}
+
+
+class WebpLosslessEncoder(ImageEncoder):
+    """WebP（可逆）"""
+
+    name = 'webp_lossless'
+    extension = 'webp'
+    mimetype = 'image/webp'
+    format = 'WEBP'
+
+    def __init__(self, method: int = IMAGE_WEBP_METHOD):
+        """
+        Args:
+            method: 圧縮方式（0〜6、小さいほど高速）
+        """
+        self.method = method
+
+    @classmethod
+    def available(cls) -> bool:
+        return features.check('webp')
+
+    def save_options(self) -> dict:
+        # 可逆モードのqualityは圧縮の努力量を表す
+        return {'lossless': True, 'quality': 50, 'method': self.method}
+
+
+class WebpEncoder(ImageEncoder):
+    """WebP（非可逆）"""
+
+    name = 'webp'
+    extension = 'webp'
+    mimetype = 'image/webp'
+    format = 'WEBP'
+
+    def __init__(self, quality: int = IMAGE_QUALITY, method: int = IMAGE_WEBP_METHOD):
+        self.quality = quality
+        self.method = method
+
+    @classmethod
+    def available(cls) -> bool:
+        return features.check('webp')
+
+    def save_options(self) -> dict:
+        return {'quality': self.quality, 'method': self.method}
+
+
+class JpegEncoder(ImageEncoder):
+    """JPEG（非可逆）"""
+
+    name = 'jpeg'
+    extension = 'jpg'
+    mimetype = 'image/jpeg'
+    format = 'JPEG'
+
+    def __init__(self, quality: int = IMAGE_QUALITY):
+        self.quality = quality
+
+    def save_options(self) -> dict:
+        return {'quality': self.quality}
+
+    def encode(self, img, fp):
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        super().encode(img, fp)
+
+
+class AvifEncoder(ImageEncoder):
+    """AVIF（quality=100・4:4:4で高品質、それ以外は非可逆）"""
+
+    name = 'avif'
+    extension = 'avif'
+    mimetype = 'image/avif'
+    format = 'AVIF'
+
+    def __init__(self, quality: int = IMAGE_QUALITY):
+        self.quality = quality
+
+    @classmethod
+    def available(cls) -> bool:
+        # AVIFはPillow 11.3以降かつlibavif付きのビルドのみ対応
+        return features.check('avif') is True
+
+    def save_options(self) -> dict:
+        subsampling = '4:4:4' if self.quality >= 100 else '4:2:0'
+        return {'quality': self.quality, 'subsampling': subsampling}
+
+
+ENCODERS = {
+    encoder.name: encoder
+    for encoder in (PngEncoder, WebpLosslessEncoder, WebpEncoder, JpegEncoder, AvifEncoder)
+}
+
+# 画像以外にアップロードするファイル（まとめてアップロードのアーカイブ）の拡張子とMIMEタイプ
+ARCHIVE_MIMETYPES = {
+    'zip': 'application/zip',
+    'gz': 'application/gzip',
+}
+
+
+def create_encoder(name: str = IMAGE_FORMAT, log=None, **options) -> ImageEncoder:
+    """
+    設定名からエンコーダーを生成
+
+    Args:
+        name: ENCODERSのキー
+        log: ログ出力関数
+        **options: エンコーダー固有の設定（省略時はconfigの値）
+
+    Returns:
+        ImageEncoder（この環境で使用できない形式の場合はPNG）
+    """
+    encoder_class = ENCODERS.get(name)
+    if encoder_class is None:
+        raise ValueError(f"不明な画像形式: {name}")
+
+    if not encoder_class.available():
+        if log:
+            log(f"画像形式 {name} はこの環境で使用できないためPNGを使用します")
+        return PngEncoder()
+    return encoder_class(**options)
+
+
+def mimetype_for(file_name: str) -> str:
+    """ファイル名の拡張子からMIMEタイプを取得"""
+    extension = file_name.rsplit('.', 1)[-1].lower()
+    for encoder in ENCODERS.values():
+        if encoder.extension == extension:
+            return encoder.mimetype
+    return ARCHIVE_MIMETYPES.get(extension, 'application/octet-stream')
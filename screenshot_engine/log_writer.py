@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+ログ出力モジュール
+ログファイルを開いたまま保持し、メッセージをメモリ上にバッファして
+バックグラウンドスレッドでまとめて書き込みます。
+ファイルサイズはメモリ上で管理するため、ローテーション判定でファイルシステムにアクセスしません。
+
+出力形式:
+    text  [YYYY-MM-DD HH:MM:SS] メッセージ
+    json  1行1オブジェクト（ts, event, message と LOG_FIELDS の固定フィールド）
+"""
+
+import os
+import gzip
+import json
+import time
+import atexit
+import shutil
+import weakref
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from screenshot_engine.config import (
+    LOG_TIMEZONE,
+    LOG_FORMAT,
+    LOG_ROTATION,
+    LOG_COMPRESS_ROTATED,
+    LOG_MAX_BYTES,
+    LOG_MAX_FILES,
+    LOG_FLUSH_INTERVAL_SECONDS,
+    LOG_BUFFER_BYTES,
+)
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+
+ROTATION_SIZE = 'size'
+ROTATION_DAILY = 'daily'
+
+# JSON形式で常に出力するフィールド（値がない場合はnull）
+LOG_FIELDS = ('file_name', 'bytes', 'capture_ms', 'encode_ms', 'upload_ms', 'http_status')
+
+# イベント名を指定しないメッセージのイベント名
+EVENT_MESSAGE = 'message'
+
+GZIP_SUFFIX = '.gz'
+
+# 終了時にバッファを書き込むLogWriter（closeしたものは参照を持たない）
+_open_writers = weakref.WeakSet()
+
+
+def _close_open_writers():
+    """終了時に閉じられていないLogWriterのバッファを書き込む"""
+    for writer in list(_open_writers):
+        writer.close()
+
+
+atexit.register(_close_open_writers)
+
+
+def rotate_log_files(path: str, max_files: int):
+    """ログファイルの世代をずらす（path -> path.1 -> ... -> path.max_files は削除、圧縮済みも同様）"""
+    for suffix in ('', GZIP_SUFFIX):
+        oldest_log = f"{path}.{max_files}{suffix}"
+        if os.path.exists(oldest_log):
+            os.remove(oldest_log)
+
+    for i in range(max_files - 1, 0, -1):
+        for suffix in ('', GZIP_SUFFIX):
+            old_name = f"{path}.{i}{suffix}"
+            if os.path.exists(old_name):
+                os.replace(old_name, f"{path}.{i + 1}{suffix}")
+
+    if os.path.exists(path):
+        os.replace(path, f"{path}.1")
+
+
+def compress_log_file(path: str) -> bool:
+    """ログファイルをgzip圧縮して元のファイルを削除（圧縮中のファイルは .tmp に書き込む）"""
+    if not os.path.exists(path):
+        return False
+
+    temp_path = f"{path}{GZIP_SUFFIX}.tmp"
+    with open(path, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(temp_path, f"{path}{GZIP_SUFFIX}")
+    os.remove(path)
+    return True
+
+
+def cleanup_rotated_logs(path: str, max_files: int) -> list:
+    """
+    保持する世代数を超えたローテーション済みログを削除
+
+    Returns:
+        削除したファイル名のリスト
+    """
+    log_dir = os.path.dirname(os.path.abspath(path))
+    log_base = os.path.basename(path)
+    removed = []
+
+    for file in sorted(os.listdir(log_dir)):
+        # auto_screenshot.log.1, auto_screenshot.log.2.gz など
+        suffix = file[len(log_base) + 1:] if file.startswith(log_base + '.') else ''
+        if suffix.endswith(GZIP_SUFFIX):
+            suffix = suffix[:-len(GZIP_SUFFIX)]
+        if suffix.isdigit() and int(suffix) > max_files:
+            try:
+                os.remove(os.path.join(log_dir, file))
+                removed.append(file)
+            except OSError:
+                pass
+    return removed
+
+
+class LogWriter:
+    """バッファリングしてバックグラウンドで書き込むログ出力"""
+
+    def __init__(self, path: str, max_size: int = LOG_MAX_BYTES, max_files: int = LOG_MAX_FILES,
+                 flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+                 buffer_size: int = LOG_BUFFER_BYTES, timezone: str = LOG_TIMEZONE,
+                 log_format: str = LOG_FORMAT, rotation: str = LOG_ROTATION,
+                 compress: bool = LOG_COMPRESS_ROTATED):
+        """
+        初期化
+
+        Args:
+            path: ログファイルのパス
+            max_size: ローテーションするファイルサイズ（バイト）
+            max_files: 保持する世代数
+            flush_interval: バッファを書き込む間隔（秒）
+            buffer_size: この量（バイト）を超えたら間隔を待たずに書き込む
+            timezone: タイムスタンプのタイムゾーン
+            log_format: 出力形式（FORMAT_TEXT / FORMAT_JSON）
+            rotation: ローテーション方式（ROTATION_SIZE / ROTATION_DAILY）
+            compress: ローテーションしたログをgzip圧縮するか
+        """
+        if log_format not in (FORMAT_TEXT, FORMAT_JSON):
+            raise ValueError(f"不明なログ形式: {log_format}")
+        if rotation not in (ROTATION_SIZE, ROTATION_DAILY):
+            raise ValueError(f"不明なローテーション方式: {rotation}")
+
+        self.path = path
+        self.max_size = max_size
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.tz = ZoneInfo(timezone)
+        self.log_format = log_format
+        self.rotation = rotation
+        self.compress = compress
+
+        self._buffer = []
+        self._buffered = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._rotate_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._file_day = None
+        self._thread = None
+        self._closed = False
+
+        # タイムスタンプ文字列は秒が変わったときだけ作り直す
+        self._stamp_second = None
+        self._stamp = ''
+        self._iso_stamp = ''
+        self._day = None
+
+        _open_writers.add(self)
+
+    def _update_clock(self):
+        """現在時刻のタイムスタンプ文字列を更新"""
+        second = int(time.time())
+        if second != self._stamp_second:
+            now = datetime.fromtimestamp(second, self.tz)
+            self._stamp = now.strftime('%Y-%m-%d %H:%M:%S')
+            self._iso_stamp = now.isoformat()
+            self._day = now.date()
+            self._stamp_second = second
+
+    def format_line(self, message: str, event: str = None, **fields) -> bytes:
+        """1行分のログを出力形式に合わせてエンコード"""
+        self._update_clock()
+
+        if self.log_format == FORMAT_JSON:
+            record = {'ts': self._iso_stamp, 'event': event or EVENT_MESSAGE, 'message': message}
+            for name in LOG_FIELDS:
+                record[name] = fields.pop(name, None)
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str)
+        else:
+            line = f"[{self._stamp}] {message}"
+        return (line + '\n').encode('utf-8')
+
+    def write(self, message: str, event: str = None, **fields):
+        """
+        ログメッセージをバッファに追加（ファイルへの書き込みはバックグラウンドで行う）
+
+        Args:
+            message: ログメッセージ
+            event: イベント名（JSON形式のみ出力）
+            **fields: LOG_FIELDSなどの付加情報（JSON形式のみ出力）
+        """
+        data = self.format_line(message, event, **fields)
+
+        with self._cond:
+            if self._closed:
+                # 終了後のメッセージは直接書き込む
+                self._write_now([data])
+                return
+            was_empty = not self._buffer
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name="log-writer", daemon=True)
+                self._thread.start()
+            if was_empty or self._buffered >= self.buffer_size:
+                self._cond.notify()
+
+    def _flush_loop(self):
+        """最初のメッセージから一定時間後またはバッファ上限でファイルに書き込む（バッファが空の間は起きない）"""
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if self._buffered < self.buffer_size and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _take_buffer(self) -> list:
+        """バッファの内容を取り出す"""
+        with self._cond:
+            chunks = self._buffer
+            self._buffer = []
+            self._buffered = 0
+            return chunks
+
+    def flush(self):
+        """バッファの内容をファイルに書き込む"""
+        chunks = self._take_buffer()
+        if chunks:
+            self._write_now(chunks)
+
+    def _write_now(self, chunks: list):
+        """ファイルに書き込み、サイズが上限を超えたらローテーション"""
+        with self._io_lock:
+            try:
+                handle = self._open()
+                # 日次ローテーションでは日付が変わってから最初の書き込みの前にローテーション
+                self._update_clock()
+                if self.rotation == ROTATION_DAILY and self._size and self._file_day != self._day:
+                    handle = self._rotate()
+
+                data = b''.join(chunks)
+                handle.write(data)
+                handle.flush()
+                self._size += len(data)
+                if self._size >= self.max_size:
+                    self._rotate()
+            except Exception:
+                # ログ書き込みエラーは無視（次回の書き込みでファイルを開き直す）
+                self._close_file()
+
+    def _open(self):
+        """ログファイルを開く（開いたまま保持）"""
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+            self._update_clock()
+            if self._size:
+                # 既存のファイルは最終更新日の分として扱う
+                self._file_day = datetime.fromtimestamp(os.path.getmtime(self.path), self.tz).date()
+            else:
+                self._file_day = self._day
+        return self._file
+
+    def _close_file(self):
+        """ログファイルを閉じる"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        """ログファイルをローテーション（_io_lockを保持して呼び出す）"""
+        self._close_file()
+        # 圧縮中の世代があれば完了を待ってからずらす
+        with self._rotate_lock:
+            rotate_log_files(self.path, self.max_files)
+
+        handle = self._open()
+        previous = f"{self.path}.1{GZIP_SUFFIX if self.compress else ''}"
+        handle.write(self.format_line("ログファイルをローテーションしました", 'log_rotated'))
+        handle.write(self.format_line(f"前のログは {previous} に保存されています", 'log_rotated'))
+        handle.flush()
+        self._size = handle.tell()
+
+        if self.compress:
+            threading.Thread(target=self._compress_rotated, name="log-compress", daemon=True).start()
+        return handle
+
+    def _compress_rotated(self):
+        """ローテーション済みの未圧縮の世代をgzip圧縮（バックグラウンドスレッド）"""
+        with self._rotate_lock:
+            for i in range(1, self.max_files + 1):
+                try:
+                    compress_log_file(f"{self.path}.{i}")
+                except Exception:
+                    # 圧縮できなかった世代は非圧縮のまま残す
+                    pass
+
+    def rotate_if_needed(self):
+        """ファイルの実際のサイズを確認し、必要に応じてローテーション（起動時などに使用）"""
+        self.flush()
+        with self._io_lock:
+            try:
+                if not os.path.exists(self.path):
+                    return
+                # 他のプロセスが書き込んだ場合に備えて実際のサイズで判定
+                if os.path.getsize(self.path) < self.max_size:
+                    return
+                self._rotate()
+            except Exception:
+                # ローテーションエラーは無視（ログ記録自体は続行）
+                self._close_file()
+
+    def close(self):
+        """バッファを書き込んでファイルを閉じる"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        _open_writers.discard(self)
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+        with self._io_lock:
+            self._close_file()
+        # 圧縮中の世代があれば完了を待つ
+        with self._rotate_lock:
+            pass
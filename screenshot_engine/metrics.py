@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+処理時間の計測モジュール
+撮影・変換・エンコード・アップロードの各段階の所要時間を直近のサンプルで集計し（p50 / p95 / p99）、
+撮影・アップロードのバイト数やHTTPステータス別の失敗回数をカウントします。
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+
+from screenshot_engine.config import (
+    METRICS_WINDOW,
+    METRICS_DUMP_FILE,
+    METRICS_DUMP_INTERVAL_SECONDS,
+)
+
+# 計測する処理段階
+STAGE_GRAB = 'grab'          # 画面の取得（mss / pyautogui）
+STAGE_HASH = 'hash'          # 重複判定用のハッシュ計算
+STAGE_DELTA = 'delta'        # タイル差分の計算
+STAGE_CONVERT = 'convert'    # BGRAバッファからPIL Imageへの変換
+STAGE_RESIZE = 'resize'      # 撮影範囲の切り出しと縮小
+STAGE_ENCODE = 'encode'      # 画像のエンコード
+STAGE_UPLOAD = 'upload'      # files().create().execute()
+
+# 所要時間の累積分布の区切り（ミリ秒）
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def percentile(sorted_values: list, q: float):
+    """昇順に並んだ値のパーセンタイル（最近傍順位法）"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class StageStats:
+    """1つの処理段階の所要時間の集計"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total_ms = 0.0
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS_MS)
+
+    def observe(self, ms: float):
+        """所要時間を記録"""
+        self.samples.append(ms)
+        self.count += 1
+        self.total_ms += ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def snapshot(self) -> dict:
+        """集計結果"""
+        values = sorted(self.samples)
+        cumulative = 0
+        buckets = []
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.bucket_counts):
+            cumulative += bucket_count
+            buckets.append([bound, cumulative])
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total_ms, 1),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+            'max_ms': values[-1] if values else None,
+            'buckets': buckets,
+        }
+
+
+class StageTimer:
+    """with文で処理段階の所要時間を計測（例外で抜けた場合も記録）"""
+
+    def __init__(self, registry, stage: str):
+        self.registry = registry
+        self.stage = stage
+        self.ms = None
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ms = round((time.perf_counter() - self._started) * 1000, 1)
+        self.registry.observe(self.stage, self.ms)
+        return False
+
+
+class MetricsRegistry:
+    """処理時間・カウンターの集計"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        """
+        初期化
+
+        Args:
+            window: パーセンタイルの計算に使う直近のサンプル数
+        """
+        self.window = window
+        self.started_at = time.time()
+        self.last_upload_at = None
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._failures = {}
+
+    def timer(self, stage: str) -> StageTimer:
+        """処理段階の計測用タイマー"""
+        return StageTimer(self, stage)
+
+    def observe(self, stage: str, ms: float):
+        """処理段階の所要時間（ミリ秒）を記録"""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(self.window)
+            stats.observe(ms)
+
+    def increment(self, name: str, value: int = 1):
+        """カウンターを加算"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record_upload(self, size: int):
+        """アップロード成功を記録"""
+        with self._lock:
+            self._counters['uploads'] = self._counters.get('uploads', 0) + 1
+            self._counters['bytes_uploaded'] = self._counters.get('bytes_uploaded', 0) + (size or 0)
+            self.last_upload_at = time.time()
+
+    def record_failure(self, status=None):
+        """アップロード失敗をHTTPステータス別に記録（HTTP以外のエラーは'error'）"""
+        key = str(status) if status is not None else 'error'
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        """現在の集計結果"""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'last_upload_at': self.last_upload_at,
+                'counters': dict(self._counters),
+                'upload_failures': dict(self._failures),
+                'stages': {stage: stats.snapshot() for stage, stats in self._stages.items()},
+            }
+
+    def dump(self, path: str, extra: dict = None):
+        """集計結果をJSONファイルに書き出す（書き込み途中のファイルを読まれないよう置き換え）"""
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+def format_metrics(snapshot: dict) -> str:
+    """集計結果を画面表示用のテキストに整形"""
+    counters = snapshot.get('counters', {})
+    lines = [
+        f"撮影: {counters.get('captures', 0)}回 (変化なしで省略: {counters.get('skipped_unchanged', 0)}回)",
+        f"アップロード: {counters.get('uploads', 0)}件 / {counters.get('bytes_uploaded', 0) / 1024 / 1024:.1f}MB",
+    ]
+    failures = snapshot.get('upload_failures', {})
+    if failures:
+        lines.append("失敗: " + ", ".join(f"{status}={count}" for status, count in sorted(failures.items())))
+
+    lines.append("")
+    lines.append("所要時間 (ms)   p50 / p95 / p99")
+    for stage, stats in snapshot.get('stages', {}).items():
+        values = [stats[key] for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        text = " / ".join('-' if value is None else f"{value:.0f}" for value in values)
+        lines.append(f"{stage:10} {text}  ({stats['count']}回)")
+    return "\n".join(lines)
+
+
+class MetricsDumper:
+    """集計結果を定期的にファイルへ書き出すスレッド"""
+
+    def __init__(self, registry: MetricsRegistry, path: str = METRICS_DUMP_FILE,
+                 interval: float = METRICS_DUMP_INTERVAL_SECONDS, extra=None, log=None):
+        """
+        初期化
+
+        Args:
+            registry: 書き出す集計
+            path: 書き出し先のファイル
+            interval: 書き出す間隔（秒）
+            extra: 書き出し時に追加する情報を返す関数（キュー長など）
+            log: ログ出力関数
+        """
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.extra = extra
+        self.log = log or (lambda message: None)
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """書き出しスレッドを起動"""
+        if not self.path or self.interval <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+        self._thread.start()
+
+    def dump(self):
+        """集計結果を書き出す"""
+        try:
+            self.registry.dump(self.path, self.extra() if self.extra else None)
+        except Exception as e:
+            self.log(f"計測結果の書き出しエラー: {str(e)}")
+
+    def stop(self, timeout: float = 5.0):
+        """書き出しスレッドを停止（停止前に最後の集計を書き出す）"""
+        if not self._thread:
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.dump()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.dump()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+監視用エンドポイントモジュール
+計測値（get_metrics()の集計結果）をPrometheusのテキスト形式でHTTP公開します。
+集計結果は取得要求があったときだけ作成するため、取得されない間の負荷はありません。
+待ち受けスレッドは停止要求の確認のために起きる間隔を長くし、取得されない間はほぼ眠ったままです。
+
+    GET http://127.0.0.1:9108/metrics
+"""
+
+import time
+import socket
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from screenshot_engine.config import METRICS_SERVER_HOST, METRICS_SERVER_PORT
+
+METRIC_PREFIX = 'screenshot'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 待ち受けスレッドが停止要求を確認する間隔（秒）。停止時は接続して起こすため長くてよい
+POLL_INTERVAL_SECONDS = 3600
+
+# 停止を待つ最大秒数
+STOP_TIMEOUT_SECONDS = 5.0
+
+# カウンターの説明（記載のないカウンターも名前から出力する）
+COUNTER_HELP = {
+    'captures': "Screenshots captured",
+    'skipped_unchanged': "Captures skipped because the screen did not change",
+    'spooled': "Captures written to the offline spool",
+    'uploads': "Successful uploads",
+    'bytes_captured': "Raw bytes captured from the screen",
+    'bytes_encoded': "Bytes after image encoding",
+    'bytes_uploaded': "Bytes uploaded to Google Drive",
+}
+
+# キュー・スプールなど現在値のメトリクス（スナップショットのキー, 説明）
+GAUGES = (
+    ('queue_depth', 'upload_queue_depth', "Jobs waiting in the upload queue"),
+    ('spool_entries', 'spool_entries', "Captures waiting in the offline spool"),
+    ('spool_bytes', 'spool_bytes', "Bytes waiting in the offline spool"),
+    ('uptime_seconds', 'uptime_seconds', "Seconds since the process started"),
+    ('last_upload_at', 'last_upload_timestamp_seconds', "Unix time of the last successful upload"),
+)
+
+
+def _format_value(value) -> str:
+    """数値をPrometheusの表記に変換"""
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _escape_label(value) -> str:
+    """ラベル値のエスケープ"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """集計結果をPrometheusのテキスト形式に変換"""
+    lines = []
+
+    for name, value in sorted(snapshot.get('counters', {}).items()):
+        metric = f"{METRIC_PREFIX}_{name}_total"
+        lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name)}")
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {_format_value(value)}")
+
+    metric = f"{METRIC_PREFIX}_upload_failures_total"
+    lines.append(f"# HELP {metric} Failed uploads by HTTP status ('error' for non-HTTP failures)")
+    lines.append(f"# TYPE {metric} counter")
+    for status, count in sorted(snapshot.get('upload_failures', {}).items()):
+        lines.append(f'{metric}{{status="{_escape_label(status)}"}} {count}')
+
+    for key, name, description in GAUGES:
+        value = snapshot.get(key)
+        if value is None:
+            continue
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {_format_value(value)}")
+
+    stages = snapshot.get('stages', {})
+    if stages:
+        metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {metric} Duration of each capture/upload stage")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, stats in sorted(stages.items()):
+            label = _escape_label(stage)
+            for bound_ms, cumulative in stats['buckets']:
+                lines.append(f'{metric}_bucket{{stage="{label}",le="{bound_ms / 1000:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{label}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {_format_value(stats["sum_ms"] / 1000)}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {stats["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics への要求に集計結果を返す"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        try:
+            body = render_prometheus(self.server.snapshot_func()).encode('utf-8')
+        except Exception as e:
+            self.server.log(f"監視用エンドポイントの集計エラー: {str(e)}")
+            self.send_error(500)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 取得要求ごとのアクセスログは出力しない
+        pass
+
+
+class MetricsServer:
+    """Prometheus形式の計測値を公開するHTTPサーバー（デーモンスレッドで動作）"""
+
+    def __init__(self, snapshot_func, host: str = METRICS_SERVER_HOST, port: int = METRICS_SERVER_PORT, log=None):
+        """
+        初期化
+
+        Args:
+            snapshot_func: 集計結果を返す関数（get_metrics）
+            host: 待ち受けるアドレス
+            port: 待ち受けるポート（0で空いているポートを使用）
+            log: ログ出力関数
+        """
+        self.snapshot_func = snapshot_func
+        self.host = host
+        self.port = port
+        self.log = log or (lambda message: None)
+
+        self._server = None
+        self._thread = None
+
+    def start(self) -> bool:
+        """サーバーを起動（ポートが使用中などで起動できない場合はFalse）"""
+        if self._server is not None:
+            return True
+        try:
+            server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            self.log(f"監視用エンドポイントを起動できません ({self.host}:{self.port}): {str(e)}")
+            return False
+
+        server.daemon_threads = True
+        server.snapshot_func = self.snapshot_func
+        server.log = self.log
+        self._server = server
+        self.port = server.server_address[1]
+        self._thread = threading.Thread(target=partial(server.serve_forever, poll_interval=POLL_INTERVAL_SECONDS),
+                                        name="metrics-server", daemon=True)
+        self._thread.start()
+        self.log(f"監視用エンドポイント起動: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def _wake(self):
+        """待ち受け中のselect()を接続して起こす（poll_intervalを待たずに停止要求を確認させる）"""
+        host = '127.0.0.1' if self.host in ('', '0.0.0.0') else self.host
+        try:
+            with socket.create_connection((host, self.port), timeout=1):
+                pass
+        except OSError:
+            pass
+
+    def stop(self):
+        """サーバーを停止"""
+        if self._server is None:
+            return
+        # shutdown()は待ち受けスレッドが停止要求を確認するまで戻らないため、別スレッドで呼び出して起こす
+        stopper = threading.Thread(target=self._server.shutdown, name="metrics-server-stop", daemon=True)
+        stopper.start()
+        deadline = time.monotonic() + STOP_TIMEOUT_SECONDS
+        while stopper.is_alive() and time.monotonic() < deadline:
+            self._wake()
+            stopper.join(0.05)
+        self._server.server_close()
+        self._thread.join(STOP_TIMEOUT_SECONDS)
+        self._server = None
+        self._thread = None
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+モニター別撮影モジュール
+モニターごとに撮影した画像を同じ撮影時刻のファイル名（_m1, _m2 ...）でまとめ、
+スレッドプールで並列にエンコードします。PillowはエンコードのあいだGILを解放するため、
+プロセスを分けずに複数のCPUコアを使用できます（画像をプロセス間でコピーしない）。
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from screenshot_engine.config import CAPTURE_MODE, ENCODE_WORKERS
+
+CAPTURE_VIRTUAL = 'virtual'
+CAPTURE_PER_MONITOR = 'per_monitor'
+
+CAPTURE_MODES = (CAPTURE_VIRTUAL, CAPTURE_PER_MONITOR)
+
+# モニター別ファイル名の接尾辞（例: 20240101-user_103000_m1.png）
+MONITOR_SUFFIX = '_m'
+
+
+def check_capture_mode(mode: str = CAPTURE_MODE) -> str:
+    """撮影方式の設定を検証"""
+    if mode not in CAPTURE_MODES:
+        raise ValueError(f"不明な撮影方式: {mode}")
+    return mode
+
+
+def monitor_stem(stem: str, index: int) -> str:
+    """撮影時刻のファイル名（拡張子なし）にモニター番号を付ける"""
+    return f"{stem}{MONITOR_SUFFIX}{index}"
+
+
+class ParallelEncoder:
+    """複数の画像をスレッドプールで並列にエンコード"""
+
+    def __init__(self, workers: int = ENCODE_WORKERS):
+        """
+        初期化
+
+        Args:
+            workers: エンコードのスレッド数（0でCPUコア数とモニター数の小さい方）
+        """
+        self.workers = workers
+        self._executor = None
+        self._executor_workers = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self, count: int):
+        """画像数に合わせたスレッドプールを取得（スレッド数が変わる場合のみ作り直す）"""
+        workers = self.workers or min(count, os.cpu_count() or 1)
+        workers = max(1, workers)
+        with self._lock:
+            if self._executor is None or self._executor_workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode")
+                self._executor_workers = workers
+            return self._executor
+
+    def encode_all(self, encoder, images: list) -> list:
+        """
+        画像をまとめてエンコード
+
+        Args:
+            encoder: ImageEncoder
+            images: PIL Imageのリスト
+
+        Returns:
+            エンコード済みデータのリスト（imagesと同じ順序）
+        """
+        if len(images) <= 1:
+            return [encoder.encode_bytes(img) for img in images]
+
+        executor = self._get_executor(len(images))
+        return list(executor.map(encoder.encode_bytes, images))
+
+    def close(self):
+        """スレッドプールを終了"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+                self._executor_workers = 0
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+画面取得モジュール
+mssのインスタンスを撮影のたびに作り直さず、撮影スレッドで保持して再利用します。
+Windowsではデバイスコンテキストと画像バッファ、X11ではディスプレイ接続が撮影間で再利用されます。
+
+mssのハンドルはスレッドに紐づくため、ScreenGrabberは最初に撮影したスレッド専用です。
+モニター構成は画面構成の変更・取得エラー・一定時間の経過時にのみ取得し直します。
+撮影したBGRAバッファは、コピーを作らずに再利用する変換先の画像へ直接展開します。
+mssは最初にScreenGrabberを作成したときに読み込みます（起動の高速化）。
+"""
+
+import sys
+import time
+import threading
+import importlib.util
+
+from PIL import Image
+
+from screenshot_engine.config import SCREEN_GRABBER_REFRESH_SECONDS
+
+# mssがインストールされているか（読み込みは撮影時まで遅らせる）
+MSS_AVAILABLE = importlib.util.find_spec('mss') is not None
+
+# GetSystemMetricsの仮想画面の位置・大きさとモニター数
+_SM_VIRTUAL_SCREEN = (76, 77, 78, 79, 80)
+
+
+def display_signature():
+    """
+    画面構成の変更を検出するための値を取得
+
+    Windowsでは仮想画面の位置・大きさとモニター数を返します（GetSystemMetricsのみで軽量）。
+    その他の環境では軽量に取得する方法がないためNoneを返します。
+    """
+    if sys.platform != 'win32':
+        return None
+    try:
+        import ctypes
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        return tuple(metrics(index) for index in _SM_VIRTUAL_SCREEN)
+    except Exception:
+        return None
+
+
+class FrameConverter:
+    """mssのBGRAバッファをPIL Imageに変換（変換先の画像を撮影間で再利用）"""
+
+    def __init__(self):
+        self._image = None
+
+        # 統計情報（変換先の画像を確保した回数）
+        self.allocated = 0
+
+    def to_image(self, buffer, width: int, height: int):
+        """
+        BGRAバッファをRGB画像に展開
+
+        ScreenShot.bgraはバッファ全体をbytesにコピーするため使用せず、
+        rawをmemoryviewのまま変換先の画像へデコードします。
+        返す画像は次の変換で上書きされるため、エンコードが終わるまでに次の変換を行わないこと。
+
+        Args:
+            buffer: BGRA形式の画素データ（bytearray / memoryview）
+            width: 画像の幅
+            height: 画像の高さ
+
+        Returns:
+            PIL Image（RGB）
+        """
+        if self._image is None or self._image.size != (width, height):
+            self._image = Image.new('RGB', (width, height))
+            self.allocated += 1
+        self._image.frombytes(memoryview(buffer), 'raw', 'BGRX')
+        return self._image
+
+    def release(self):
+        """変換先の画像を解放"""
+        self._image = None
+
+
+class ScreenGrabber:
+    """撮影スレッドが保持して再利用する画面取得"""
+
+    def __init__(self, factory=None, refresh_interval: float = SCREEN_GRABBER_REFRESH_SECONDS,
+                 signature_func=display_signature, log=None):
+        """
+        初期化
+
+        Args:
+            factory: mssのインスタンスを生成する関数（省略時はmss.mss）
+            refresh_interval: モニター構成を取得し直す間隔（秒、0で定期的には行わない）
+            signature_func: 画面構成の変更を検出する関数（Noneを返す場合は検出しない）
+            log: ログ出力関数
+        """
+        if factory is None:
+            if not MSS_AVAILABLE:
+                raise ImportError("mss not available")
+            import mss
+            factory = mss.mss
+
+        self.factory = factory
+        self.refresh_interval = refresh_interval
+        self.signature_func = signature_func
+        self.log = log or (lambda message: None)
+
+        self._sct = None
+        self._monitors = None
+        self._signature = None
+        self._opened_at = 0.0
+        self._owner = None
+        self._converters = {}
+
+        # 統計情報
+        self.opened = 0
+        self.grabs = 0
+
+    def owned_by_current_thread(self) -> bool:
+        """現在のスレッドで使用できるか（まだ撮影していない場合もTrue）"""
+        return self._owner is None or self._owner == threading.get_ident()
+
+    def _check_owner(self):
+        """撮影スレッド以外からの使用を防ぐ"""
+        if self._owner is None:
+            self._owner = threading.get_ident()
+        elif self._owner != threading.get_ident():
+            raise RuntimeError("ScreenGrabberは最初に撮影したスレッドでのみ使用できます")
+
+    def _open(self):
+        """mssのインスタンスを生成してモニター構成を取得"""
+        self._close_sct()
+        self._signature = self.signature_func() if self.signature_func else None
+        self._sct = self.factory()
+        self._monitors = list(self._sct.monitors)
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def _close_sct(self):
+        """mssのインスタンスを閉じる"""
+        if self._sct is not None:
+            try:
+                self._sct.close()
+            except Exception:
+                pass
+            self._sct = None
+            self._monitors = None
+
+    def _needs_refresh(self) -> bool:
+        """モニター構成を取得し直す必要があるか"""
+        if self._sct is None:
+            return True
+        if self.refresh_interval and time.monotonic() - self._opened_at >= self.refresh_interval:
+            return True
+        if self.signature_func:
+            signature = self.signature_func()
+            if signature is not None and signature != self._signature:
+                self.log("画面構成の変更を検出したためモニター情報を取得し直します")
+                return True
+        return False
+
+    @property
+    def monitors(self) -> list:
+        """モニター構成（[0]は全モニターを含む仮想画面）"""
+        self._check_owner()
+        if self._needs_refresh():
+            self._open()
+        return self._monitors
+
+    def grab(self, monitor_index: int = 0):
+        """
+        モニターを撮影
+
+        取得に失敗した場合はmssのインスタンスとモニター構成を作り直して1回だけ再試行します。
+
+        Args:
+            monitor_index: モニター番号（0は全モニターを含む仮想画面）
+
+        Returns:
+            mssのScreenShot（BGRA形式）
+        """
+        self._check_owner()
+        if self._needs_refresh():
+            self._open()
+
+        try:
+            screenshot = self._sct.grab(self._monitors[monitor_index])
+        except Exception as e:
+            self.log(f"画面の取得に失敗したためモニター情報を取得し直します: {str(e)}")
+            self._open()
+            screenshot = self._sct.grab(self._monitors[monitor_index])
+
+        self.grabs += 1
+        return screenshot
+
+    def to_image(self, screenshot, monitor_index: int = 0):
+        """
+        撮影結果をPIL Imageに変換
+
+        変換先の画像はモニターごとに保持し、次の撮影の変換で再利用されます。
+
+        Args:
+            screenshot: grabの戻り値
+            monitor_index: 撮影したモニター番号
+        """
+        converter = self._converters.get(monitor_index)
+        if converter is None:
+            converter = self._converters[monitor_index] = FrameConverter()
+        return converter.to_image(screenshot.raw, screenshot.width, screenshot.height)
+
+    def close(self):
+        """mssのインスタンスを閉じる（撮影スレッドの終了時に呼び出す）"""
+        self._close_sct()
+        self._converters.clear()
+        self._owner = None
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+オフライン用スプールモジュール
+アップロードできなかった撮影画像をローカルに保存し、接続回復後に再送します。
+
+スプールディレクトリの構成:
+    manifest.jsonl  追記専用のマニフェスト（add / done / evict の記録）
+    data/           画像ファイル本体（<エントリID>_<ファイル名>）
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import threading
+
+from screenshot_engine.config import (
+    SPOOL_DIR,
+    SPOOL_MAX_BYTES,
+    SPOOL_MAX_AGE_HOURS,
+    SPOOL_RETRY_BASE_SECONDS,
+    SPOOL_RETRY_MAX_SECONDS,
+)
+
+MANIFEST_NAME = 'manifest.jsonl'
+DATA_DIR_NAME = 'data'
+
+# 完了・破棄済みの記録がこの件数を超えたらマニフェストを圧縮する
+COMPACT_THRESHOLD = 200
+
+
+class SpoolEntry:
+    """スプールに保存された撮影画像"""
+
+    def __init__(self, entry_id: str, file_name: str, path: str, size: int, created_at: float):
+        self.entry_id = entry_id
+        self.file_name = file_name
+        self.path = path
+        self.size = size
+        self.created_at = created_at
+        self.attempts = 0
+
+    def to_record(self) -> dict:
+        """マニフェストのaddレコードに変換"""
+        return {
+            'op': 'add',
+            'id': self.entry_id,
+            'file_name': self.file_name,
+            'content': os.path.basename(self.path),
+            'size': self.size,
+            'created_at': self.created_at,
+        }
+
+    def __repr__(self):
+        return f"SpoolEntry({self.file_name!r})"
+
+
+class CaptureSpool:
+    """クラッシュ耐性のあるローカルスプール"""
+
+    def __init__(self, directory: str = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES,
+                 max_age_hours: float = SPOOL_MAX_AGE_HOURS, log=None):
+        """
+        初期化（既存のマニフェストがあれば読み込んで未送信分を復元）
+
+        Args:
+            directory: スプールディレクトリ
+            max_bytes: スプールの最大合計サイズ（超過時は古い順に破棄、0で無制限）
+            max_age_hours: 保持する最大時間（超過したものは破棄、0で無制限）
+            log: ログ出力関数
+        """
+        self.directory = directory
+        self.data_dir = os.path.join(directory, DATA_DIR_NAME)
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_hours * 3600
+        self.log = log or (lambda message: None)
+
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._dead_records = 0
+        # エントリが追加されたときに呼び出す関数（SpoolReplayerが登録）
+        self._listeners = []
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._load()
+
+    # ----- マニフェスト -----
+    def _load(self):
+        """マニフェストを再生して未送信エントリを復元"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中でクラッシュした行は無視
+                        continue
+                    if record.get('op') == 'add':
+                        path = os.path.join(self.data_dir, record['content'])
+                        self._entries[record['id']] = SpoolEntry(
+                            record['id'], record['file_name'], path,
+                            record.get('size', 0), record.get('created_at', 0)
+                        )
+                    elif self._entries.pop(record.get('id'), None) is not None:
+                        self._dead_records += 1
+
+        # 本体ファイルが失われたエントリは破棄
+        for entry_id, entry in list(self._entries.items()):
+            if not os.path.exists(entry.path):
+                del self._entries[entry_id]
+                self._dead_records += 1
+
+        # マニフェストに記録のないファイル（書き込み途中・削除漏れ）を削除
+        live = {os.path.basename(entry.path) for entry in self._entries.values()}
+        for name in os.listdir(self.data_dir):
+            if name not in live:
+                try:
+                    os.remove(os.path.join(self.data_dir, name))
+                except OSError:
+                    pass
+
+        self._compact_if_needed(force=self._dead_records > 0)
+        if self._entries:
+            self.log(f"スプールから未送信の撮影画像を復元: {len(self._entries)}件")
+
+    def _append(self, record: dict):
+        """マニフェストにレコードを追記してディスクへ同期"""
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact_if_needed(self, force: bool = False):
+        """完了済みの記録が溜まったらマニフェストを書き直す"""
+        if not force and self._dead_records < COMPACT_THRESHOLD:
+            return
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self._ordered():
+                f.write(json.dumps(entry.to_record(), ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+        self._dead_records = 0
+
+    def _ordered(self) -> list:
+        return sorted(self._entries.values(), key=lambda entry: entry.created_at)
+
+    # ----- 操作 -----
+    def add(self, file_name: str, source_path: str = None, data: bytes = None) -> SpoolEntry:
+        """
+        撮影画像をスプールに保存
+
+        Args:
+            file_name: Googleドライブ上のファイル名
+            source_path: 保存元のファイルパス（dataと排他）
+            data: 画像データ（source_pathと排他）
+
+        Returns:
+            追加したSpoolEntry
+        """
+        entry_id = uuid.uuid4().hex
+        path = os.path.join(self.data_dir, f"{entry_id}_{file_name}")
+        temp_path = path + '.tmp'
+
+        # 本体を書き込んでからマニフェストに記録する（逆順だとクラッシュ時に参照切れになる）
+        with open(temp_path, 'wb') as f:
+            if data is not None:
+                f.write(data)
+            else:
+                with open(source_path, 'rb') as src:
+                    shutil.copyfileobj(src, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        entry = SpoolEntry(entry_id, file_name, path, os.path.getsize(path), time.time())
+        with self._lock:
+            self._append(entry.to_record())
+            self._entries[entry_id] = entry
+            self.evict()
+            listeners = list(self._listeners)
+        self.log(f"スプールに保存: {file_name}")
+        for listener in listeners:
+            listener(entry)
+        return entry
+
+    def add_listener(self, listener):
+        """エントリが追加されたときに呼び出す関数 listener(entry) を登録"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """add_listener()で登録した関数を解除"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def complete(self, entry: SpoolEntry):
+        """アップロード完了したエントリを削除"""
+        self._remove(entry, 'done')
+
+    def _remove(self, entry: SpoolEntry, op: str):
+        with self._lock:
+            if self._entries.pop(entry.entry_id, None) is None:
+                return
+            self._append({'op': op, 'id': entry.entry_id})
+            self._dead_records += 1
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            self._compact_if_needed()
+
+    def evict(self) -> int:
+        """
+        サイズ・保持期間の上限を超えたエントリを古い順に破棄
+
+        Returns:
+            破棄した件数
+        """
+        evicted = 0
+        with self._lock:
+            now = time.time()
+            ordered = self._ordered()
+            total = sum(entry.size for entry in ordered)
+            for entry in ordered:
+                expired = self.max_age_seconds > 0 and now - entry.created_at > self.max_age_seconds
+                over_size = self.max_bytes > 0 and total > self.max_bytes
+                if not expired and not over_size:
+                    break
+                self._remove(entry, 'evict')
+                total -= entry.size
+                evicted += 1
+                self.log(f"スプール上限超過のため破棄: {entry.file_name}")
+        return evicted
+
+    def pending(self) -> list:
+        """未送信エントリを古い順に取得"""
+        with self._lock:
+            return self._ordered()
+
+    def size_bytes(self) -> int:
+        """未送信エントリの合計サイズ"""
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SpoolReplayer:
+    """
+    スプールの未送信分を指数バックオフで再送するスレッド
+
+    再送は失敗回数の少ないエントリから（同じ回数なら古い順に）行うため、
+    常に拒否されるエントリがあっても後のエントリの再送を妨げません。
+    """
+
+    def __init__(self, spool: CaptureSpool, upload_func,
+                 base_delay: float = SPOOL_RETRY_BASE_SECONDS,
+                 max_delay: float = SPOOL_RETRY_MAX_SECONDS, log=None):
+        """
+        初期化
+
+        Args:
+            spool: 対象のスプール
+            upload_func: SpoolEntryを受け取りアップロードする関数（成功時True）
+            base_delay: 失敗後の最初の待機秒数
+            max_delay: 待機秒数の上限
+            log: ログ出力関数
+        """
+        self.spool = spool
+        self.upload_func = upload_func
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.log = log or (lambda message: None)
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._delay = 0.0
+        # 未送信分がなく、新しいエントリを待っている間True
+        self._idle = False
+
+    def start(self):
+        """再送スレッドを起動"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self.spool.add_listener(self._on_spooled)
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self._thread.start()
+
+    def notify(self, online: bool = False):
+        """
+        再送スレッドを起こす
+
+        Args:
+            online: Driveへの接続成功を確認済みの場合True（バックオフをリセット）
+        """
+        if online:
+            self._delay = 0.0
+        self._wakeup.set()
+
+    def _on_spooled(self, entry):
+        """スプールにエントリが追加された（待機中なら起こす。再送失敗後のバックオフ中は起こさない）"""
+        if self._idle:
+            self._wakeup.set()
+
+    def stop(self, timeout: float = 5.0):
+        """再送スレッドを停止"""
+        self.spool.remove_listener(self._on_spooled)
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_delay(self) -> float:
+        """次の待機秒数（指数バックオフ＋ジッター）"""
+        self._delay = min(self.max_delay, self._delay * 2 if self._delay else self.base_delay)
+        return self._delay * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.spool.evict()
+            self._idle = True
+            entries = self.spool.pending()
+            if not entries:
+                # 新しいエントリが追加されるまで待機（add()・notify()で起こされる）
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self._idle = False
+
+            # 失敗回数の少ないものから（同じ回数なら古い順）。失敗したエントリは後回しになる
+            entry = min(entries, key=lambda pending: pending.attempts)
+            entry.attempts += 1
+            try:
+                success = self.upload_func(entry)
+            except Exception as e:
+                self.log(f"スプール再送エラー: {str(e)}")
+                success = False
+
+            if success:
+                self.spool.complete(entry)
+                self._delay = 0.0
+                self.log(f"スプールから再送完了: {entry.file_name} (残り{len(self.spool)}件)")
+                continue
+
+            delay = self._next_delay()
+            self.log(f"スプール再送失敗: {entry.file_name} ({delay:.0f}秒後に再試行)")
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
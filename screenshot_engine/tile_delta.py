@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+タイル差分エンコードモジュール
+画面を固定サイズのタイルに分割してハッシュを取り、前回から変化したタイルだけを
+1枚の画像（アトラス）にまとめてアップロードします。定期的に全画面のキーフレームを送ります。
+
+差分画像はPNGで保存し、復元に必要な情報（マニフェスト）をPNGのテキストチャンクに埋め込みます。
+復元は reconstruct_frames.py で行います。
+"""
+
+import io
+import json
+import math
+import hashlib
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from screenshot_engine.config import (
+    DELTA_TILE_SIZE,
+    DELTA_KEYFRAME_INTERVAL,
+    DELTA_MAX_CHANGED_RATIO,
+)
+
+# PNGテキストチャンクのキー
+TILE_MANIFEST_KEY = 'screenshot-tile-delta'
+
+# 差分ファイル名の接尾辞（例: 20240101-user_103000_delta.png）
+DELTA_SUFFIX = '_delta'
+
+MANIFEST_VERSION = 1
+
+KIND_KEYFRAME = 'keyframe'
+KIND_DELTA = 'delta'
+KIND_UNCHANGED = 'unchanged'
+
+
+def delta_file_name(frame_name: str) -> str:
+    """フレームのファイル名から差分ファイル名を生成"""
+    stem = frame_name.rsplit('.', 1)[0]
+    return f"{stem}{DELTA_SUFFIX}.png"
+
+
+def tile_grid(width: int, height: int, tile_size: int) -> tuple:
+    """タイルの列数・行数"""
+    return math.ceil(width / tile_size), math.ceil(height / tile_size)
+
+
+def tile_hashes(buffer, width: int, height: int, tile_size: int) -> list:
+    """
+    BGRAバッファを行単位のメモリビューで読み取り、各タイルのハッシュを計算
+
+    Returns:
+        行優先に並んだタイルごとのダイジェストのリスト
+    """
+    view = memoryview(buffer).cast('B')
+    cols, rows = tile_grid(width, height, tile_size)
+    stride = width * 4
+    hashes = []
+    for ty in range(rows):
+        y0 = ty * tile_size
+        y1 = min(y0 + tile_size, height)
+        hashers = [hashlib.blake2b(digest_size=16) for _ in range(cols)]
+        for y in range(y0, y1):
+            row = view[y * stride:(y + 1) * stride]
+            for tx, hasher in enumerate(hashers):
+                hasher.update(row[tx * tile_size * 4:min((tx + 1) * tile_size, width) * 4])
+        hashes.extend(hasher.digest() for hasher in hashers)
+    return hashes
+
+
+def crop_tile(buffer, width: int, height: int, tile_size: int, tx: int, ty: int):
+    """BGRAバッファから1タイル分をRGB画像として切り出す"""
+    view = memoryview(buffer).cast('B')
+    x0, y0 = tx * tile_size, ty * tile_size
+    x1, y1 = min(x0 + tile_size, width), min(y0 + tile_size, height)
+    stride = width * 4
+    data = b''.join(view[y * stride + x0 * 4:y * stride + x1 * 4] for y in range(y0, y1))
+    return Image.frombytes('RGB', (x1 - x0, y1 - y0), data, 'raw', 'BGRX')
+
+
+class DeltaFrame:
+    """タイル差分エンコードの結果"""
+
+    def __init__(self, kind: str, file_name: str, manifest: dict = None, image=None):
+        """
+        Args:
+            kind: KIND_KEYFRAME / KIND_DELTA / KIND_UNCHANGED
+            file_name: アップロード時のファイル名（キーフレームは元のファイル名）
+            manifest: 差分のマニフェスト（差分のみ）
+            image: 変化したタイルをまとめたアトラス画像（差分のみ）
+        """
+        self.kind = kind
+        self.file_name = file_name
+        self.manifest = manifest
+        self.image = image
+
+    @property
+    def changed_tiles(self) -> int:
+        return len(self.manifest['tiles']) if self.manifest else 0
+
+    def save(self, fp, compress_level: int = 6):
+        """差分画像をマニフェスト付きPNGとして保存"""
+        info = PngInfo()
+        info.add_text(TILE_MANIFEST_KEY, json.dumps(self.manifest, separators=(',', ':')))
+        self.image.save(fp, format='PNG', pnginfo=info, compress_level=compress_level)
+
+    def to_bytes(self, compress_level: int = 6) -> bytes:
+        """差分画像をメモリ上でPNGにエンコード"""
+        buffer = io.BytesIO()
+        self.save(buffer, compress_level=compress_level)
+        return buffer.getvalue()
+
+
+class TileDeltaEncoder:
+    """前回フレームとのタイル差分を求めるエンコーダー"""
+
+    def __init__(self, tile_size: int = DELTA_TILE_SIZE, keyframe_interval: int = DELTA_KEYFRAME_INTERVAL,
+                 max_changed_ratio: float = DELTA_MAX_CHANGED_RATIO):
+        """
+        初期化
+
+        Args:
+            tile_size: タイルの一辺（ピクセル）
+            keyframe_interval: この枚数の差分ごとにキーフレームを送る
+            max_changed_ratio: 変化したタイルの割合がこれを超えたらキーフレームにする
+        """
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.max_changed_ratio = max_changed_ratio
+        self.reset()
+
+    def reset(self):
+        """状態をリセット（次のフレームは必ずキーフレームになる）"""
+        self._hashes = None
+        self._size = None
+        self._keyframe_name = None
+        self._previous_name = None
+        self._sequence = 0
+
+    def encode(self, buffer, width: int, height: int, frame_name: str) -> DeltaFrame:
+        """
+        フレームをキーフレームまたは差分に分類
+
+        Args:
+            buffer: BGRA形式の画素データ
+            width: 画像の幅
+            height: 画像の高さ
+            frame_name: フレームのファイル名（YYYYMMDD-ユーザー名_HHMMSS.拡張子）
+
+        Returns:
+            DeltaFrame（キーフレームの場合、画像の変換・保存は呼び出し側で行う）
+        """
+        hashes = tile_hashes(buffer, width, height, self.tile_size)
+
+        if (self._hashes is None or self._size != (width, height)
+                or self._sequence >= self.keyframe_interval):
+            return self._keyframe(hashes, width, height, frame_name)
+
+        changed = [i for i, (old, new) in enumerate(zip(self._hashes, hashes)) if old != new]
+        if not changed:
+            return DeltaFrame(KIND_UNCHANGED, frame_name)
+        if len(changed) > len(hashes) * self.max_changed_ratio:
+            return self._keyframe(hashes, width, height, frame_name)
+
+        cols, _ = tile_grid(width, height, self.tile_size)
+        atlas_cols = math.ceil(math.sqrt(len(changed)))
+        atlas_rows = math.ceil(len(changed) / atlas_cols)
+        atlas = Image.new('RGB', (atlas_cols * self.tile_size, atlas_rows * self.tile_size))
+
+        tiles = []
+        for n, index in enumerate(changed):
+            tx, ty = index % cols, index // cols
+            ax, ay = (n % atlas_cols) * self.tile_size, (n // atlas_cols) * self.tile_size
+            tile = crop_tile(buffer, width, height, self.tile_size, tx, ty)
+            atlas.paste(tile, (ax, ay))
+            tiles.append([tx, ty, ax, ay, tile.width, tile.height])
+
+        self._sequence += 1
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'frame': frame_name,
+            'keyframe': self._keyframe_name,
+            'previous': self._previous_name,
+            'sequence': self._sequence,
+            'width': width,
+            'height': height,
+            'tile_size': self.tile_size,
+            'tiles': tiles,
+        }
+        self._hashes = hashes
+        self._previous_name = frame_name
+        return DeltaFrame(KIND_DELTA, delta_file_name(frame_name), manifest, atlas)
+
+    def _keyframe(self, hashes, width, height, frame_name):
+        self._hashes = hashes
+        self._size = (width, height)
+        self._keyframe_name = frame_name
+        self._previous_name = frame_name
+        self._sequence = 0
+        return DeltaFrame(KIND_KEYFRAME, frame_name)
+
+
+def read_manifest(img) -> dict:
+    """差分画像からマニフェストを取り出す（差分でなければNone）"""
+    text = img.info.get(TILE_MANIFEST_KEY)
+    return json.loads(text) if text else None
+
+
+def apply_delta(canvas, atlas, manifest: dict):
+    """
+    前回の復元フレームに差分タイルを貼り付ける
+
+    Args:
+        canvas: 前回のフレーム（RGB画像、上書きされる）
+        atlas: 差分画像
+        manifest: 差分のマニフェスト
+    """
+    if canvas.size != (manifest['width'], manifest['height']):
+        raise ValueError(f"フレームサイズが一致しません: {canvas.size} != "
+                         f"({manifest['width']}, {manifest['height']})")
+    tile_size = manifest['tile_size']
+    for tx, ty, ax, ay, w, h in manifest['tiles']:
+        tile = atlas.crop((ax, ay, ax + w, ay + h))
+        canvas.paste(tile, (tx * tile_size, ty * tile_size))
+    return canvas
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+アップロードパイプラインモジュール
+撮影処理とアップロード処理を分離し、有界キューとワーカースレッドでアップロードを行います。
+"""
+
+import threading
+import time
+from collections import deque
+
+from screenshot_engine.config import (
+    UPLOAD_WORKERS,
+    UPLOAD_QUEUE_SIZE,
+    UPLOAD_OVERFLOW_POLICY,
+    UPLOAD_BLOCK_TIMEOUT_SECONDS,
+)
+
+# キュー満杯時の動作（破棄したジョブはon_dropへ。CaptureEngineはスプールに退避し、接続回復後に再送する）
+OVERFLOW_BLOCK = 'block'              # 空きが出るまで待機（タイムアウト後は新しいジョブを破棄）
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # 最も古いジョブを破棄して追加
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # 新しいジョブを破棄
+
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+
+class UploadJob:
+    """アップロード待ちの撮影データ"""
+
+    def __init__(self, file_name: str, data: bytes = None, mimetype: str = None, group: str = None,
+                 frame_hash: int = None, monitor_index: int = 0, batch_members: list = None):
+        """
+        初期化
+
+        Args:
+            file_name: Googleドライブ上のファイル名
+            data: エンコード済みの画像データ（ディスクには書き出さない）
+            mimetype: 画像のMIMEタイプ（省略時はファイル名から判定）
+            group: 同時に撮影したジョブの識別名（モニター別撮影で共通の撮影時刻）
+            frame_hash: 撮影画像の差分ハッシュ（アップロード後に重複判定の比較対象にする）
+            monitor_index: 撮影したモニター（0は仮想画面全体）
+            batch_members: まとめてアップロードのアーカイブに含めた撮影画像のファイル名
+        """
+        self.file_name = file_name
+        self.data = data
+        self.mimetype = mimetype
+        self.group = group
+        self.frame_hash = frame_hash
+        self.monitor_index = monitor_index
+        self.batch_members = batch_members
+        self.created_at = time.time()
+
+    def __repr__(self):
+        return f"UploadJob({self.file_name!r})"
+
+
+class UploadPipeline:
+    """有界キューとアップロードワーカーによるパイプライン"""
+
+    def __init__(self, upload_func, workers: int = UPLOAD_WORKERS, max_queue: int = UPLOAD_QUEUE_SIZE,
+                 overflow_policy: str = UPLOAD_OVERFLOW_POLICY,
+                 block_timeout: float = UPLOAD_BLOCK_TIMEOUT_SECONDS,
+                 on_drop=None, log=None):
+        """
+        初期化
+
+        Args:
+            upload_func: ジョブを受け取りアップロードする関数（成功時True）
+            workers: アップロードワーカー数
+            max_queue: キューの最大長
+            overflow_policy: キュー満杯時の動作（OVERFLOW_POLICIESのいずれか）
+            block_timeout: OVERFLOW_BLOCK時の最大待機秒数
+            on_drop: 破棄されたジョブを受け取る関数 on_drop(job, reason)
+            log: ログ出力関数
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"不明なオーバーフローポリシー: {overflow_policy}")
+
+        self.upload_func = upload_func
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.on_drop = on_drop
+        self.log = log or (lambda message: None)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = False
+        self._active = 0
+
+        # 統計情報
+        self.submitted = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        """ワーカースレッドを起動"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"upload-worker-{i + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job: UploadJob) -> bool:
+        """
+        ジョブをキューに追加（撮影スレッドから呼び出す）
+
+        Returns:
+            キューに追加できた場合True
+        """
+        dropped = []
+        accepted = True
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == OVERFLOW_BLOCK:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_queue and self._running:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if len(self._queue) >= self.max_queue:
+                        dropped.append((job, 'queue_full'))
+                        accepted = False
+                elif self.overflow_policy == OVERFLOW_DROP_OLDEST:
+                    dropped.append((self._queue.popleft(), 'drop_oldest'))
+                elif self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                    dropped.append((job, 'drop_newest'))
+                    accepted = False
+
+            if accepted:
+                self._queue.append(job)
+                self.submitted += 1
+                self._cond.notify_all()
+            self.dropped += len(dropped)
+
+        for dropped_job, reason in dropped:
+            self._drop(dropped_job, reason)
+        return accepted
+
+    def _drop(self, job, reason):
+        """破棄されたジョブを通知"""
+        self.log(f"アップロードキュー満杯のためジョブを破棄 ({reason}): {job.file_name}")
+        if self.on_drop:
+            try:
+                self.on_drop(job, reason)
+            except Exception as e:
+                self.log(f"破棄ジョブの処理エラー: {str(e)}")
+
+    def _worker(self):
+        """キューからジョブを取り出してアップロード"""
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                self._active += 1
+                self._cond.notify_all()
+
+            try:
+                success = self.upload_func(job)
+            except Exception as e:
+                self.log(f"アップロードワーカーエラー: {str(e)}")
+                success = False
+
+            with self._cond:
+                self._active -= 1
+                if success:
+                    self.uploaded += 1
+                else:
+                    self.failed += 1
+                self._cond.notify_all()
+
+    def qsize(self) -> int:
+        """キューに残っているジョブ数"""
+        with self._cond:
+            return len(self._queue)
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """キューが空になり実行中のアップロードがなくなるまで待機"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stop(self, timeout: float = 10.0) -> list:
+        """
+        ワーカーを停止
+
+        Args:
+            timeout: 実行中のアップロードの完了を待つ最大秒数
+
+        Returns:
+            未処理のままキューに残ったジョブのリスト
+        """
+        with self._cond:
+            self._running = False
+            pending = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        return pending
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+再開可能アップロードのセッション保存モジュール
+再開可能アップロードのセッションURIをファイルに保存し、アップロードが中断した場合は
+再起動後も（スプールから再送する際に）受信済みの位置から続きを送信できるようにします。
+
+    {"<フォルダID>/<ファイル名>/<サイズ>": {"uri": "https://...", "created_at": 1700000000.0}, ...}
+
+セッションURIは知っていれば認証なしで同じファイルに書き込めるため、ファイルは本人のみ読み書きできる
+権限（0600）で保存します（Windowsでは保存先フォルダのアクセス権を引き継ぎます）。
+"""
+
+import os
+import json
+import time
+import threading
+
+from screenshot_engine.config import UPLOAD_SESSION_FILE, UPLOAD_SESSION_MAX_AGE_HOURS
+
+# 保存するファイルの権限（所有者のみ読み書き）
+SESSION_FILE_MODE = 0o600
+
+
+def session_key(folder_id: str, file_name: str, size: int) -> str:
+    """セッションを識別するキー（同じ撮影画像を同じフォルダに送る場合のみ再開する）"""
+    return f"{folder_id}/{file_name}/{size}"
+
+
+def status_query_headers(size: int) -> dict:
+    """受信済みの範囲を問い合わせる空のPUTのヘッダー"""
+    return {'Content-Range': f"bytes */{size}", 'Content-Length': '0'}
+
+
+def received_bytes(range_header) -> int:
+    """308応答のRangeヘッダー（bytes=0-N）から受信済みのバイト数を求める（ない場合は0）"""
+    return int(range_header.rsplit('-', 1)[1]) + 1 if range_header else 0
+
+
+class UploadSessionStore:
+    """セッションURIを保存するファイル（更新のたびに一時ファイルから置き換える）"""
+
+    def __init__(self, path: str = UPLOAD_SESSION_FILE, max_age_hours: float = UPLOAD_SESSION_MAX_AGE_HOURS,
+                 clock=time.time, log=None):
+        """
+        初期化（既存のファイルがあれば読み込み、期限切れのセッションは破棄）
+
+        Args:
+            path: 保存先のファイル
+            max_age_hours: セッションURIを使用する最大時間
+            clock: 現在時刻（秒）を返す関数
+            log: ログ出力関数
+        """
+        self.path = path
+        self.max_age_seconds = max_age_hours * 3600
+        self.clock = clock
+        self.log = log or (lambda message: None)
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+        if os.path.exists(path):
+            try:
+                # 以前の版で作成したファイルも本人のみ読み書きできるようにする
+                os.chmod(path, SESSION_FILE_MODE)
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._sessions = json.load(f)
+            except (OSError, ValueError) as e:
+                # 書き込み途中で壊れたファイルは破棄（最初からアップロードし直す）
+                self.log(f"アップロードセッションの読み込みエラー: {str(e)}")
+                self._sessions = {}
+
+        with self._lock:
+            if self._prune():
+                self._save()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _prune(self) -> bool:
+        """期限切れのセッションを破棄（_lockを保持して呼び出す）"""
+        limit = self.clock() - self.max_age_seconds
+        expired = [key for key, session in self._sessions.items()
+                   if not isinstance(session, dict) or session.get('created_at', 0) < limit]
+        for key in expired:
+            del self._sessions[key]
+        return bool(expired)
+
+    def _save(self):
+        """ファイルに書き出す（_lockを保持して呼び出す）"""
+        try:
+            temp_path = f"{self.path}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, SESSION_FILE_MODE)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._sessions, f, ensure_ascii=False)
+            # 残っていた一時ファイルを開いた場合は作成時の権限が適用されないため設定し直す
+            os.chmod(temp_path, SESSION_FILE_MODE)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.log(f"アップロードセッションの保存エラー: {str(e)}")
+
+    def get(self, key: str):
+        """保存したセッションURI（ない場合・期限切れの場合はNone）"""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if session.get('created_at', 0) < self.clock() - self.max_age_seconds:
+                del self._sessions[key]
+                self._save()
+                return None
+            return session['uri']
+
+    def put(self, key: str, uri: str):
+        """セッションURIを保存"""
+        with self._lock:
+            self._sessions[key] = {'uri': uri, 'created_at': self.clock()}
+            self._prune()
+            self._save()
+
+    def remove(self, key: str):
+        """セッションURIを削除（アップロードの完了時・セッションの期限切れ時）"""
+        with self._lock:
+            if self._sessions.pop(key, None) is not None:
+                self._save()
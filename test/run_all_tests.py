@@ -41,6 +41,26 @@ def main():
     import test_encryption
     import test_api_auth
     import test_upload
+    import test_drive_session
+    import test_upload_pipeline
+    import test_spool
+    import test_frame_dedup
+    import test_tile_delta
+    import test_image_encoder
+    import test_log_writer
+    import test_metrics
+    import test_metrics_server
+    import test_screen_grabber
+    import test_monitor_capture
+    import test_frame_policy
+    import test_adaptive_interval
+    import test_capture_scheduler
+    import test_capture_engine
+    import test_startup
+    import test_identity_pool
+    import test_drive_rest
+    import test_upload_sessions
+    import test_capture_batch
     
     # テストリスト
     tests = [
@@ -48,11 +68,35 @@ def main():
         ("スクリーンショット撮影", test_screenshot.test_screenshot_capture),
         ("暗号化機能", test_encryption.test_encryption),
         ("鍵導出機能", test_encryption.test_key_derivation),
+        ("鍵キャッシュ", test_encryption.test_key_cache),
+        ("マシンID", test_encryption.test_machine_id),
         ("API認証", test_api_auth.test_service_account_auth),
         ("フォルダアクセス", test_api_auth.test_folder_access),
         ("基本アップロード", test_upload.test_upload_basic),
         ("複数ファイルアップロード", test_upload.test_upload_multiple),
         ("大容量ファイルアップロード", test_upload.test_large_file_upload),
+        ("Drive APIセッション", test_drive_session.test_drive_session_reuse),
+        ("アップロードパイプライン", test_upload_pipeline.test_upload_pipeline),
+        ("スプール永続化", test_spool.test_spool_persistence),
+        ("スプール再送", test_spool.test_spool_replay),
+        ("重複フレーム判定", test_frame_dedup.test_frame_dedup),
+        ("タイル差分エンコード", test_tile_delta.test_tile_delta),
+        ("画像エンコーダー", test_image_encoder.test_image_encoders),
+        ("ログ出力", test_log_writer.test_log_writer),
+        ("JSON形式ログ", test_log_writer.test_log_writer_json),
+        ("処理時間の計測", test_metrics.test_metrics),
+        ("監視用エンドポイント", test_metrics_server.test_metrics_server),
+        ("画面取得", test_screen_grabber.test_screen_grabber),
+        ("モニター別撮影", test_monitor_capture.test_monitor_capture),
+        ("縮小・撮影範囲", test_frame_policy.test_frame_policy),
+        ("撮影間隔の自動調整", test_adaptive_interval.test_adaptive_interval),
+        ("撮影スケジューラー", test_capture_scheduler.test_capture_scheduler),
+        ("撮影エンジン", test_capture_engine.test_capture_engine),
+        ("起動時の遅延読み込み", test_startup.test_startup_imports),
+        ("サービスアカウント分散", test_identity_pool.test_identity_pool),
+        ("Drive REST アップロード", test_drive_rest.test_drive_rest),
+        ("マルチパート・再開可能アップロード", test_upload_sessions.test_upload_sessions),
+        ("まとめてアップロード", test_capture_batch.test_capture_batch),
     ]
     
     # 結果を記録
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撮影間隔の自動調整のテスト
+"""
+
+import os
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.adaptive_interval import AdaptiveInterval
+
+JST = ZoneInfo("Asia/Tokyo")
+
+# 差分ハッシュの距離が0 / 8 / 32になる値
+STATIC = 0
+MODERATE = 0xFF
+ACTIVE = 0xFFFFFFFF
+
+
+class FakeClock:
+    """任意の時刻を返す時計"""
+
+    def __init__(self, hour):
+        self.now = datetime(2024, 1, 15, hour, 0, tzinfo=JST).timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+def test_adaptive_interval():
+    """変化量による間隔・ロック中・1日の撮影回数の上限のテスト"""
+    print("=== 撮影間隔の自動調整テスト ===")
+
+    clock = FakeClock(hour=9)
+    locked = {'value': False}
+    interval = AdaptiveInterval(300, min_seconds=60, max_seconds=1800, active_distance=16,
+                                static_distance=4, backoff=2.0, daily_budget=0,
+                                locked_func=lambda: locked['value'], clock=clock)
+
+    # 1. 変化が大きいと短く、静止していると長くなる（下限・上限あり）
+    print("\n1. 変化量テスト...")
+    interval.observe(STATIC)
+    delays = []
+    for frame_hash in (ACTIVE, STATIC, ACTIVE, STATIC):
+        interval.observe(frame_hash)
+        delays.append(interval.next_delay())
+    assert delays == [150, 75, 60, 60], f"変化が大きいときの間隔が不正: {delays}"
+
+    delays = []
+    for _ in range(6):
+        interval.observe(STATIC)
+        delays.append(interval.next_delay())
+    assert delays == [120, 240, 480, 960, 1800, 1800], f"静止しているときの間隔が不正: {delays}"
+
+    interval.observe(MODERATE)
+    assert interval.next_delay() == 300, "変化が中程度なら基準の間隔に戻るはず"
+    print("✓ 60秒〜1800秒の範囲で変化量に応じて調整")
+
+    # 2. モニター別撮影では最も変化の大きいモニターで判定
+    print("\n2. モニター別テスト...")
+    for key, frame_hashes in ((1, (STATIC, STATIC)), (2, (STATIC, ACTIVE))):
+        for frame_hash in frame_hashes:
+            interval.observe(frame_hash, key)
+    assert interval.next_delay() == 150, "変化の大きいモニターが優先されていない"
+    print("✓ モニターごとの変化量の最大値を使用")
+
+    # 3. ロック中は撮影せず間隔を延ばす
+    print("\n3. ロック中テスト...")
+    locked['value'] = True
+    assert not interval.begin_capture(), "ロック中に撮影された"
+    assert interval.next_delay() == 300
+    assert interval.next_delay() == 600, "ロック中に間隔が延びていない"
+    locked['value'] = False
+    assert interval.begin_capture()
+    print("✓ ロック中は撮影を省略")
+
+    # 4. 1日の撮影回数の上限
+    print("\n4. 撮影回数の上限テスト...")
+    clock = FakeClock(hour=20)
+    budget = AdaptiveInterval(300, min_seconds=60, max_seconds=1800, daily_budget=3,
+                              locked_func=lambda: False, clock=clock)
+    assert budget.begin_capture() and budget.remaining_budget == 2
+    # 残り4時間を最長間隔（30分）で撮影するには8回必要なため、残り2回で均等に割り当てる
+    assert budget.next_delay() == 4 * 3600 / 2, "残りの回数で間隔が広がっていない"
+    assert budget.begin_capture() and budget.begin_capture()
+    assert not budget.begin_capture(), "上限を超えて撮影された"
+    assert budget.next_delay() == 4 * 3600, "上限に達したら翌日0時まで待つはず"
+
+    clock.now += 4 * 3600 + 1
+    assert budget.remaining_budget == 3, "日付が変わっても撮影回数がリセットされない"
+    assert budget.begin_capture()
+    print("✓ 上限に達したら翌日まで撮影しない")
+
+    print("\n=== すべての撮影間隔の自動調整テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_adaptive_interval()
+    print("\n✅ 撮影間隔の自動調整テスト完了")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+まとめてアップロードのテスト
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.capture_batch import CaptureBatch, archive_name, ARCHIVE_TAR, INDEX_NAME
+from screenshot_engine.capture_engine import CaptureEngine
+from screenshot_engine.upload_pipeline import UploadJob
+from screenshot_engine.image_encoder import mimetype_for
+from screenshot_engine.spool import CaptureSpool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePipeline:
+    """submit()されたジョブを記録するアップロードパイプライン"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job):
+        self.jobs.append(job)
+        return True
+
+
+class BrokenSpool:
+    """保存できないスプール（ディスク満杯など）"""
+
+    def add(self, file_name, data=None):
+        raise OSError("No space left on device")
+
+
+def capture_name(index):
+    return f"20240101-user_{120000 + index:06d}.png"
+
+
+def test_capture_batch():
+    """件数・経過時間によるまとめ、アーカイブの内容、エンジンからの利用のテスト"""
+    print("=== まとめてアップロードテスト ===")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # 1. 件数に達したらzipにまとめ、撮影時のファイル名と索引を含める
+        print("\n1. 件数によるまとめテスト...")
+        clock = FakeClock()
+        directory = os.path.join(temp_dir, 'batch')
+        batch = CaptureBatch(directory, max_captures=3, max_seconds=600, clock=clock)
+        captures = {capture_name(i): os.urandom(500 + i) for i in range(3)}
+        for index, (name, data) in enumerate(captures.items()):
+            assert not batch.is_due(), f"{index}件でまとめの条件を満たした"
+            batch.add(name, data)
+        assert batch.is_due(), "件数に達してもまとめの条件を満たさない"
+
+        name, data, members = batch.build_archive()
+        assert name == '20240101-user_120000_batch.zip', f"アーカイブ名が不正: {name}"
+        assert members == sorted(captures), f"まとめた撮影画像が不正: {members}"
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            index = json.loads(archive.read(INDEX_NAME))
+            for capture, content in captures.items():
+                assert archive.read(capture) == content, f"{capture}の内容が不正"
+        assert index['count'] == 3 and [item['name'] for item in index['captures']] == sorted(captures)
+        assert index['captures'][0]['sha256'] == hashlib.sha256(captures[capture_name(0)]).hexdigest()
+        assert sorted(os.listdir(directory)) == sorted(captures), "remove()の前に撮影画像が削除された"
+        assert len(batch) == 0 and batch.build_archive() is None, "まとめた撮影画像が次のアーカイブにも含まれる"
+        batch.remove(members)
+        assert len(batch) == 0 and os.listdir(directory) == [], "まとめた撮影画像が削除されない"
+        print(f"✓ 3件を {name} にまとめ、index.jsonにサイズ・SHA-256を記録")
+
+        # 2. 件数に達しなくても最も古い撮影画像から一定時間でまとめる（再起動後も続きから溜める）
+        print("\n2. 経過時間・再起動テスト...")
+        batch.add(capture_name(10), b'first')
+        clock.now += 300
+        with open(os.path.join(directory, capture_name(11) + '.tmp'), 'wb') as f:
+            f.write(b'partial')
+        restarted = CaptureBatch(directory, max_captures=3, max_seconds=600, clock=clock)
+        assert len(restarted) == 1, "再起動後に溜めた撮影画像が読み込まれない"
+        assert not os.path.exists(os.path.join(directory, capture_name(11) + '.tmp')), "書き込み途中のファイルが残っている"
+        assert not restarted.is_due(), "経過時間に達する前にまとめの条件を満たした"
+        # 再起動後はファイルの更新時刻を溜めた時刻とする
+        os.utime(os.path.join(directory, capture_name(10)), (clock.now - 700, clock.now - 700))
+        restarted = CaptureBatch(directory, max_captures=3, max_seconds=600, clock=clock)
+        assert restarted.is_due(), "経過時間に達してもまとめの条件を満たさない"
+        print("✓ 1件でも一定時間が経過するとまとめる")
+
+        # 3. tar.gz形式
+        print("\n3. tar形式テスト...")
+        tar_batch = CaptureBatch(directory, max_captures=3, archive_format=ARCHIVE_TAR, clock=clock)
+        name, data, members = tar_batch.build_archive()
+        assert name == '20240101-user_120010_batch.tar.gz', f"アーカイブ名が不正: {name}"
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as archive:
+            assert sorted(archive.getnames()) == sorted([INDEX_NAME, capture_name(10)])
+            assert archive.extractfile(capture_name(10)).read() == b'first'
+        tar_batch.remove(members)
+        assert archive_name('20240101-user_name_120000_m2.png') == '20240101-user_name_120000_batch.zip', \
+            "モニター別撮影のファイル名からアーカイブ名を作れない"
+        assert mimetype_for(name) == 'application/gzip' and mimetype_for('a_batch.zip') == 'application/zip'
+        print("✓ tar.gzにまとめ、スプールからの再送時もMIMEタイプを判定できる")
+
+        # 4. エンジンは撮影画像を溜め、条件を満たしたらアーカイブ1つだけをアップロードキューに登録
+        print("\n4. エンジンからの利用テスト...")
+        engine = CaptureEngine('folder-id', lambda: None, log_file=os.path.join(temp_dir, 'engine.log'))
+        engine.batch_enabled = True
+        engine._capture_batch = CaptureBatch(os.path.join(temp_dir, 'engine_batch'), max_captures=4,
+                                             clock=clock, log=engine.log)
+        pipeline = FakePipeline()
+        for i in range(10):
+            engine.add_to_batch([UploadJob(capture_name(20 + i), b'png-%d' % i, 'image/png')], pipeline)
+        assert [job.file_name for job in pipeline.jobs] == [
+            '20240101-user_120020_batch.zip', '20240101-user_120024_batch.zip'
+        ], f"登録されたジョブが不正: {pipeline.jobs}"
+        assert pipeline.jobs[0].mimetype == 'application/zip'
+        assert engine.get_pipeline_status()['batch_pending'] == 2, "溜めている件数が不正"
+
+        # 撮影しなかった場合も経過時間でまとめる
+        clock.now += 3600
+        engine.add_to_batch([], pipeline)
+        assert len(pipeline.jobs) == 3 and engine.get_pipeline_status()['batch_pending'] == 0
+        assert engine.flush_batch(pipeline) is None, "溜めた撮影画像がないのにアーカイブが作られた"
+        assert engine.metrics_registry.snapshot()['counters']['batch_archives'] == 3
+        print("✓ 10件の撮影をアーカイブ3件（4件・4件・経過時間で2件）でアップロード")
+
+        # 5. 撮影画像はアーカイブのアップロード・スプール保存が済むまで削除しない
+        print("\n5. アーカイブの完了待ちテスト...")
+        engine_dir = os.path.join(temp_dir, 'engine_batch')
+        assert len(os.listdir(engine_dir)) == 10, "アーカイブの完了前に撮影画像が削除された"
+        engine.upload_with_failover = lambda file_name, upload: True
+        assert engine.process_upload_job(pipeline.jobs[0])
+        assert len(os.listdir(engine_dir)) == 6, "アップロードした撮影画像が削除されない"
+
+        # キュー満杯で破棄されたアーカイブはスプールに退避してから削除
+        engine._capture_spool = CaptureSpool(directory=os.path.join(temp_dir, 'spool'), log=engine.log)
+        engine.discard_upload_job(pipeline.jobs[1], 'drop_oldest')
+        assert [entry.file_name for entry in engine.get_capture_spool().pending()] == [pipeline.jobs[1].file_name]
+        assert len(os.listdir(engine_dir)) == 2, "スプールに退避した撮影画像が削除されない"
+
+        # スプールにも保存できなかったアーカイブの撮影画像は、次のアーカイブに含める
+        engine._capture_spool = BrokenSpool()
+        engine.discard_upload_job(pipeline.jobs[2], 'drop_oldest')
+        assert len(os.listdir(engine_dir)) == 2 and len(engine.get_capture_batch()) == 2
+        job = engine.flush_batch(pipeline)
+        assert job.batch_members == pipeline.jobs[2].batch_members, "失われたアーカイブの撮影画像がまとめ直されない"
+        engine.get_log_writer().close()
+        print("✓ アップロード・スプール保存の後に削除し、失われた場合は次のアーカイブに含める")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print("\n=== すべてのまとめてアップロードテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_capture_batch()
+    print("\n✅ まとめてアップロードテスト完了")
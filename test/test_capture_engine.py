@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撮影エンジン（CLI版・GUI版共通）のテスト
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from PIL import Image
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.capture_engine import CaptureEngine
+from screenshot_engine.screen_grabber import ScreenGrabber
+from screenshot_engine.spool import CaptureSpool
+from screenshot_engine.upload_pipeline import UploadJob, UploadPipeline, OVERFLOW_DROP_OLDEST
+
+
+class FakeShot:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.raw = bytearray(os.urandom(width * height * 4))
+
+
+class FakeMss:
+    monitors = [
+        {'width': 200, 'height': 80, 'left': 0, 'top': 0},
+        {'width': 100, 'height': 80, 'left': 0, 'top': 0},
+        {'width': 100, 'height': 80, 'left': 100, 'top': 0},
+    ]
+
+    def grab(self, monitor):
+        return FakeShot(monitor['width'], monitor['height'])
+
+    def close(self):
+        pass
+
+
+class FakeRequest:
+    def __init__(self, service, body):
+        self.service = service
+        self.body = body
+
+    def execute(self):
+        if self.service.fail:
+            raise ConnectionError("offline")
+        with self.service.lock:
+            self.service.uploaded.append(self.body['name'])
+        return {'id': f"id-{len(self.service.uploaded)}", 'name': self.body['name']}
+
+
+class FakeDriveService:
+    """アップロードしたファイル名を記録するDrive APIサービス"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.uploaded = []
+        self.lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def create(self, body, media_body, fields, supportsAllDrives):
+        assert body['parents'] == ['folder-id'], f"アップロード先が不正: {body['parents']}"
+        return FakeRequest(self, body)
+
+
+def create_engine(temp_dir, service):
+    """一時ディレクトリにログとスプールを置き、偽の画面取得とDrive APIを使うエンジン"""
+    engine = CaptureEngine(
+        'folder-id',
+        lambda: None,
+        interval_minutes=5,
+        log_file=os.path.join(temp_dir, 'engine.log'),
+        fallback_grab=lambda: Image.new('RGB', (64, 48), 'red'),
+        grabber_factory=lambda: ScreenGrabber(factory=FakeMss, signature_func=None),
+        username_func=lambda: 'tester'
+    )
+    engine.get_drive_service = lambda file_name=None: service
+    engine._capture_spool = CaptureSpool(directory=os.path.join(temp_dir, 'spool'), log=engine.log)
+    engine.dedup_enabled = False
+    engine.delta_enabled = False
+    engine.adaptive_enabled = False
+    engine.metrics_server_enabled = False
+    return engine
+
+
+def test_capture_engine():
+    """撮影・アップロード・撮影スレッドの開始と停止・終了時のスプール退避のテスト"""
+    print("=== 撮影エンジンテスト ===")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # 1. snapshot()で撮影した画像がパイプライン経由でアップロードされる
+        print("\n1. 撮影・アップロードテスト...")
+        service = FakeDriveService()
+        engine = create_engine(temp_dir, service)
+        jobs = engine.snapshot()
+        assert len(jobs) == 1, f"撮影件数が不正: {len(jobs)}"
+        assert jobs[0].file_name.endswith('.png') and '-tester_' in jobs[0].file_name, jobs[0].file_name
+        assert engine.get_upload_pipeline().wait_idle(10), "アップロードが終わらない"
+        assert service.uploaded == [jobs[0].file_name], f"アップロード結果が不正: {service.uploaded}"
+        metrics = engine.metrics()
+        assert metrics['counters']['captures'] == 1, f"撮影回数が不正: {metrics['counters']}"
+        assert metrics['queue_depth'] == 0
+        print(f"✓ {service.uploaded[0]} をアップロード")
+
+        # 2. モニター別撮影とmssが使えない場合の代替撮影
+        print("\n2. 撮影方式テスト...")
+        engine.capture_mode = 'per_monitor'
+        jobs = engine.snapshot()
+        assert [job.file_name.rsplit('_', 1)[-1] for job in jobs] == ['m1.png', 'm2.png'], \
+            f"モニター別のファイル名が不正: {[job.file_name for job in jobs]}"
+        engine.capture_mode = 'virtual'
+        engine.mss_available = False
+        jobs = engine.snapshot()
+        assert len(jobs) == 1 and jobs[0].data, "代替撮影でエンコードされない"
+        engine.mss_available = True
+        engine.get_upload_pipeline().wait_idle(10)
+        assert len(service.uploaded) == 4, f"アップロード件数が不正: {len(service.uploaded)}"
+        print("✓ モニター別撮影・代替撮影ともにアップロード")
+
+        # 3. 撮影スレッドの開始と停止
+        print("\n3. 開始・停止テスト...")
+        engine.interval_minutes = 0.1 / 60
+        assert engine.start(), "撮影スレッドが起動しない"
+        assert not engine.start(), "撮影中に2つ目のスレッドが起動した"
+        time.sleep(0.35)
+        engine.stop(timeout=2)
+        assert not engine.is_running(), "停止要求で終了しない"
+        assert engine._screen_grabber is None, "撮影スレッドの画面取得が閉じられていない"
+        captures = engine.metrics()['counters']['captures']
+        assert captures >= 6, f"撮影スレッドで撮影されていない: {captures}"
+        assert engine.start(), "停止後に再開できない"
+        engine.stop(timeout=2)
+        print(f"✓ 撮影スレッドで{captures - 4}回撮影し、停止後に再開できる")
+
+        # 4. 終了時にアップロードできなかった撮影画像をスプールに退避
+        print("\n4. 終了処理テスト...")
+        service.fail = True
+        engine.snapshot()
+        engine.get_upload_pipeline().wait_idle(10)
+        engine.shutdown()
+        assert len(engine.get_capture_spool()) >= 1, "失敗した撮影画像がスプールにない"
+        assert engine.metrics()['counters'].get('spooled', 0) >= 1
+        print(f"✓ スプール: {len(engine.get_capture_spool())}件")
+
+        # 5. ログはエンジンに指定したファイルに出力される
+        print("\n5. ログ出力テスト...")
+        engine.get_log_writer().flush()
+        with open(os.path.join(temp_dir, 'engine.log'), encoding='utf-8') as f:
+            log_text = f.read()
+        assert 'アップロード成功' in log_text and 'スプールに保存' in log_text, "ログが出力されていない"
+        engine.get_log_writer().close()
+        print("✓ ログファイルに出力")
+
+        # 6. キュー満杯で破棄されたジョブはスプールに退避し、重複判定の比較対象はアップロード後に記録
+        print("\n6. 破棄・重複判定テスト...")
+        drop_dir = os.path.join(temp_dir, 'drop')
+        os.makedirs(drop_dir)
+        service = FakeDriveService(fail=True)
+        engine = create_engine(drop_dir, service)
+        pipeline = UploadPipeline(engine.process_upload_job, max_queue=1, overflow_policy=OVERFLOW_DROP_OLDEST,
+                                  on_drop=engine.discard_upload_job)
+        pipeline.submit(UploadJob('20240101-tester_120000_delta.png', b'delta-1'))
+        pipeline.submit(UploadJob('20240101-tester_120100_delta.png', b'delta-2'))
+        assert [entry.file_name for entry in engine.get_capture_spool().pending()] == [
+            '20240101-tester_120000_delta.png'
+        ], "破棄されたジョブがスプールにない"
+
+        job = UploadJob('20240101-tester_120200.png', b'png', 'image/png', frame_hash=0x1234)
+        assert not engine.process_upload_job(job), "オフラインでアップロードが成功した"
+        assert not engine.is_duplicate_frame(0x1234, 'next.png'), "アップロードできなかった画面と比較された"
+        service.fail = False
+        assert engine.process_upload_job(job), "アップロードに失敗"
+        assert engine.is_duplicate_frame(0x1234, 'next.png'), "アップロードした画面が比較対象になっていない"
+        engine.get_log_writer().close()
+        print("✓ 破棄されたジョブはスプールに退避され、アップロード後に重複判定の比較対象になる")
+
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print("\n=== すべての撮影エンジンテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_capture_engine()
+    print("\n✅ 撮影エンジンテスト完了")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+撮影スケジューラーのテスト
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.capture_scheduler import CaptureScheduler
+
+
+class OffsetClock:
+    """実時刻にずれを加えられる時計（スリープからの復帰の再現用）"""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def __call__(self):
+        return time.time() + self.offset
+
+
+def run_in_thread(scheduler):
+    """スケジューラーを別スレッドで実行"""
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_capture_scheduler():
+    """予定時刻での実行・停止・ずれの補正・スリープからの復帰のテスト"""
+    print("=== 撮影スケジューラーテスト ===")
+
+    # 1. 1秒ごとに起きずに予定時刻まで待機する
+    print("\n1. 待機回数テスト...")
+    runs = []
+    scheduler = CaptureScheduler(lambda: runs.append(time.monotonic()), lambda: 0.2, max_wait=60)
+    thread = run_in_thread(scheduler)
+    time.sleep(0.5)
+    scheduler.stop()
+    thread.join(timeout=1)
+    assert not thread.is_alive(), "停止要求で終了しない"
+    assert len(runs) == 3, f"実行回数が不正: {len(runs)}"
+    assert scheduler.wakeups <= scheduler.runs + 1, f"予定時刻以外に起きている: {scheduler.wakeups}回"
+    print(f"✓ {len(runs)}回実行、待機からの起床は{scheduler.wakeups}回")
+
+    # 2. 停止要求で待機中でもすぐに終了
+    print("\n2. 停止テスト...")
+    stop_event = threading.Event()
+    scheduler = CaptureScheduler(lambda: None, lambda: 3600, stop_event=stop_event)
+    thread = run_in_thread(scheduler)
+    time.sleep(0.1)
+    started = time.monotonic()
+    stop_event.set()
+    thread.join(timeout=1)
+    assert not thread.is_alive() and time.monotonic() - started < 0.5, "待機中の停止が遅い"
+    print("✓ 1時間の待機中でもすぐに終了")
+
+    # 3. 処理時間で間隔がずれない
+    print("\n3. ずれの補正テスト...")
+    runs = []
+
+    def slow_job():
+        runs.append(time.monotonic())
+        time.sleep(0.1)
+
+    scheduler = CaptureScheduler(slow_job, lambda: 0.25)
+    thread = run_in_thread(scheduler)
+    time.sleep(0.9)
+    scheduler.stop()
+    thread.join(timeout=1)
+    gaps = [b - a for a, b in zip(runs, runs[1:])]
+    assert len(runs) == 4 and all(abs(gap - 0.25) < 0.05 for gap in gaps), f"間隔がずれている: {gaps}"
+    print(f"✓ 処理に0.1秒かかっても間隔は{[round(gap, 2) for gap in gaps]}")
+
+    # 4. スリープからの復帰では遅れた分をまとめて実行しない
+    print("\n4. スリープ復帰テスト...")
+    clock = OffsetClock()
+    runs = []
+    logs = []
+    scheduler = CaptureScheduler(lambda: runs.append(clock()), lambda: 300, max_wait=0.1,
+                                 resume_threshold=30, clock=clock, log=logs.append)
+    thread = run_in_thread(scheduler)
+    time.sleep(0.1)
+    clock.offset += 3 * 3600  # 3時間スリープした
+    time.sleep(0.3)
+    scheduler.stop()
+    thread.join(timeout=1)
+    assert len(runs) == 2, f"遅れた分がまとめて実行された: {len(runs)}回"
+    assert scheduler.resumes == 1 and "スリープからの復帰" in logs[0]
+    assert scheduler.next_run - runs[-1] >= 299, "復帰後の予定が現在時刻から組み直されていない"
+    print("✓ 復帰後に1回だけ撮影して予定を組み直す")
+
+    # 5. 実行エラーでも続行
+    print("\n5. 実行エラーテスト...")
+    calls = []
+
+    def failing_job():
+        calls.append(1)
+        raise RuntimeError("撮影エラー")
+
+    logs = []
+    scheduler = CaptureScheduler(failing_job, lambda: 0.05, log=logs.append)
+    thread = run_in_thread(scheduler)
+    time.sleep(0.18)
+    scheduler.stop()
+    thread.join(timeout=1)
+    assert len(calls) >= 3 and "撮影エラー" in logs[0], "エラー後に続行していない"
+    print("✓ 例外を記録して次の予定を続ける")
+
+    print("\n=== すべての撮影スケジューラーテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_capture_scheduler()
+    print("\n✅ 撮影スケジューラーテスト完了")
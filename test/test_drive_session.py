@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Google Drive APIセッション再利用のテスト
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.drive_session import DriveSession
+
+
+class FakeCredentials:
+    """トークン更新回数を記録するテスト用認証情報"""
+
+    def __init__(self, expires_in):
+        self.token = 'initial-token'
+        self.expiry = self._utcnow() + timedelta(seconds=expires_in)
+        self.refresh_count = 0
+
+    @staticmethod
+    def _utcnow():
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def refresh(self, request):
+        self.refresh_count += 1
+        self.token = f'token-{self.refresh_count}'
+        self.expiry = self._utcnow() + timedelta(hours=1)
+
+    def before_request(self, request, method, url, headers):
+        headers['authorization'] = f'Bearer {self.token}'
+
+
+def test_drive_session_reuse():
+    """セッション再利用とトークン更新タイミングのテスト"""
+    print("=== Drive APIセッションテスト ===")
+
+    # 1. 同一スレッドではサービスを一度だけ構築する
+    print("\n1. サービス再利用テスト...")
+    credentials = FakeCredentials(expires_in=3600)
+    session = DriveSession(credentials, refresh_margin=300)
+
+    service1 = session.get_service()
+    service2 = session.get_service()
+    assert service1 is service2, "同一スレッドでサービスが再構築された"
+    assert credentials.refresh_count == 0, "有効期限内なのにトークンが更新された"
+    print("✓ サービスは再利用され、不要なトークン更新は発生しない")
+
+    # 2. 有効期限が近い場合のみ更新する
+    print("\n2. 有効期限直前のトークン更新テスト...")
+    credentials.expiry = FakeCredentials._utcnow() + timedelta(seconds=60)
+    session.get_service()
+    assert credentials.refresh_count == 1, "有効期限直前なのにトークンが更新されない"
+    session.get_service()
+    assert credentials.refresh_count == 1, "更新直後に再度トークンが更新された"
+    print("✓ 有効期限直前にのみトークンが更新される")
+
+    # 3. invalidate後は強制的に更新する
+    print("\n3. 強制更新テスト...")
+    session.invalidate()
+    session.get_service()
+    assert credentials.refresh_count == 2, "invalidate後にトークンが更新されない"
+    print("✓ invalidate後にトークンが更新される")
+
+    # 4. 別スレッドでは個別のサービスを使用する
+    print("\n4. スレッド別サービステスト...")
+    services = []
+    thread = threading.Thread(target=lambda: services.append(session.get_service()))
+    thread.start()
+    thread.join()
+    assert services[0] is not service1, "スレッド間でサービスが共有された"
+    print("✓ スレッドごとに個別のサービスが構築される")
+
+    session.close()
+    print("\n=== すべてのDrive APIセッションテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_drive_session_reuse()
+    print("\n✅ Drive APIセッションテスト完了")
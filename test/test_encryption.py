@@ -7,8 +7,10 @@
 import os
 import sys
 import json
+import stat
 import tempfile
 import shutil
+import time
 from pathlib import Path
 
 # 親ディレクトリをパスに追加
@@ -152,7 +154,151 @@ def test_key_derivation():
     print("\n=== 鍵導出テスト成功 ===")
 
 
+def test_key_cache():
+    """導出済みキーのキャッシュのテスト"""
+    print("\n=== 鍵キャッシュテスト ===")
+    
+    CredentialManager.clear()
+    password = "TestPassword"
+    salt = b"1234567890123456"
+    
+    # 1回目は導出、2回目はキャッシュから取得
+    start = time.perf_counter()
+    key1 = CredentialManager()._derive_key(password, salt)
+    derive_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    key2 = CredentialManager()._derive_key(password, salt)
+    cached_time = time.perf_counter() - start
+    
+    assert key1 == key2, "キャッシュから異なる鍵が返された"
+    assert cached_time < derive_time / 10, f"キャッシュが効いていない: {derive_time:.3f}s -> {cached_time:.3f}s"
+    print(f"✓ 2回目以降はキャッシュを使用 ({derive_time * 1000:.1f}ms -> {cached_time * 1000:.3f}ms)")
+    
+    # パスワード・ソルトが異なれば別のキー
+    assert CredentialManager()._derive_key("OtherPassword", salt) != key1, "異なるパスワードで同じ鍵が返された"
+    assert CredentialManager()._derive_key(password, b"6543210987654321") != key1, "異なるソルトで同じ鍵が返された"
+    print("✓ パスワード・ソルトごとに別のキーをキャッシュ")
+    
+    # clear()でキャッシュを破棄しても同じキーが再導出される
+    CredentialManager.clear()
+    assert not CredentialManager._key_cache, "キャッシュが破棄されていない"
+    assert CredentialManager()._derive_key(password, salt) == key1, "再導出した鍵が一致しない"
+    print("✓ clear()でキャッシュを破棄")
+    
+    print("\n=== 鍵キャッシュテスト成功 ===")
+
+
+def test_machine_id():
+    """マシンIDの取得元の順序・キャッシュ・旧形式との互換性のテスト"""
+    print("\n=== マシンIDテスト ===")
+    
+    import credential_manager
+    from cryptography.fernet import Fernet
+    
+    original_providers = list(credential_manager.MACHINE_ID_PROVIDERS)
+    test_dir = tempfile.mkdtemp()
+    calls = []
+    
+    def unavailable():
+        calls.append('unavailable')
+        return None
+    
+    def broken():
+        calls.append('broken')
+        raise OSError("取得失敗")
+    
+    def registry():
+        calls.append('registry')
+        return "TEST-MACHINE-GUID"
+    
+    def command():
+        calls.append('command')
+        return "TEST-HARDWARE-UUID"
+    
+    try:
+        credential_manager.MACHINE_ID_PROVIDERS[:] = [unavailable, broken, registry, command]
+        CredentialManager._machine_id = None
+        cm = CredentialManager()
+        
+        # 1. 最初に取得できた取得元を使用し、以降はキャッシュ
+        print("\n1. 取得元の順序・キャッシュテスト...")
+        machine_id = cm._get_machine_id()
+        assert cm._get_machine_id() == machine_id, "マシンIDが一定ではない"
+        assert CredentialManager()._get_machine_id() == machine_id, "インスタンス間でキャッシュが共有されていない"
+        assert calls == ['unavailable', 'broken', 'registry'], f"取得元の呼び出しが不正: {calls}"
+        print("✓ 取得元は1回だけ順に試され、失敗した取得元は読み飛ばされる")
+        
+        # 2. 旧形式のマシンIDで暗号化されたファイルも復号化できる
+        print("\n2. 旧形式との互換性テスト...")
+        test_credentials = {"type": "service_account", "project_id": "legacy"}
+        encrypted_file = os.path.join(test_dir, "legacy.enc")
+        salt = os.urandom(16)
+        legacy_key = cm._derive_key(cm._get_legacy_machine_id(), salt)
+        with open(encrypted_file, 'wb') as f:
+            f.write(salt + Fernet(legacy_key).encrypt(json.dumps(test_credentials).encode()))
+        
+        recovered = CredentialManager(encrypted_file_path=encrypted_file).decrypt_credentials()
+        assert recovered == test_credentials, "旧形式のファイルが復号化できない"
+        print("✓ 旧形式のマシンIDで暗号化されたファイルを復号化できる")
+        
+        # 復号化してもファイルは書き換えず、旧形式のIDで復号化できたことをプロセス内で記録
+        with open(encrypted_file, 'rb') as f:
+            assert f.read()[:16] == salt, "復号化でファイルが書き換えられた"
+        assert str(Path(encrypted_file).resolve()) in CredentialManager._legacy_bound_files, \
+            "旧形式のIDで復号化できたことが記録されていない"
+        recovered = CredentialManager(encrypted_file_path=encrypted_file).decrypt_credentials()
+        assert recovered == test_credentials, "2回目の復号化に失敗"
+        print("✓ 復号化ではファイルを書き換えず、旧形式のIDで復号化できたことをプロセス内で記録")
+        
+        # 暗号化し直すのはmigrateコマンドを実行した場合のみ（権限は引き継ぐ）
+        if os.name == 'posix':
+            os.chmod(encrypted_file, 0o640)
+        previous_dir = os.getcwd()
+        previous_argv = sys.argv
+        os.chdir(test_dir)
+        try:
+            shutil.copy(encrypted_file, 'credentials.enc')
+            if os.name == 'posix':
+                os.chmod('credentials.enc', 0o640)
+            sys.argv = ['credential_manager.py', 'migrate']
+            credential_manager.main()
+            with open('credentials.enc', 'rb') as f:
+                migrated = f.read()
+            if os.name == 'posix':
+                assert stat.S_IMODE(os.stat('credentials.enc').st_mode) == 0o640, "権限が引き継がれていない"
+            assert not os.path.exists('credentials.enc.tmp'), "一時ファイルが残っている"
+        finally:
+            sys.argv = previous_argv
+            os.chdir(previous_dir)
+        migrated_key = cm._derive_key(machine_id, migrated[:16])
+        assert json.loads(Fernet(migrated_key).decrypt(migrated[16:])) == test_credentials, \
+            "現在のマシンIDで暗号化し直されていない"
+        migrated_manager = CredentialManager(encrypted_file_path=os.path.join(test_dir, 'credentials.enc'))
+        assert migrated_manager.reencrypt_legacy_file() is False, "暗号化し直したファイルが再び書き換えられた"
+        print("✓ migrateコマンドで現在のマシンIDで暗号化し直され、権限は引き継がれる")
+        
+        # 3. 現在のマシンIDで暗号化されたファイル
+        print("\n3. 現在の形式テスト...")
+        key = cm._derive_key(machine_id, salt)
+        with open(encrypted_file, 'wb') as f:
+            f.write(salt + Fernet(key).encrypt(json.dumps(test_credentials).encode()))
+        recovered = CredentialManager(encrypted_file_path=encrypted_file).decrypt_credentials()
+        assert recovered == test_credentials, "現在の形式のファイルが復号化できない"
+        print("✓ 現在のマシンIDで暗号化されたファイルを復号化できる")
+        
+        print("\n=== マシンIDテスト成功 ===")
+        
+    finally:
+        credential_manager.MACHINE_ID_PROVIDERS[:] = original_providers
+        CredentialManager._machine_id = None
+        CredentialManager._legacy_bound_files.clear()
+        shutil.rmtree(test_dir)
+
+
 if __name__ == "__main__":
     test_encryption()
     test_key_derivation()
+    test_key_cache()
+    test_machine_id()
     print("\n✅ 暗号化テスト完了")
\ No newline at end of file
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重複フレーム判定（dHash）のテスト
+"""
+
+import os
+import sys
+from PIL import Image, ImageDraw
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.frame_dedup import FrameDeduplicator, dhash_bgra, dhash_image, hamming_distance
+
+
+def create_desktop_image(width=1280, height=720, window_x=100):
+    """ウィンドウが1枚あるデスクトップ風の画像を生成"""
+    img = Image.new('RGB', (width, height), color=(30, 90, 160))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([(window_x, 80), (window_x + 600, 560)], fill='white', outline='gray')
+    for i in range(12):
+        draw.line([(window_x + 20, 120 + i * 30), (window_x + 500, 120 + i * 30)], fill='black', width=3)
+    draw.rectangle([(0, height - 40), (width, height)], fill=(20, 20, 20))
+    return img
+
+
+def to_bgra(img):
+    """PIL ImageをmssのBGRAバッファ形式に変換"""
+    return bytearray(img.convert('RGBA').tobytes('raw', 'BGRA'))
+
+
+def test_frame_dedup():
+    """dHashによる重複判定のテスト"""
+    print("=== 重複フレーム判定テスト ===")
+
+    base = create_desktop_image()
+    width, height = base.size
+
+    # 1. 同じ画面は同じハッシュになる
+    print("\n1. 同一画面のハッシュテスト...")
+    hash1 = dhash_bgra(to_bgra(base), width, height)
+    hash2 = dhash_bgra(to_bgra(base.copy()), width, height)
+    assert hash1 == hash2, "同じ画面でハッシュが異なる"
+    assert 0 <= hash1 < 2 ** 64, "ハッシュが64ビットではない"
+    print(f"✓ 同一画面のハッシュが一致: {hash1:016x}")
+
+    # 2. マウスカーソル程度の変化は距離が小さい
+    print("\n2. 小さな変化のテスト...")
+    cursor = base.copy()
+    ImageDraw.Draw(cursor).rectangle([(900, 300), (912, 318)], fill='black')
+    small_distance = hamming_distance(hash1, dhash_bgra(to_bgra(cursor), width, height))
+    assert small_distance <= 4, f"小さな変化で距離が大きすぎる: {small_distance}"
+    print(f"✓ 小さな変化の距離: {small_distance}")
+
+    # 3. ウィンドウの移動は大きな変化として検出される
+    print("\n3. 大きな変化のテスト...")
+    moved = create_desktop_image(window_x=600)
+    large_distance = hamming_distance(hash1, dhash_bgra(to_bgra(moved), width, height))
+    assert large_distance > 4, f"大きな変化が検出されない: {large_distance}"
+    print(f"✓ ウィンドウ移動の距離: {large_distance}")
+
+    # 4. PIL Image版のハッシュも同様に判定できる
+    print("\n4. PIL Image版ハッシュテスト...")
+    assert dhash_image(base) == dhash_image(base.copy()), "同じ画像でハッシュが異なる"
+    assert hamming_distance(dhash_image(base), dhash_image(moved)) > 4, "大きな変化が検出されない"
+    print("✓ PIL Image版でも同一画面・大きな変化を判定できる")
+
+    # 5. 重複判定と定期アップロード
+    print("\n5. 重複判定テスト...")
+    dedup = FrameDeduplicator(threshold=4, max_skip_seconds=3600)
+    assert dedup.check(hash1) == (False, None), "初回フレームが重複と判定された"
+    dedup.mark_uploaded(hash1)
+    assert dedup.check(hash2)[0], "同一画面が重複と判定されない"
+    assert not dedup.check(dhash_bgra(to_bgra(moved), width, height))[0], "変化した画面が重複と判定された"
+    dedup.last_uploaded_at -= 3600
+    assert not dedup.check(hash2)[0], "最大スキップ時間を過ぎても省略された"
+    print("✓ 変化のない画面のみ省略され、一定時間ごとにアップロードされる")
+
+    print("\n=== すべての重複フレーム判定テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_frame_dedup()
+    print("\n✅ 重複フレーム判定テスト完了")
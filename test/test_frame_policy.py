@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+縮小・撮影範囲の指定のテスト
+"""
+
+import os
+import sys
+from PIL import Image
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.frame_policy import FramePolicy, black_border_box, resize_target
+from screenshot_engine.image_encoder import PngEncoder
+from benchmark_encoders import create_multi_monitor_desktop, create_office_desktop
+
+
+def test_frame_policy():
+    """縮小・前面のウィンドウ・タスクバー・黒い余白のテスト"""
+    print("=== 縮小・撮影範囲テスト ===")
+
+    # 1. 縮小後の大きさ
+    print("\n1. 縮小サイズテスト...")
+    assert resize_target(3840, 2160, max_long_edge=1920, scale=1.0) == (1920, 1080)
+    assert resize_target(3840, 2160, max_long_edge=0, scale=0.25) == (960, 540)
+    assert resize_target(3840, 2160, max_long_edge=1920, scale=0.25) == (960, 540), "小さい方が優先されていない"
+    assert resize_target(1280, 720, max_long_edge=1920, scale=1.0) is None, "小さい画像が拡大される"
+    print("✓ 長辺の上限と縮小率の小さい方で縮小")
+
+    # 2. 縮小でエンコード後のサイズが減る
+    print("\n2. 縮小によるサイズ削減テスト...")
+    img = create_office_desktop(1920, 1080)
+    encoder = PngEncoder()
+    for resample in ('fast', 'quality'):
+        resized = FramePolicy(max_long_edge=960, resample=resample, roi_policies=[]).apply(img)
+        assert resized.size == (960, 540), f"{resample}: 縮小後の大きさが不正 {resized.size}"
+        print(f"✓ {resample}: {len(encoder.encode_bytes(img)) / 1024:.1f}KB -> "
+              f"{len(encoder.encode_bytes(resized)) / 1024:.1f}KB")
+    assert not FramePolicy(roi_policies=[]).enabled, "既定の設定で有効になっている"
+
+    # 3. 黒い余白の切り取り（モニター間の余白）
+    print("\n3. 黒い余白テスト...")
+    virtual = create_multi_monitor_desktop()
+    box = black_border_box(virtual.crop((0, 0, 1920, 1440)))
+    assert box[1] <= 360 and box[1] >= 340 and box[3] == 1440, f"余白の判定が不正: {box}"
+    cropped = FramePolicy(roi_policies=['crop_black_borders']).apply(Image.new('RGB', (400, 300)))
+    assert cropped.size == (400, 300), "全体が黒い画像を切り取ってしまった"
+    print(f"✓ 余白を除いた範囲: {box}")
+
+    # 4. 前面のウィンドウのみ（仮想画面の座標から画像上の座標に変換）
+    print("\n4. 前面のウィンドウテスト...")
+    window = (-1000, 100, -200, 700)
+    policy = FramePolicy(roi_policies=['active_window'], active_window_func=lambda: window)
+    assert policy.apply(Image.new('RGB', (1920, 1080)), origin=(-1920, 0)).size == (800, 600)
+    assert policy.apply(Image.new('RGB', (1920, 1080)), origin=(0, 0)) is None, "ウィンドウのないモニターが対象になった"
+    policy = FramePolicy(roi_policies=['active_window'], active_window_func=lambda: None)
+    assert policy.apply(Image.new('RGB', (640, 480))).size == (640, 480), "取得できない場合は全体を使用するはず"
+    print("✓ ウィンドウの範囲のみ切り取り、ないモニターは省略")
+
+    # 5. タスクバーの塗りつぶしと余白の切り取りの組み合わせ
+    print("\n5. タスクバーテスト...")
+    screen = Image.new('RGB', (1920, 1080), (0, 99, 177))
+    screen.paste((200, 200, 200), (0, 1040, 1920, 1080))
+    areas = [((0, 0, 1920, 1080), (0, 0, 1920, 1040))]
+    policy = FramePolicy(roi_policies=['exclude_taskbar', 'crop_black_borders'], work_areas_func=lambda: areas)
+    result = policy.apply(screen)
+    assert (200, 200, 200) not in [color for _, color in result.getcolors()], "タスクバーが残っている"
+    assert 1040 <= result.height <= 1044, f"塗りつぶした範囲が切り取られていない: {result.size}"
+    print(f"✓ タスクバーを除外: {result.size}")
+
+    # 6. 不明な設定はエラー
+    print("\n6. 設定の検証テスト...")
+    for options in ({'resample': 'cubic'}, {'roi_policies': ['desktop_only']}, {'scale': 0}):
+        try:
+            FramePolicy(**options)
+            assert False, f"不正な設定でエラーにならない: {options}"
+        except ValueError:
+            pass
+    print("✓ 不正な設定はValueError")
+
+    print("\n=== すべての縮小・撮影範囲テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_frame_policy()
+    print("\n✅ 縮小・撮影範囲テスト完了")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+サービスアカウント分散のテスト
+"""
+
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.identity_pool import (
+    IdentityPool, ConsistentHashRing, is_rate_limited, SHARD_HOST, SHARD_FILE,
+)
+from screenshot_engine.capture_engine import CaptureEngine
+from screenshot_engine.spool import CaptureSpool
+from credential_manager import CredentialManager
+
+
+class FakeCredentials:
+    def __init__(self, email):
+        self.service_account_email = email
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRequest:
+    def __init__(self, service, body):
+        self.service = service
+        self.body = body
+
+    def execute(self):
+        if self.service.throttled:
+            resp = httplib2.Response({'status': 429, 'retry-after': '5'})
+            raise HttpError(resp, b'{"error": {"code": 429, "message": "Rate Limit Exceeded"}}')
+        self.service.uploaded.append(self.body['name'])
+        return {'id': 'file-id'}
+
+
+class FakeService:
+    """サービスアカウントごとのDrive APIサービス（throttled=Trueでレート制限を返す）"""
+
+    def __init__(self, email):
+        self.email = email
+        self.throttled = False
+        self.uploaded = []
+
+    def files(self):
+        return self
+
+    def create(self, body, media_body, fields, supportsAllDrives):
+        return FakeRequest(self, body)
+
+
+class FakeSession:
+    """DriveSessionの代わり（サービスアカウントごとに1つのサービス）"""
+
+    services = {}
+
+    def __init__(self, credentials):
+        self.email = credentials.service_account_email
+        FakeSession.services.setdefault(self.email, FakeService(self.email))
+        self.invalidated = False
+
+    def get_service(self):
+        return FakeSession.services[self.email]
+
+    def invalidate(self):
+        self.invalidated = True
+
+    def close(self):
+        pass
+
+
+def create_pool(count, clock=None, **options):
+    credentials = [FakeCredentials(f"uploader{i + 1}@example.iam.gserviceaccount.com") for i in range(count)]
+    return IdentityPool(credentials, session_factory=FakeSession, clock=clock or FakeClock(), **options)
+
+
+def test_identity_pool():
+    """振り分け・レート制限時の切り替え・エンジンでの再試行のテスト"""
+    print("=== サービスアカウント分散テスト ===")
+
+    # 1. コンシステントハッシュで均等に分散し、増やしても割り当て先の変化は一部のみ
+    print("\n1. コンシステントハッシュテスト...")
+    names = ['a', 'b', 'c']
+    hosts = [f"PC-{i:04d}" for i in range(1200)]
+    ring = ConsistentHashRing(names)
+    before = [ring.order(host)[0] for host in hosts]
+    shares = [before.count(index) / len(hosts) for index in range(len(names))]
+    assert all(0.2 < share < 0.47 for share in shares), f"分散が偏っている: {shares}"
+    assert sorted(ring.order('PC-0001')) == [0, 1, 2], "切り替え先の順にすべてのサービスアカウントが含まれない"
+    after = [ConsistentHashRing(names + ['d']).order(host)[0] for host in hosts]
+    moved = [(old, new) for old, new in zip(before, after) if old != new]
+    assert all(new == 3 for _, new in moved), "追加していないサービスアカウント間で割り当てが変わった"
+    assert len(moved) / len(hosts) < 0.4, f"割り当ての変化が多すぎる: {len(moved) / len(hosts):.0%}"
+    print(f"✓ 分散: {', '.join(f'{share:.0%}' for share in shares)} / 追加時の移動: {len(moved) / len(hosts):.0%}")
+
+    # 2. hostは同じPCの撮影画像を同じサービスアカウントに、fileは撮影画像ごとに振り分ける
+    print("\n2. 振り分け方テスト...")
+    files = [f"20240101-user_{i:06d}.png" for i in range(60)]
+    pool = create_pool(3, shard_mode=SHARD_HOST, shard_key='PC-0001')
+    assert len({pool.select(name).name for name in files}) == 1, "同じPCで割り当て先が変わった"
+    pool = create_pool(3, shard_mode=SHARD_FILE, shard_key='PC-0001')
+    assert len({pool.select(name).name for name in files}) == 3, "撮影画像ごとに振り分けられていない"
+    try:
+        create_pool(2, shard_mode='random')
+        assert False, "不明な振り分け方でエラーにならない"
+    except ValueError:
+        pass
+    print("✓ host: 1件に固定 / file: 3件に分散")
+
+    # 3. レート制限を受けたサービスアカウントは一定時間使わない（連続で制限されると延長）
+    print("\n3. レート制限テスト...")
+    clock = FakeClock()
+    pool = create_pool(2, clock=clock, cooldown=60, max_cooldown=100)
+    primary = pool.select()
+    service = pool.get_service()
+    assert pool.record_failure(service, 429, retry_after='5'), "429がレート制限と判定されない"
+    assert pool.select().name != primary.name, "制限中のサービスアカウントが選ばれた"
+    clock.now += 61
+    assert pool.select().name == primary.name, "制限の解除後に元のサービスアカウントに戻らない"
+    pool.record_failure(service, 429)
+    assert primary.throttled_until - clock.now == 100, f"連続制限の待機時間が不正: {primary.throttled_until - clock.now}"
+    assert not pool.record_failure(service, 500), "500がレート制限と判定された"
+    pool.record_success(service)
+    assert primary.consecutive_throttles == 0 and primary.uploads == 1
+    stats = {item['name']: item for item in pool.stats()}
+    assert stats[primary.name]['requests_per_minute'] > 0 and stats[primary.name]['throttles'] == 2
+    rate_limit = json.dumps({'error': {'errors': [{'reason': 'userRateLimitExceeded'}]}}).encode()
+    forbidden = json.dumps({'error': {'errors': [{'reason': 'insufficientFilePermissions'}]}}).encode()
+    assert is_rate_limited(403, rate_limit) and not is_rate_limited(403, forbidden)
+    print(f"✓ 制限中は {pool.select().name} に切り替え、解除後に戻る")
+
+    # 4. エンジンはレート制限を受けると次のサービスアカウントで再試行する
+    print("\n4. エンジンの切り替えテスト...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        credentials = [FakeCredentials(f"uploader{i + 1}@example.iam.gserviceaccount.com") for i in range(3)]
+        FakeSession.services = {item.service_account_email: FakeService(item.service_account_email)
+                                for item in credentials}
+        engine = CaptureEngine('folder-id', lambda: None, log_file=os.path.join(temp_dir, 'engine.log'))
+        engine._capture_spool = CaptureSpool(directory=os.path.join(temp_dir, 'spool'))
+        engine._identity_pool = IdentityPool(credentials, session_factory=FakeSession, log=engine.log)
+
+        first = engine._identity_pool.select('20240101-user_100000.png')
+        FakeSession.services[first.name].throttled = True
+        result = engine.upload_with_failover(
+            '20240101-user_100000.png',
+            lambda service: engine.upload_bytes(b'png', '20240101-user_100000.png', service, 'image/png')
+        )
+        assert result is True, "別のサービスアカウントで再試行されていない"
+        uploaded_by = [email for email, service in FakeSession.services.items() if service.uploaded]
+        assert len(uploaded_by) == 1 and uploaded_by[0] != first.name, f"アップロード先が不正: {uploaded_by}"
+        assert engine.get_pipeline_status()['identities'][0]['name'], "利用状況が集計されていない"
+
+        # すべて制限中の場合は失敗してスプールに回す
+        for service in FakeSession.services.values():
+            service.throttled = True
+        for identity in engine._identity_pool.identities:
+            identity.throttled_until = 0
+        result = engine.upload_with_failover(
+            '20240101-user_100500.png',
+            lambda service: engine.upload_bytes(b'png', '20240101-user_100500.png', service, 'image/png')
+        )
+        assert result is False, "すべて制限中なのに成功した"
+        engine.get_log_writer().close()
+        print(f"✓ {first.name} の制限時に {uploaded_by[0]} でアップロード")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # 5. 複数のサービスアカウントを登録した認証情報の分割
+    print("\n5. 認証情報の分割テスト...")
+    single = {'type': 'service_account', 'client_email': 'a@example.com'}
+    assert CredentialManager.split_service_accounts(single) == [single]
+    multiple = {'service_accounts': [single, dict(single, client_email='b@example.com')]}
+    assert len(CredentialManager.split_service_accounts(multiple)) == 2
+    print("✓ 1件・複数件のどちらの形式も読み込める")
+
+    print("\n=== すべてのサービスアカウント分散テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_identity_pool()
+    print("\n✅ サービスアカウント分散テスト完了")
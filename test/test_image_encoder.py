@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画像エンコーダーのテスト
+"""
+
+import io
+import os
+import sys
+from PIL import Image, ImageChops
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.image_encoder import ENCODERS, PngEncoder, create_encoder, mimetype_for
+from benchmark_encoders import create_office_desktop
+
+
+def test_image_encoders():
+    """各保存形式のエンコード・拡張子・MIMEタイプのテスト"""
+    print("=== 画像エンコーダーテスト ===")
+
+    img = create_office_desktop(640, 360)
+
+    # 1. 各形式でエンコードでき、可逆形式は元の画像と一致する
+    print("\n1. エンコードテスト...")
+    for name, encoder_class in ENCODERS.items():
+        if not encoder_class.available():
+            print(f"  {name}: この環境では使用不可（スキップ）")
+            continue
+        encoder = encoder_class()
+        buffer = io.BytesIO()
+        encoder.encode(img, buffer)
+        buffer.seek(0)
+        with Image.open(buffer) as decoded:
+            assert decoded.format == encoder.format, f"{name}: 保存形式が不正 {decoded.format}"
+            if name in ('png', 'webp_lossless'):
+                diff = ImageChops.difference(decoded.convert('RGB'), img).getbbox()
+                assert diff is None, f"{name}: 可逆形式なのに画像が一致しない"
+        print(f"✓ {name}: {buffer.getbuffer().nbytes / 1024:.1f}KB")
+
+    # 2. ファイル名とMIMEタイプ
+    print("\n2. ファイル名・MIMEタイプテスト...")
+    assert create_encoder('jpeg').file_name("20240101-user_100000") == "20240101-user_100000.jpg"
+    assert mimetype_for("20240101-user_100000.png") == 'image/png'
+    assert mimetype_for("20240101-user_100000.jpg") == 'image/jpeg'
+    assert mimetype_for("20240101-user_100000.webp") == 'image/webp'
+    assert mimetype_for("20240101-user_100000_delta.png") == 'image/png'
+    print("✓ 拡張子とMIMEタイプが対応している")
+
+    # 3. PNGの圧縮レベル設定が反映される
+    print("\n3. PNG圧縮レベルテスト...")
+    fast, small = io.BytesIO(), io.BytesIO()
+    PngEncoder(compress_level=0).encode(img, fast)
+    PngEncoder(compress_level=9).encode(img, small)
+    assert fast.tell() > small.tell(), "圧縮レベルが反映されていない"
+    print(f"✓ level=0: {fast.tell() / 1024:.1f}KB, level=9: {small.tell() / 1024:.1f}KB")
+
+    # 4. メモリ上のエンコード結果がファイル保存と一致する
+    print("\n4. メモリ上のエンコードテスト...")
+    encoder = PngEncoder()
+    buffer = io.BytesIO()
+    encoder.encode(img, buffer)
+    data = encoder.encode_bytes(img)
+    assert isinstance(data, bytes) and data == buffer.getvalue(), "メモリ上のエンコード結果が一致しない"
+    print(f"✓ 一時ファイルなしでエンコードできる ({len(data) / 1024:.1f}KB)")
+
+    # 5. 不明な形式はエラー
+    print("\n5. 不明な形式テスト...")
+    try:
+        create_encoder('bmp')
+        assert False, "不明な形式でエラーにならない"
+    except ValueError:
+        print("✓ 不明な形式はValueError")
+
+    print("\n=== すべての画像エンコーダーテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_image_encoders()
+    print("\n✅ 画像エンコーダーテスト完了")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+バッファリングするログ出力のテスト
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import tempfile
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine import log_writer
+from screenshot_engine.log_writer import LogWriter, LOG_FIELDS, cleanup_rotated_logs
+
+
+def read_lines(path):
+    """ログファイルの行を取得"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def test_log_writer():
+    """バッファリング・バックグラウンド書き込み・ローテーションのテスト"""
+    print("=== ログ出力テスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        log_file = os.path.join(test_dir, "test.log")
+
+        # 1. 書き込みはバッファされ、flushでファイルに反映される
+        print("\n1. バッファリングテスト...")
+        writer = LogWriter(log_file, max_size=1024 * 1024, max_files=3, flush_interval=60)
+        writer.write("撮影開始")
+        writer.write("アップロード成功")
+        assert not os.path.exists(log_file) or os.path.getsize(log_file) == 0, "バッファされずに書き込まれた"
+        writer.flush()
+        lines = read_lines(log_file)
+        assert len(lines) == 2 and lines[0].endswith("] 撮影開始"), f"ログの内容が不正: {lines}"
+        assert lines[0].startswith("[") and lines[0][20] == "]", f"タイムスタンプの形式が不正: {lines[0]}"
+        print("✓ flushでまとめて書き込まれる")
+
+        # 2. バックグラウンドスレッドが一定間隔で書き込む
+        print("\n2. バックグラウンド書き込みテスト...")
+        writer.close()
+        writer = LogWriter(log_file, max_size=1024 * 1024, max_files=3, flush_interval=0.1)
+        # 書き込みスレッドの待機を記録（Noneはタイムアウトなし）
+        waits = []
+        original_wait = writer._cond.wait
+
+        def recording_wait(timeout=None):
+            waits.append(timeout)
+            return original_wait(timeout)
+
+        writer._cond.wait = recording_wait
+        writer.write("バックグラウンド")
+        deadline = time.monotonic() + 5
+        while len(read_lines(log_file)) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert read_lines(log_file)[-1].endswith("バックグラウンド"), "バックグラウンドで書き込まれない"
+        print("✓ 一定間隔で自動的に書き込まれる")
+
+        # バッファが空の間は一定間隔で起きない
+        time.sleep(0.5)
+        timed_waits = [timeout for timeout in waits if timeout is not None]
+        assert len(timed_waits) == 1 and waits[-1] is None, f"バッファが空でも定期的に起きている: {waits}"
+        print("✓ バッファが空の間は書き込みスレッドが起きない")
+
+        # 3. close時に残りのバッファが書き込まれる
+        print("\n3. 終了時の書き込みテスト...")
+        writer.flush_interval = 60
+        writer.write("終了直前")
+        assert writer in log_writer._open_writers, "終了時に書き込む対象に登録されていない"
+        writer.close()
+        assert read_lines(log_file)[-1].endswith("終了直前"), "終了時にバッファが書き込まれない"
+        assert writer not in log_writer._open_writers, "close後も終了時に書き込む対象に残っている"
+        print("✓ close時に残りが書き込まれ、終了時の書き込み対象から外れる")
+
+        # 4. メモリ上のサイズでローテーションし、世代数を超えたら削除
+        print("\n4. ローテーションテスト...")
+        writer = LogWriter(log_file, max_size=2000, max_files=3, flush_interval=60)
+        for i in range(200):
+            writer.write(f"ローテーション確認 {i:04d}")
+            if i % 10 == 9:
+                writer.flush()
+        writer.close()
+        assert os.path.exists(f"{log_file}.1") and os.path.exists(f"{log_file}.3"), "ローテーションされていない"
+        assert not os.path.exists(f"{log_file}.4"), "保持する世代数を超えている"
+        assert read_lines(log_file)[0].endswith("ログファイルをローテーションしました"), "ローテーション後の記録がない"
+        assert os.path.getsize(log_file) < 2000 + 1000, "ローテーション後もサイズが大きい"
+        print("✓ サイズ上限でローテーションされる")
+
+        # 5. 古い世代のクリーンアップ
+        print("\n5. クリーンアップテスト...")
+        for i in range(4, 7):
+            with open(f"{log_file}.{i}", 'w') as f:
+                f.write("old\n")
+        removed = cleanup_rotated_logs(log_file, 3)
+        assert sorted(removed) == ["test.log.4", "test.log.5", "test.log.6"], f"削除対象が不正: {removed}"
+        assert os.path.exists(f"{log_file}.3"), "保持対象が削除された"
+        print("✓ 世代数を超えたログが削除される")
+
+        print("\n=== すべてのログ出力テスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+def test_log_writer_json():
+    """JSON Lines形式・日次ローテーション・圧縮のテスト"""
+    print("\n=== JSON形式ログテスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        log_file = os.path.join(test_dir, "test.log")
+
+        # 1. 固定フィールドを持つJSON Lines形式
+        print("\n1. JSON形式テスト...")
+        writer = LogWriter(log_file, max_size=1024 * 1024, max_files=3, flush_interval=60,
+                           log_format='json', rotation='daily', compress=True)
+        writer.write("撮影開始")
+        writer.write("エンコード完了", event='capture', file_name="20240101-user_100000.png",
+                     bytes=123456, capture_ms=12.5, encode_ms=80.1)
+        writer.write("アップロード失敗", event='upload_error', file_name="20240101-user_100000.png",
+                     upload_ms=300.0, http_status=503)
+        writer.flush()
+        records = [json.loads(line) for line in read_lines(log_file)]
+        assert len(records) == 3, f"行数が不正: {len(records)}"
+        for record in records:
+            for name in ('ts', 'event', 'message') + LOG_FIELDS:
+                assert name in record, f"固定フィールドがない: {name}"
+        assert records[0]['event'] == 'message' and records[0]['bytes'] is None, "イベントなしの行が不正"
+        assert records[1]['event'] == 'capture' and records[1]['bytes'] == 123456, "撮影イベントが不正"
+        assert records[2]['http_status'] == 503, "HTTPステータスが記録されていない"
+        assert records[0]['ts'].endswith('+09:00'), f"タイムスタンプの形式が不正: {records[0]['ts']}"
+        print("✓ すべての行が固定フィールドを持つ")
+
+        # 2. 日付が変わったら最初の書き込みの前にローテーション
+        print("\n2. 日次ローテーションテスト...")
+        writer._file_day = writer._file_day.replace(year=writer._file_day.year - 1)
+        writer.write("翌日のログ")
+        writer.close()
+        new_records = [json.loads(line) for line in read_lines(log_file)]
+        assert new_records[0]['event'] == 'log_rotated', "日付変更でローテーションされていない"
+        assert new_records[-1]['message'] == "翌日のログ", "ローテーション後の書き込みが不正"
+        print("✓ 日付が変わるとローテーションされる")
+
+        # 3. ローテーションした世代はgzip圧縮される
+        print("\n3. 圧縮テスト...")
+        assert os.path.exists(f"{log_file}.1.gz") and not os.path.exists(f"{log_file}.1"), \
+            "ローテーションした世代が圧縮されていない"
+        with gzip.open(f"{log_file}.1.gz", 'rt', encoding='utf-8') as f:
+            assert len(f.read().splitlines()) == 3, "圧縮したログの内容が不正"
+        print("✓ ローテーションした世代がgzip圧縮される")
+
+        print("\n=== すべてのJSON形式ログテスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+    test_log_writer()
+    test_log_writer_json()
+    print("\n✅ ログ出力テスト完了")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理時間の計測とカウンターのテスト
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.metrics import (
+    MetricsRegistry,
+    MetricsDumper,
+    format_metrics,
+    percentile,
+    STAGE_ENCODE,
+    STAGE_UPLOAD,
+)
+
+
+def test_metrics():
+    """パーセンタイル・カウンター・書き出しのテスト"""
+    print("=== 計測テスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        # 1. パーセンタイル
+        print("\n1. パーセンタイルテスト...")
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50 and percentile(values, 95) == 95 and percentile(values, 99) == 99, \
+            "パーセンタイルが不正"
+        assert percentile([], 50) is None, "サンプルなしでNoneにならない"
+        print("✓ p50 / p95 / p99 が正しく計算される")
+
+        # 2. 直近のサンプルのみでパーセンタイルを計算し、件数と合計は累積
+        print("\n2. 直近サンプルテスト...")
+        registry = MetricsRegistry(window=10)
+        for ms in [1000] * 10 + [10] * 10:
+            registry.observe(STAGE_UPLOAD, ms)
+        stats = registry.snapshot()['stages'][STAGE_UPLOAD]
+        assert stats['p99_ms'] == 10, f"古いサンプルが残っている: {stats['p99_ms']}"
+        assert stats['count'] == 20 and stats['sum_ms'] == 10100, "件数・合計が累積されていない"
+        buckets = dict(stats['buckets'])
+        assert buckets[10] == 10 and buckets[1000] == 20, f"累積分布が不正: {buckets}"
+        print("✓ 直近のサンプルで集計され、累積分布も記録される")
+
+        # 3. タイマーは例外で抜けた場合も記録
+        print("\n3. タイマーテスト...")
+        with registry.timer(STAGE_ENCODE) as timer:
+            time.sleep(0.02)
+        assert timer.ms >= 15, f"所要時間が不正: {timer.ms}"
+        try:
+            with registry.timer(STAGE_ENCODE):
+                raise RuntimeError("エンコード失敗")
+        except RuntimeError:
+            pass
+        assert registry.snapshot()['stages'][STAGE_ENCODE]['count'] == 2, "例外時に記録されない"
+        print(f"✓ with文で所要時間を計測 ({timer.ms}ms)")
+
+        # 4. カウンターとHTTPステータス別の失敗回数
+        print("\n4. カウンターテスト...")
+        registry.increment('captures')
+        registry.increment('bytes_encoded', 1500)
+        registry.record_upload(1500)
+        registry.record_failure(503)
+        registry.record_failure(503)
+        registry.record_failure()
+        snapshot = registry.snapshot()
+        assert snapshot['counters'] == {'captures': 1, 'bytes_encoded': 1500, 'uploads': 1, 'bytes_uploaded': 1500}, \
+            f"カウンターが不正: {snapshot['counters']}"
+        assert snapshot['upload_failures'] == {'503': 2, 'error': 1}, f"失敗回数が不正: {snapshot['upload_failures']}"
+        assert snapshot['last_upload_at'] is not None, "最終アップロード時刻が記録されない"
+        assert "upload" in format_metrics(snapshot), "表示用テキストに処理段階がない"
+        print("✓ カウンターと失敗回数が記録される")
+
+        # 5. 停止時に集計結果をファイルに書き出す
+        print("\n5. 書き出しテスト...")
+        dump_file = os.path.join(test_dir, "metrics.json")
+        dumper = MetricsDumper(registry, dump_file, interval=60, extra=lambda: {'queue_depth': 3})
+        dumper.start()
+        dumper.stop()
+        with open(dump_file, 'r', encoding='utf-8') as f:
+            dumped = json.load(f)
+        assert dumped['counters']['uploads'] == 1 and dumped['queue_depth'] == 3, "書き出した内容が不正"
+        print("✓ 集計結果がJSONで書き出される")
+
+        print("\n=== すべての計測テスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+    test_metrics()
+    print("\n✅ 計測テスト完了")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+監視用エンドポイント（Prometheus形式）のテスト
+"""
+
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.metrics import MetricsRegistry, STAGE_UPLOAD
+from screenshot_engine.metrics_server import MetricsServer, render_prometheus
+
+
+def test_metrics_server():
+    """Prometheus形式の出力とHTTPでの取得のテスト"""
+    print("=== 監視用エンドポイントテスト ===")
+
+    registry = MetricsRegistry()
+    registry.increment('captures', 3)
+    registry.record_upload(2048)
+    registry.record_failure(503)
+    registry.observe(STAGE_UPLOAD, 120.0)
+    registry.observe(STAGE_UPLOAD, 4000.0)
+    scrapes = []
+
+    def snapshot():
+        scrapes.append(1)
+        data = registry.snapshot()
+        data.update({'queue_depth': 2, 'spool_entries': 1, 'spool_bytes': 4096})
+        return data
+
+    # 1. Prometheusのテキスト形式
+    print("\n1. テキスト形式テスト...")
+    text = render_prometheus(snapshot())
+    lines = text.splitlines()
+    assert "screenshot_captures_total 3" in lines, "カウンターが出力されない"
+    assert 'screenshot_upload_failures_total{status="503"} 1' in lines, "失敗回数が出力されない"
+    assert "screenshot_upload_queue_depth 2" in lines, "キュー長が出力されない"
+    assert "# TYPE screenshot_stage_duration_seconds histogram" in lines, "ヒストグラムの型がない"
+    assert 'screenshot_stage_duration_seconds_bucket{stage="upload",le="0.25"} 1' in lines, "累積分布が不正"
+    assert 'screenshot_stage_duration_seconds_bucket{stage="upload",le="+Inf"} 2' in lines, "+Infの件数が不正"
+    assert 'screenshot_stage_duration_seconds_sum{stage="upload"} 4.12' in lines, "合計秒数が不正"
+    assert any(line.startswith("screenshot_last_upload_timestamp_seconds ") for line in lines), "最終アップロード時刻がない"
+    print("✓ カウンター・ゲージ・ヒストグラムが出力される")
+
+    # 2. HTTPで取得（取得時のみ集計される）
+    print("\n2. HTTP取得テスト...")
+    server = MetricsServer(snapshot, port=0)
+    assert server.start(), "サーバーが起動しない"
+    try:
+        scrapes.clear()
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode('utf-8')
+            assert response.headers['Content-Type'].startswith('text/plain'), "Content-Typeが不正"
+        assert "screenshot_uploads_total 1" in body.splitlines(), "HTTPで取得した内容が不正"
+        assert len(scrapes) == 1, "取得要求ごとに1回だけ集計されていない"
+        print("✓ /metrics から取得できる")
+
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+            assert False, "存在しないパスでエラーにならない"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404, f"ステータスが不正: {e.code}"
+        print("✓ /metrics 以外は404")
+
+        # 3. 同じポートでは二重に起動できない
+        print("\n3. ポート使用中テスト...")
+        assert not MetricsServer(snapshot, port=server.port).start(), "使用中のポートで起動できてしまった"
+        print("✓ ポート使用中の場合は起動せずFalse")
+
+    finally:
+        # 待ち受けスレッドの確認間隔（1時間）を待たずに停止する
+        started = time.monotonic()
+        server.stop()
+        elapsed = time.monotonic() - started
+        assert elapsed < 2, f"停止に時間がかかる: {elapsed:.1f}秒"
+
+    print("\n=== すべての監視用エンドポイントテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_metrics_server()
+    print("\n✅ 監視用エンドポイントテスト完了")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+モニター別撮影と並列エンコードのテスト
+"""
+
+import os
+import sys
+import threading
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.image_encoder import PngEncoder
+from screenshot_engine.monitor_capture import ParallelEncoder, check_capture_mode, monitor_stem
+from screenshot_engine.screen_grabber import ScreenGrabber
+from benchmark_encoders import create_office_desktop, create_code_desktop
+
+
+class RecordingEncoder(PngEncoder):
+    """エンコードしたスレッドを記録するPNGエンコーダー"""
+
+    def __init__(self):
+        super().__init__(compress_level=1)
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def encode_bytes(self, img) -> bytes:
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+        return super().encode_bytes(img)
+
+
+class FakeShot:
+    def __init__(self, width, height, value):
+        self.width = width
+        self.height = height
+        self.raw = bytearray([value]) * (width * height * 4)
+
+
+class FakeMss:
+    monitors = [
+        {'width': 300, 'height': 100, 'value': 0},
+        {'width': 100, 'height': 100, 'value': 10},
+        {'width': 200, 'height': 80, 'value': 200},
+    ]
+
+    def grab(self, monitor):
+        return FakeShot(monitor['width'], monitor['height'], monitor['value'])
+
+    def close(self):
+        pass
+
+
+def test_monitor_capture():
+    """ファイル名・並列エンコード・モニターごとの変換先のテスト"""
+    print("=== モニター別撮影テスト ===")
+
+    # 1. ファイル名と設定の検証
+    print("\n1. ファイル名テスト...")
+    assert PngEncoder().file_name(monitor_stem("20240101-user_103000", 2)) == "20240101-user_103000_m2.png"
+    assert check_capture_mode('per_monitor') == 'per_monitor'
+    try:
+        check_capture_mode('tiled')
+        assert False, "不明な撮影方式でエラーにならない"
+    except ValueError:
+        pass
+    print("✓ 撮影時刻を共有し、モニター番号を付けたファイル名")
+
+    # 2. 並列エンコードの結果は順序・内容とも逐次エンコードと一致
+    print("\n2. 並列エンコードテスト...")
+    images = [create_office_desktop(640, 360, seed=i) for i in range(3)] + [create_code_desktop(640, 360)]
+    encoder = RecordingEncoder()
+    parallel = ParallelEncoder(workers=4)
+    try:
+        encoded = parallel.encode_all(encoder, images)
+        assert encoded == [PngEncoder(compress_level=1).encode_bytes(img) for img in images], "並列エンコードの結果が一致しない"
+        assert all(name.startswith("encode") for name in encoder.threads), "スレッドプールでエンコードされていない"
+        print(f"✓ {len(images)}枚を{len(encoder.threads)}スレッドでエンコード")
+
+        # 1枚だけの場合はスレッドを使わない
+        encoder.threads.clear()
+        assert parallel.encode_all(encoder, images[:1])[0] == encoded[0]
+        assert encoder.threads == {threading.current_thread().name}
+        print("✓ 1枚のみの場合は呼び出し元のスレッドでエンコード")
+    finally:
+        parallel.close()
+
+    # 3. 変換先の画像はモニターごとに保持
+    print("\n3. モニターごとの変換テスト...")
+    grabber = ScreenGrabber(factory=FakeMss, refresh_interval=0, signature_func=None)
+    first = grabber.to_image(grabber.grab(1), 1)
+    second = grabber.to_image(grabber.grab(2), 2)
+    assert first is not second, "別のモニターで変換先が共有されている"
+    assert first.size == (100, 100) and second.size == (200, 80)
+    assert first.getpixel((0, 0)) == (10, 10, 10), "1つ目のモニターの画像が上書きされた"
+    assert grabber.to_image(grabber.grab(1), 1) is first, "同じモニターで変換先が再利用されていない"
+    grabber.close()
+    print("✓ 並列エンコード中に他のモニターの画像を上書きしない")
+
+    print("\n=== すべてのモニター別撮影テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_monitor_capture()
+    print("\n✅ モニター別撮影テスト完了")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画面取得（mssインスタンスの再利用）のテスト
+"""
+
+import os
+import sys
+import threading
+from PIL import Image, ImageChops
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.screen_grabber import FrameConverter, ScreenGrabber
+
+
+class FakeMss:
+    """撮影回数と生成・終了を記録するmssの代わり"""
+
+    instances = []
+
+    def __init__(self, width=640, fail_grabs=0):
+        self.monitors = [{'left': 0, 'top': 0, 'width': width, 'height': 480}]
+        self.fail_grabs = fail_grabs
+        self.grabbed = []
+        self.closed = False
+        FakeMss.instances.append(self)
+
+    def grab(self, monitor):
+        if self.closed:
+            raise RuntimeError("閉じたインスタンスで撮影された")
+        if self.fail_grabs:
+            self.fail_grabs -= 1
+            raise RuntimeError("XGetImage() failed")
+        self.grabbed.append(monitor)
+        return monitor
+
+    def close(self):
+        self.closed = True
+
+
+def test_screen_grabber():
+    """mssインスタンスの再利用・作り直し・スレッド専用のテスト"""
+    print("=== 画面取得テスト ===")
+
+    # 1. 撮影のたびにインスタンスを作らない
+    print("\n1. 再利用テスト...")
+    FakeMss.instances = []
+    grabber = ScreenGrabber(factory=FakeMss, refresh_interval=0, signature_func=None)
+    for _ in range(5):
+        assert grabber.grab(0)['width'] == 640
+    assert len(FakeMss.instances) == 1, f"インスタンスが作り直された: {len(FakeMss.instances)}"
+    assert len(FakeMss.instances[0].grabbed) == 5
+    print("✓ 5回の撮影でmssのインスタンスは1つ")
+
+    # 2. 画面構成が変わった場合はモニター情報を取得し直す
+    print("\n2. 画面構成の変更テスト...")
+    FakeMss.instances = []
+    layout = {'signature': (0, 0, 640, 480, 1)}
+    widths = iter([640, 1920])
+    grabber = ScreenGrabber(factory=lambda: FakeMss(width=next(widths)), refresh_interval=0,
+                            signature_func=lambda: layout['signature'])
+    assert grabber.grab(0)['width'] == 640
+    assert grabber.grab(0)['width'] == 640
+    layout['signature'] = (0, 0, 1920, 1080, 2)
+    assert grabber.grab(0)['width'] == 1920, "変更後のモニター構成で撮影されていない"
+    assert len(FakeMss.instances) == 2 and FakeMss.instances[0].closed, "古いインスタンスが閉じられていない"
+    print("✓ 画面構成の変更時のみ作り直す")
+
+    # 3. 取得エラー時は作り直して再試行
+    print("\n3. 取得エラーテスト...")
+    FakeMss.instances = []
+    failures = iter([1, 0])
+    grabber = ScreenGrabber(factory=lambda: FakeMss(fail_grabs=next(failures)), refresh_interval=0,
+                            signature_func=None)
+    assert grabber.grab(0)['width'] == 640, "再試行で撮影できない"
+    assert grabber.opened == 2 and grabber.grabs == 1
+    print("✓ 取得エラー時はモニター情報を取得し直して再試行")
+
+    # 4. 最初に撮影したスレッド以外からは使用できない
+    print("\n4. スレッド専用テスト...")
+    errors = []
+
+    def grab_from_other_thread():
+        assert not grabber.owned_by_current_thread()
+        try:
+            grabber.grab(0)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=grab_from_other_thread)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1, "別のスレッドから撮影できてしまった"
+
+    grabber.close()
+    assert FakeMss.instances[-1].closed, "閉じたときにmssのインスタンスが閉じられていない"
+    assert grabber.owned_by_current_thread(), "閉じた後は別のスレッドで使用できるはず"
+    print("✓ 撮影スレッド専用で、閉じた後は再利用できる")
+
+    # 5. BGRAバッファの変換（変換先の画像を再利用）
+    print("\n5. 画像変換テスト...")
+    source = Image.effect_noise((320, 200), 60).convert('RGB')
+    r, g, b = source.split()
+    buffer = bytearray(Image.merge('RGBA', (b, g, r, Image.new('L', source.size, 255))).tobytes())
+    converter = FrameConverter()
+    first = converter.to_image(buffer, 320, 200)
+    assert ImageChops.difference(first, source).getbbox() is None, "変換結果が元の画像と一致しない"
+    second = converter.to_image(buffer, 320, 200)
+    assert second is first and converter.allocated == 1, "変換先の画像が再利用されていない"
+    converter.to_image(bytearray(160 * 100 * 4), 160, 100)
+    assert converter.allocated == 2, "サイズ変更時に変換先が作り直されていない"
+    print("✓ 元の画像と一致し、同じサイズでは変換先を再利用する")
+
+    print("\n=== すべての画面取得テスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_screen_grabber()
+    print("\n✅ 画面取得テスト完了")
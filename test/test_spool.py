@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+オフラインスプールと再送機能のテスト
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.spool import CaptureSpool, SpoolReplayer
+
+
+def test_spool_persistence():
+    """スプールの永続化・復元・上限管理のテスト"""
+    print("=== スプール永続化テスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        spool_dir = os.path.join(test_dir, "spool")
+
+        # 1. 保存した撮影画像が再起動後に復元される
+        print("\n1. 再起動後の復元テスト...")
+        spool = CaptureSpool(spool_dir, max_bytes=0, max_age_hours=0)
+        source = os.path.join(test_dir, "shot.png")
+        with open(source, 'wb') as f:
+            f.write(b"PNGDATA" * 10)
+        first = spool.add("20240101-user_100000.png", source_path=source)
+        spool.add("20240101-user_100500.png", data=b"second")
+
+        # クラッシュで途中まで書かれた行とtmpファイルを再現
+        with open(spool.manifest_path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add", "id": "broken"')
+        with open(os.path.join(spool.data_dir, "partial.png.tmp"), 'wb') as f:
+            f.write(b"partial")
+
+        restored = CaptureSpool(spool_dir, max_bytes=0, max_age_hours=0)
+        names = [entry.file_name for entry in restored.pending()]
+        assert names == ["20240101-user_100000.png", "20240101-user_100500.png"], f"復元結果が不正: {names}"
+        assert not os.path.exists(os.path.join(spool.data_dir, "partial.png.tmp")), "書き込み途中のファイルが残っている"
+        print("✓ 未送信分が古い順に復元され、壊れた記録は無視される")
+
+        # 2. 完了したエントリは再起動後に復元されない
+        print("\n2. 完了記録テスト...")
+        restored.complete(restored.pending()[0])
+        assert not os.path.exists(first.path), "完了したファイルが削除されていない"
+        restored = CaptureSpool(spool_dir, max_bytes=0, max_age_hours=0)
+        assert len(restored) == 1, "完了したエントリが復元された"
+        print("✓ 完了したエントリは削除される")
+
+        # 3. サイズ上限を超えると古い順に破棄される
+        print("\n3. サイズ上限テスト...")
+        limited = CaptureSpool(os.path.join(test_dir, "limited"), max_bytes=250, max_age_hours=0)
+        for i in range(4):
+            limited.add(f"shot_{i}.png", data=b"X" * 100)
+            time.sleep(0.01)
+        names = [entry.file_name for entry in limited.pending()]
+        assert names == ["shot_2.png", "shot_3.png"], f"古い順に破棄されていない: {names}"
+        assert limited.size_bytes() <= 250, "サイズ上限を超えている"
+        print("✓ サイズ上限を超えた分は古い順に破棄される")
+
+        print("\n=== すべてのスプール永続化テスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+def wait_until(condition, timeout=5):
+    """conditionが真になるまで待機"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_spool_replay():
+    """接続回復後の再送テスト"""
+    print("=== スプール再送テスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        print("\n1. 接続回復後の再送テスト...")
+        spool = CaptureSpool(os.path.join(test_dir, "spool1"), max_bytes=0, max_age_hours=0)
+        for i in range(3):
+            spool.add(f"shot_{i}.png", data=b"data")
+            time.sleep(0.01)
+
+        # 最初の2回は失敗（オフライン）、その後成功
+        attempts = []
+
+        def upload(entry):
+            attempts.append(entry.file_name)
+            return len(attempts) > 2
+
+        replayer = SpoolReplayer(spool, upload, base_delay=0.05, max_delay=0.2)
+        replayer.start()
+        wait_until(lambda: len(spool) == 0)
+        replayer.stop()
+
+        assert len(spool) == 0, "スプールが空になっていない"
+        assert attempts == ["shot_0.png", "shot_1.png", "shot_2.png", "shot_0.png", "shot_1.png"], \
+            f"再送順序が不正: {attempts}"
+        print("✓ 失敗時はバックオフして再試行し、失敗回数の少ない古い順に再送される")
+
+        print("\n2. 常に拒否されるエントリのテスト...")
+        spool = CaptureSpool(os.path.join(test_dir, "spool2"), max_bytes=0, max_age_hours=0)
+        for i in range(3):
+            spool.add(f"shot_{i}.png", data=b"data")
+            time.sleep(0.01)
+
+        # shot_0は常に拒否される（例: HTTP 400）
+        attempts = []
+
+        def upload_rejecting(entry):
+            attempts.append(entry.file_name)
+            return entry.file_name != "shot_0.png"
+
+        replayer = SpoolReplayer(spool, upload_rejecting, base_delay=0.05, max_delay=0.2)
+        replayer.start()
+        wait_until(lambda: len(spool) == 1)
+        replayer.stop()
+
+        remaining = [entry.file_name for entry in spool.pending()]
+        assert remaining == ["shot_0.png"], f"後続のエントリが再送されていない: {remaining}"
+        assert attempts[:3] == ["shot_0.png", "shot_1.png", "shot_2.png"], f"再送順序が不正: {attempts}"
+        print("✓ 失敗し続けるエントリは後回しになり、後続のエントリを妨げない")
+
+        print("\n3. 追加時の起床テスト...")
+        spool = CaptureSpool(os.path.join(test_dir, "spool3"), max_bytes=0, max_age_hours=0)
+        uploaded = []
+
+        def upload_ok(entry):
+            uploaded.append(entry.file_name)
+            return True
+
+        # max_delayを長くしても、add()で待機中の再送スレッドが起きる
+        replayer = SpoolReplayer(spool, upload_ok, base_delay=60, max_delay=600)
+        replayer.start()
+        time.sleep(0.1)
+        spool.add("late.png", data=b"data")
+        woke = wait_until(lambda: len(spool) == 0, timeout=2)
+        replayer.stop()
+
+        assert woke, "add()で再送スレッドが起きていない"
+        assert uploaded == ["late.png"], f"再送結果が不正: {uploaded}"
+        print("✓ 追加されたエントリはすぐに再送される")
+
+        print("\n=== すべてのスプール再送テスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+    test_spool_persistence()
+    test_spool_replay()
+    print("\n✅ スプールテスト完了")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時の遅延読み込みのテスト
+"""
+
+import os
+import sys
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_startup import DEFAULT_MODULES, probe_import, parse_importtime
+
+
+def test_startup_imports():
+    """CLI版・GUI版の起動時に重いモジュールを読み込まないことのテスト"""
+    print("=== 起動時の遅延読み込みテスト ===")
+
+    # 1. 起動時に遅延読み込みの対象が読み込まれない
+    print("\n1. 遅延読み込みテスト...")
+    for module in DEFAULT_MODULES:
+        try:
+            report = probe_import(module)
+        except RuntimeError as e:
+            # tkinterがない環境ではGUI版を読み込めない
+            print(f"  {module}: 読み込めないためスキップ ({str(e).splitlines()[0]})")
+            continue
+        assert not report['loaded'], f"{module} の起動時に読み込まれている: {report['loaded']}"
+        print(f"✓ {module}: {report['elapsed'] * 1000:.1f}ms")
+
+    # 2. -X importtime の集計
+    print("\n2. importtime集計テスト...")
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   json.decoder\n"
+        "import time:       200 |       1500 | json\n"
+    )
+    rows = parse_importtime(output)
+    assert rows == [(1500, 'json'), (100, 'json.decoder')], f"集計結果が不正: {rows}"
+    print("✓ 累計時間の長い順に集計される")
+
+    print("\n=== すべての起動時の遅延読み込みテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_startup_imports()
+    print("\n✅ 起動時の遅延読み込みテスト完了")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+タイル差分エンコードと全画面復元のテスト
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from PIL import Image, ImageDraw, ImageChops
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.tile_delta import (
+    TileDeltaEncoder,
+    KIND_KEYFRAME,
+    KIND_DELTA,
+    KIND_UNCHANGED,
+)
+import reconstruct_frames
+
+
+def to_bgra(img):
+    """PIL ImageをmssのBGRAバッファ形式に変換"""
+    return bytearray(img.convert('RGBA').tobytes('raw', 'BGRA'))
+
+
+def test_tile_delta():
+    """キーフレーム・差分の判定と復元のテスト"""
+    print("=== タイル差分エンコードテスト ===")
+
+    test_dir = tempfile.mkdtemp()
+
+    try:
+        # タイルの境界にかからない半端なサイズで検証
+        width, height = 1000, 700
+        frame1 = Image.new('RGB', (width, height), color=(40, 80, 120))
+        ImageDraw.Draw(frame1).rectangle([(50, 50), (400, 300)], fill='white')
+
+        # 2枚目: 1か所に文字入力した程度の変化
+        frame2 = frame1.copy()
+        ImageDraw.Draw(frame2).text((60, 60), "typing...", fill='black')
+
+        # 3枚目: 右下の端のタイルだけが変化
+        frame3 = frame2.copy()
+        ImageDraw.Draw(frame3).rectangle([(980, 690), (999, 699)], fill='red')
+
+        encoder = TileDeltaEncoder(tile_size=128, keyframe_interval=10, max_changed_ratio=0.5)
+        input_dir = os.path.join(test_dir, "drive")
+        os.makedirs(input_dir)
+
+        # 1. 初回はキーフレーム
+        print("\n1. キーフレームテスト...")
+        name1 = "20240101-user_100000.png"
+        result = encoder.encode(to_bgra(frame1), width, height, name1)
+        assert result.kind == KIND_KEYFRAME, "初回がキーフレームではない"
+        frame1.save(os.path.join(input_dir, name1))
+        print("✓ 初回はキーフレームになる")
+
+        # 2. 小さな変化は差分になる
+        print("\n2. 差分テスト...")
+        name2 = "20240101-user_100500.png"
+        result = encoder.encode(to_bgra(frame2), width, height, name2)
+        assert result.kind == KIND_DELTA, "小さな変化が差分にならない"
+        assert result.changed_tiles == 1, f"変化したタイル数が不正: {result.changed_tiles}"
+        assert result.file_name == "20240101-user_100500_delta.png", "差分ファイル名が不正"
+        result.save(os.path.join(input_dir, result.file_name))
+
+        name3 = "20240101-user_101000.png"
+        result = encoder.encode(to_bgra(frame3), width, height, name3)
+        assert result.kind == KIND_DELTA and result.changed_tiles == 1, "端のタイルの変化が検出されない"
+        result.save(os.path.join(input_dir, result.file_name))
+        print("✓ 変化したタイルのみが差分になる")
+
+        # 3. 変化がなければ省略
+        print("\n3. 変化なしテスト...")
+        result = encoder.encode(to_bgra(frame3), width, height, "20240101-user_101500.png")
+        assert result.kind == KIND_UNCHANGED, "変化なしが検出されない"
+        print("✓ 変化がない場合は省略される")
+
+        # 4. 大きな変化・サイズ変更はキーフレーム
+        print("\n4. キーフレーム切り替えテスト...")
+        inverted = ImageChops.invert(frame3)
+        assert encoder.encode(to_bgra(inverted), width, height, "a.png").kind == KIND_KEYFRAME, \
+            "大きな変化がキーフレームにならない"
+        small = frame1.resize((800, 600))
+        assert encoder.encode(to_bgra(small), 800, 600, "b.png").kind == KIND_KEYFRAME, \
+            "サイズ変更がキーフレームにならない"
+        print("✓ 大きな変化・サイズ変更でキーフレームに切り替わる")
+
+        # 5. 復元ツールで元のフレームと一致する
+        print("\n5. 全画面復元テスト...")
+        output_dir = os.path.join(test_dir, "restored")
+        os.makedirs(output_dir)
+        entries = reconstruct_frames.collect_frames(input_dir)["user"]
+        restored, warnings = reconstruct_frames.reconstruct_user_frames(input_dir, output_dir, entries)
+        assert restored == 3 and not warnings, f"復元結果が不正: {restored}, {warnings}"
+        for name, expected in [(name1, frame1), (name2, frame2), (name3, frame3)]:
+            with Image.open(os.path.join(output_dir, name)) as img:
+                assert ImageChops.difference(img.convert('RGB'), expected).getbbox() is None, \
+                    f"復元画像が元の画像と一致しない: {name}"
+        print("✓ キーフレームと差分から元のフレームが復元される")
+
+        print("\n=== すべてのタイル差分エンコードテスト成功 ===")
+
+    finally:
+        shutil.rmtree(test_dir)
+
+
+if __name__ == "__main__":
+    test_tile_delta()
+    print("\n✅ タイル差分エンコードテスト完了")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アップロードパイプラインのテスト
+"""
+
+import os
+import sys
+import threading
+import time
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from screenshot_engine.upload_pipeline import (
+    UploadJob,
+    UploadPipeline,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_DROP_NEWEST,
+)
+
+
+def test_upload_pipeline():
+    """キュー処理とオーバーフローポリシーのテスト"""
+    print("=== アップロードパイプラインテスト ===")
+
+    # 1. ワーカーがすべてのジョブを処理する
+    print("\n1. ワーカー処理テスト...")
+    uploaded = []
+    lock = threading.Lock()
+
+    def upload(job):
+        with lock:
+            uploaded.append(job.file_name)
+        return True
+
+    pipeline = UploadPipeline(upload, workers=3, max_queue=20)
+    pipeline.start()
+    for i in range(10):
+        assert pipeline.submit(UploadJob(f"shot_{i}.png")), "ジョブが追加できない"
+    assert pipeline.wait_idle(timeout=5), "ジョブの処理が完了しない"
+    pipeline.stop()
+    assert sorted(uploaded) == sorted(f"shot_{i}.png" for i in range(10)), "処理されないジョブがある"
+    assert pipeline.uploaded == 10, "成功件数が不正"
+    print("✓ 全ジョブがワーカーで処理される")
+
+    # 2. 撮影側はアップロードの遅延でブロックされない
+    print("\n2. ノンブロッキング投入テスト...")
+    release = threading.Event()
+    pipeline = UploadPipeline(lambda job: release.wait(5), workers=1, max_queue=5)
+    pipeline.start()
+    start = time.monotonic()
+    for i in range(5):
+        pipeline.submit(UploadJob(f"slow_{i}.png"))
+    assert time.monotonic() - start < 0.5, "ジョブ投入がアップロードを待っている"
+    release.set()
+    pipeline.stop()
+    print("✓ 低速なアップロード中もジョブ投入は即座に完了する")
+
+    # 3. オーバーフローポリシー（ワーカー未起動で満杯状態を再現）
+    print("\n3. オーバーフローポリシーテスト...")
+    for policy, expected_queue, expected_dropped in [
+        (OVERFLOW_DROP_OLDEST, ["b.png", "c.png"], ["a.png"]),
+        (OVERFLOW_DROP_NEWEST, ["a.png", "b.png"], ["c.png"]),
+    ]:
+        dropped = []
+        pipeline = UploadPipeline(lambda job: True, max_queue=2, overflow_policy=policy,
+                                  on_drop=lambda job, reason: dropped.append(job.file_name))
+        for name in ["a.png", "b.png", "c.png"]:
+            pipeline.submit(UploadJob(name))
+        pending = [job.file_name for job in pipeline.stop()]
+        assert pending == expected_queue, f"{policy}: キューの内容が不正 {pending}"
+        assert dropped == expected_dropped, f"{policy}: 破棄されたジョブが不正 {dropped}"
+        print(f"✓ {policy} が正しく動作")
+
+    print("\n=== すべてのアップロードパイプラインテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_upload_pipeline()
+    print("\n✅ アップロードパイプラインテスト完了")
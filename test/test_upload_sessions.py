@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+マルチパート・再開可能アップロードの選択とセッション再開のテスト（ローカルの疑似Driveサーバーを使用）
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import tempfile
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+# 親ディレクトリをパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from screenshot_engine.upload_sessions import UploadSessionStore, session_key
+from screenshot_engine.drive_rest import HttpPool, DriveRestSession, CHUNK_ALIGNMENT
+from screenshot_engine.drive_session import UPLOAD_BACKEND_GOOGLEAPICLIENT, UPLOAD_BACKEND_REST
+from screenshot_engine.capture_engine import CaptureEngine
+from test_drive_rest import FakeDriveServer, FakeCredentials
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_engine(temp_dir, backend, name):
+    """テスト用のエンジン（分割サイズ256KB、1000バイトを超えると再開可能アップロード）"""
+    engine = CaptureEngine('folder-id', lambda: None, log_file=os.path.join(temp_dir, f'{name}.log'))
+    engine.upload_backend = backend
+    engine.multipart_max_bytes = 1000
+    engine.upload_chunk_size = CHUNK_ALIGNMENT
+    engine._upload_sessions = UploadSessionStore(os.path.join(temp_dir, 'sessions.json'), log=engine.log)
+    return engine
+
+
+def create_service(drive, backend):
+    """アップロード方式に応じた疑似サーバー向けのDriveサービス"""
+    if backend == UPLOAD_BACKEND_REST:
+        session = DriveRestSession(FakeCredentials(f"{drive.url}/token"), http=HttpPool(timeout=5),
+                                   base_url=drive.url)
+        return session.get_service()
+    # アップロード先のURLはディスカバリー文書のrootUrlから作られるため、文書を書き換えて疑似サーバーに向ける
+    document = json.loads(get_static_doc('drive', 'v3'))
+    document['rootUrl'] = f"{drive.url}/"
+    document['baseUrl'] = f"{drive.url}/drive/v3/"
+    http = httplib2.Http(timeout=5)
+    http.redirect_codes = http.redirect_codes - {308}
+    return build_from_document(document, http=http)
+
+
+def test_upload_sessions():
+    """セッションURIの保存・サイズによるアップロード方式の選択・再起動後の再開のテスト"""
+    print("=== マルチパート・再開可能アップロードテスト ===")
+
+    temp_dir = tempfile.mkdtemp()
+    drive = FakeDriveServer()
+    try:
+        # 1. セッションURIはファイルに保存され、期限切れのものは破棄される
+        print("\n1. セッション保存テスト...")
+        path = os.path.join(temp_dir, 'store.json')
+        clock = FakeClock()
+        store = UploadSessionStore(path, max_age_hours=1, clock=clock)
+        key = session_key('folder-id', '20240101-user_120000.png', 1234)
+        store.put(key, 'https://example.com/upload?upload_id=1')
+        assert UploadSessionStore(path, clock=clock).get(key) == 'https://example.com/upload?upload_id=1', \
+            "再読み込み後にセッションURIが取得できない"
+        if os.name == 'posix':
+            # セッションURIを知っていれば書き込めるため、本人のみ読み書きできる権限で保存
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600, f"権限が不正: {oct(os.stat(path).st_mode)}"
+            os.chmod(path, 0o644)
+            UploadSessionStore(path, clock=clock)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600, "既存のファイルの権限が変更されない"
+        clock.now += 3601
+        assert UploadSessionStore(path, max_age_hours=1, clock=clock).get(key) is None, "期限切れのセッションが残っている"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"broken')
+        assert len(UploadSessionStore(path)) == 0, "壊れたファイルで読み込みに失敗した"
+        print("✓ 本人のみ読み書きできる権限で保存され、再起動後も読み込め、期限切れ・破損したものは破棄される")
+
+        for backend in (UPLOAD_BACKEND_REST, UPLOAD_BACKEND_GOOGLEAPICLIENT):
+            # googleapiclientは疑似サーバーに直接送信するため認証ヘッダーを確認しない
+            drive.require_auth = backend == UPLOAD_BACKEND_REST
+            service = create_service(drive, backend)
+
+            # 2. 小さい撮影画像はマルチパートの1リクエスト、大きいものは分割して送信
+            print(f"\n2. アップロード方式の選択テスト（{backend}）...")
+            engine = create_engine(temp_dir, backend, 'first')
+            drive.requests.clear()
+            assert engine.upload_bytes(b'p' * 900, '20240101-user_130000.png', service, 'image/png')
+            assert drive.requests == [('POST', 'multipart')], f"マルチパートで送信されない: {drive.requests}"
+            drive.requests.clear()
+            assert engine.upload_bytes(b'q' * (CHUNK_ALIGNMENT + 10), '20240101-user_130500.png', service,
+                                       'image/png')
+            assert drive.requests == [('POST', 'resumable'), ('PUT', 'chunk'), ('PUT', 'chunk')], \
+                f"再開可能アップロードで送信されない: {drive.requests}"
+            counters = engine.metrics_registry.snapshot()['counters']
+            assert counters['multipart_uploads'] == 1 and counters['resumable_uploads'] == 1, f"集計が不正: {counters}"
+            print("✓ 900バイトは1リクエスト、256KB超は再開可能アップロード")
+
+            # 3. 分割送信の途中で失敗した場合、再起動後は続きから送信する
+            print(f"\n3. 再起動後の再開テスト（{backend}）...")
+            payload = os.urandom(CHUNK_ALIGNMENT * 3 + 100)
+            capture = os.path.join(temp_dir, '20240101-user_140000.png')
+            with open(capture, 'wb') as f:
+                f.write(payload)
+            drive.puts = 0
+            drive.fail_put_at = 2
+            assert not engine.upload_file(capture, '20240101-user_140000.png', service), "失敗するはずの送信が成功した"
+            drive.fail_put_at = None
+            assert len(engine.get_upload_sessions()) == 1, "中断したセッションURIが保存されていない"
+            engine.get_log_writer().close()
+
+            restarted = create_engine(temp_dir, backend, 'restarted')
+            service = create_service(drive, backend)
+            drive.requests.clear()
+            assert restarted.upload_file(capture, '20240101-user_140000.png', service), \
+                "再起動後のアップロードに失敗"
+            assert drive.requests == [('PUT', 'status'), ('PUT', 'chunk'), ('PUT', 'chunk'), ('PUT', 'chunk')], \
+                f"続きから送信されていない: {drive.requests}"
+            uploaded = [data for metadata, data in drive.files.values() if metadata['name'] == '20240101-user_140000.png']
+            assert uploaded[-1] == payload, "再開後のアップロード内容が不正"
+            assert len(restarted.get_upload_sessions()) == 0, "完了後もセッションURIが残っている"
+            assert restarted.metrics_registry.snapshot()['counters']['resumed_uploads'] == 1
+            print("✓ セッション開始をやり直さず、受信済みの1分割の続きから送信")
+
+            # 4. 最初の分割で失敗した場合も、セッションURIは送信前に保存されている
+            print(f"\n4. 最初の分割での失敗テスト（{backend}）...")
+            payload = os.urandom(CHUNK_ALIGNMENT * 2 + 100)
+            capture = os.path.join(temp_dir, '20240101-user_143000.png')
+            with open(capture, 'wb') as f:
+                f.write(payload)
+            drive.puts = 0
+            drive.fail_put_at = 1
+            assert not restarted.upload_file(capture, '20240101-user_143000.png', service), \
+                "失敗するはずの送信が成功した"
+            drive.fail_put_at = None
+            key = session_key('folder-id', '20240101-user_143000.png', len(payload))
+            assert restarted.get_upload_sessions().get(key) is not None, "最初の分割で失敗したセッションURIが保存されていない"
+            drive.requests.clear()
+            assert restarted.upload_file(capture, '20240101-user_143000.png', service), "再開後のアップロードに失敗"
+            assert drive.requests == [('PUT', 'status'), ('PUT', 'chunk'), ('PUT', 'chunk'), ('PUT', 'chunk')], \
+                f"保存したセッションから送信されていない: {drive.requests}"
+            uploaded = [data for metadata, data in drive.files.values() if metadata['name'] == '20240101-user_143000.png']
+            assert uploaded[-1] == payload, "再開後のアップロード内容が不正"
+            assert len(restarted.get_upload_sessions()) == 0, "完了後もセッションURIが残っている"
+            print("✓ セッション開始の直後に保存され、最初の分割から送信し直す")
+
+            # 5. 期限切れのセッションは最初から送信し直す
+            print(f"\n5. 期限切れセッションテスト（{backend}）...")
+            key = session_key('folder-id', '20240101-user_150000.png', CHUNK_ALIGNMENT + 10)
+            restarted.get_upload_sessions().put(key, f"{drive.url}/upload/drive/v3/files?uploadType=resumable&upload_id=gone")
+            drive.requests.clear()
+            assert restarted.upload_bytes(b'r' * (CHUNK_ALIGNMENT + 10), '20240101-user_150000.png', service,
+                                          'image/png'), "期限切れ後のアップロードに失敗"
+            assert drive.requests[0] == ('PUT', 'chunk') and drive.requests[1] == ('POST', 'resumable'), \
+                f"最初から送信し直していない: {drive.requests}"
+            assert len(restarted.get_upload_sessions()) == 0
+            restarted.get_log_writer().close()
+            print("✓ 404の場合はセッションを破棄して最初から送信")
+
+        with open(os.path.join(temp_dir, 'sessions.json'), encoding='utf-8') as f:
+            assert json.load(f) == {}, "セッションファイルに不要なURIが残っている"
+    finally:
+        drive.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print("\n=== すべてのマルチパート・再開可能アップロードテスト成功 ===")
+
+
+if __name__ == "__main__":
+    test_upload_sessions()
+    print("\n✅ マルチパート・再開可能アップロードテスト完了")